@@ -1 +1,63 @@
-# This file makes 'app' a Python package
+# This file makes 'app' a Python package, and holds the application factory.
+#
+# create_app() imports the extensions, models, forms and blueprints when it
+# builds an app rather than when this package is imported, so importing
+# app.config (gunicorn_config.py, tooling) costs nothing and every app gets
+# its settings before any extension reads them. Flask-Migrate, and Alembic
+# and Mako behind it, are only loaded when the flask CLI builds the app:
+# `flask db` is their only user, and they are about a quarter of a worker's
+# import time. wsgi.py builds the app that gunicorn serves; see
+# benchmarks/import_time.py for the startup budget.
+import os
+
+
+def _built_by_flask_cli():
+    # The flask command builds the app inside its click context (ScriptInfo)
+    import click
+    from flask.cli import ScriptInfo
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.find_object(ScriptInfo) is not None
+
+
+def create_app(config=None, overrides=None):
+    """Build the app from a config profile ('prod', 'dev', 'test'; default APP_CONFIG) plus overrides."""
+    from flask import Flask
+    from .config import load
+    from .extensions import db, login_manager
+    from .fragment_cache import FragmentCache
+    from .user_cache import UserCache
+    from .live_updates import LiveUpdates
+    from .autocomplete import Autocomplete
+    from . import models  # noqa: F401  Mappers exist before any blueprint or extension queries them
+    from . import routes, api, sqlite_engine, instrumentation
+    from .cli import register_commands
+
+    app = Flask(__name__, instance_relative_config=True)
+    app.config.update(load(config))
+    app.config.update(overrides or {})
+    # The instance folder holds the default database and the shared fragment cache
+    if not app.config.get('SQLALCHEMY_DATABASE_URI'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.instance_path, 'app.db')
+        os.makedirs(app.instance_path, exist_ok=True)
+    elif app.config.get('FRAGMENT_CACHE_BACKEND') == 'sqlite' and not app.config.get('FRAGMENT_CACHE_PATH'):
+        os.makedirs(app.instance_path, exist_ok=True)
+
+    # Initialize extensions
+    db.init_app(app)
+    sqlite_engine.init_app(app) # WAL, busy_timeout and other pragmas on every connection
+    if _built_by_flask_cli():
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    login_manager.init_app(app)
+    # Caches, event broker and suggestion indexes are per app (app.extensions)
+    FragmentCache(app) # FRAGMENT_CACHE_BACKEND: 'memory' (default), 'sqlite' or 'null'
+    UserCache(app)
+    LiveUpdates(app, db)
+    Autocomplete(app, db) # Per-household prefix index behind the item form suggestions
+    instrumentation.init_app(app) # Query count/time per request: Server-Timing header and JSON log line
+
+    # Register Blueprints
+    app.register_blueprint(routes.bp)
+    app.register_blueprint(api.bp) # JSON API under /api/v1
+    register_commands(app) # flask CLI commands, see app/cli.py
+    return app
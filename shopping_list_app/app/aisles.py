@@ -0,0 +1,104 @@
+from sqlalchemy import select, delete, insert, func, and_
+
+from .models import ShoppingList, ShoppingItem, HouseholdCategory
+from .extensions import db
+
+# Aisle view: a list's items grouped by category, groups in the household's
+# walking order through the store (HouseholdCategory.position), categories
+# without a position after the ordered ones, items without a category last.
+# Groups, their counts and the list's "still to buy" total come from one
+# GROUP BY over the (shopping_list_id, category, bought) index, joined to the
+# ordering. A running sum gives each group its offset into the item query,
+# which is sorted the same way, so the groups are slices of it and nothing is
+# grouped in Python or Jinja.
+#
+# Categories are stored as typed, with whitespace trimmed and collapsed on
+# write (the item forms apply normalize_category, and every write path
+# validates through them). Groups are keyed by the category COLLATE NOCASE,
+# which the (shopping_list_id, category COLLATE NOCASE, bought) index serves,
+# so "dairy", " Dairy" and "DAIRY" are one group. household_categories.name
+# is a NOCASE column, so the walking order matches whatever the case too.
+
+CATEGORY_KEY = ShoppingItem.category.collate('nocase')
+
+
+def normalize_category(value):
+    """' BBQ   sauce ' -> 'BBQ sauce'; blank -> None."""
+    if value is None:
+        return None
+    return ' '.join(str(value).split()) or None
+
+
+def _aisle():
+    return HouseholdCategory.__table__.alias('aisle')
+
+
+def _sort_key(aisle):
+    # Ordered categories first, by position; then the rest by name; no category last
+    return (aisle.c.position.is_(None), aisle.c.position,
+            ShoppingItem.category.is_(None), CATEGORY_KEY)
+
+
+def _joined(aisle, shopping_list, stmt):
+    return (stmt.outerjoin(aisle, and_(aisle.c.household_id == shopping_list.household_id,
+                                       aisle.c.name == ShoppingItem.category))
+            .where(ShoppingItem.shopping_list_id == shopping_list.id))
+
+
+class AisleGroup:
+    def __init__(self, category, position, count, to_buy, items):
+        self.category = category  # None for items without one
+        self.position = position  # None if the household has not placed it
+        self.count = count
+        self.to_buy = to_buy
+        self.items = items
+
+
+def grouped_items(shopping_list):
+    """Return (groups, to_buy): the list's AisleGroups in walking order and its unbought total."""
+    aisle = _aisle()
+    key = _sort_key(aisle)
+    count = func.count(ShoppingItem.id)
+    to_buy = func.count(ShoppingItem.id).filter(ShoppingItem.bought.is_(False))
+    # A group is named as the household's order spells it, else by the lowest of its spellings
+    name = func.min(func.coalesce(aisle.c.name, ShoppingItem.category))
+    groups = db.session.execute(_joined(aisle, shopping_list, select(
+        name.label('category'), aisle.c.position, count.label('count'), to_buy.label('to_buy'),
+        (func.sum(count).over(order_by=key, rows=(None, 0)) - count).label('offset'),
+        func.sum(to_buy).over().label('list_to_buy')))
+        .group_by(CATEGORY_KEY, aisle.c.position)
+        .order_by(*key)).all()
+    if not groups:
+        return [], 0
+    items = db.session.scalars(_joined(aisle, shopping_list, select(ShoppingItem))
+                               .order_by(*key, ShoppingItem.bought, ShoppingItem.name, ShoppingItem.id)).all()
+    return [AisleGroup(g.category, g.position, g.count, g.to_buy, items[g.offset:g.offset + g.count])
+            for g in groups], groups[0].list_to_buy
+
+
+def category_order(household_id):
+    """The household's ordered categories, then the other categories its items use."""
+    ordered = db.session.scalars(select(HouseholdCategory.name).where(HouseholdCategory.household_id == household_id)
+                                 .order_by(HouseholdCategory.position)).all()
+    placed = select(HouseholdCategory.name).where(HouseholdCategory.household_id == household_id)
+    used = db.session.scalars(
+        select(func.min(ShoppingItem.category))
+        .join(ShoppingList, ShoppingList.id == ShoppingItem.shopping_list_id)
+        .where(ShoppingList.household_id == household_id, ShoppingItem.category.is_not(None),
+               CATEGORY_KEY.not_in(placed))
+        .group_by(CATEGORY_KEY).order_by(CATEGORY_KEY)).all()
+    return ordered, used
+
+
+def set_category_order(household_id, names):
+    """Replace the household's walking order with `names` (normalized, duplicates in any case dropped)."""
+    kept = {}
+    for name in filter(None, map(normalize_category, names)):
+        kept.setdefault(name.casefold(), name) # The first spelling wins
+    names = list(kept.values())
+    db.session.execute(delete(HouseholdCategory).where(HouseholdCategory.household_id == household_id))
+    if names:
+        db.session.execute(insert(HouseholdCategory), [
+            {'household_id': household_id, 'name': name, 'position': position}
+            for position, name in enumerate(names)])
+    return names
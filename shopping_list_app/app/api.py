@@ -0,0 +1,421 @@
+from flask import Blueprint, jsonify, request, abort, current_app
+from flask_login import login_required, current_user
+from sqlalchemy import insert, update, delete
+from werkzeug.exceptions import HTTPException
+
+from .models import ShoppingList, ShoppingItem
+from .forms import (CreateShoppingListForm, CloneShoppingListForm, AddShoppingItemForm, EditShoppingItemForm,
+                    validate_form)
+from .extensions import db, live_updates, autocomplete
+from .permissions import (get_household_or_403, get_list_or_403, get_item_or_403, accessible_list_ids,
+                          is_household_member, is_admin)
+from .pagination import paginate_keyset
+from .versioning import touch_lists, touch_households, forget_lists
+from .sqlite_engine import retry_on_busy
+from .autocomplete import FIELDS as SUGGESTION_FIELDS
+from . import search as full_text
+from .cloning import clone_list
+from .aisles import grouped_items, category_order, set_category_order
+from . import sync
+from .editing import save_item, EditConflict
+from . import provisioning
+
+# Versioned JSON API for mobile clients, next to the HTML 'main' blueprint.
+# Uses the same session login, permission helpers and form validation rules.
+# The batch endpoints take N items in one request and apply them with a
+# single bulk INSERT/UPDATE/DELETE in one transaction.
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_MAX_BATCH = 500
+# Every user is a password hash (about 0.1 s with scrypt) inside the request,
+# which gunicorn kills after GUNICORN_TIMEOUT (30 s); bulk runs use the CLI
+DEFAULT_MAX_PROVISION = 100
+MAX_SUGGESTIONS = 25
+
+
+@bp.errorhandler(HTTPException)
+def handle_http_error(error):
+    return jsonify(error=error.name, message=error.description), error.code
+
+
+def household_to_dict(household):
+    return {'id': household.id, 'name': household.name}
+
+
+def list_to_dict(shopping_list):
+    return {'id': shopping_list.id, 'name': shopping_list.name,
+            'date': shopping_list.date.isoformat(), 'household_id': shopping_list.household_id}
+
+
+def item_to_dict(item):
+    return {'id': item.id, 'name': item.name, 'category': item.category, 'amount': item.amount,
+            'free_text': item.free_text, 'bought': item.bought, 'version': item.version,
+            'shopping_list_id': item.shopping_list_id}
+
+
+def search_result_to_dict(result):
+    return {'kind': result.kind, 'list': list_to_dict(result.shopping_list),
+            'item': item_to_dict(result.item) if result.item is not None else None}
+
+
+def aisle_group_to_dict(group):
+    return {'category': group.category, 'position': group.position, 'count': group.count,
+            'to_buy': group.to_buy, 'items': [item_to_dict(item) for item in group.items]}
+
+
+def page_to_dict(page, serialize):
+    return {'data': [serialize(row) for row in page.items],
+            'next': page.next_cursor, 'prev': page.prev_cursor}
+
+
+def json_body():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, 'Expected a JSON object body.')
+    return data
+
+
+def batch_of(data, key):
+    values = data.get(key)
+    if not isinstance(values, list) or not values:
+        abort(400, f'"{key}" must be a non-empty list.')
+    if len(values) > current_app.config.get('API_MAX_BATCH', DEFAULT_MAX_BATCH):
+        abort(413, f'At most {current_app.config.get("API_MAX_BATCH", DEFAULT_MAX_BATCH)} entries per request.')
+    return values
+
+
+def batch_ids(data):
+    ids = batch_of(data, 'ids')
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        abort(400, '"ids" must be a list of integers.')
+    return set(ids)
+
+
+# Households
+
+@bp.route('/households')
+@login_required
+def households():
+    return jsonify(data=[household_to_dict(h) for h in current_user.households])
+
+
+@bp.route('/households/<int:household_id>/lists', methods=['GET'])
+@login_required
+def household_lists(household_id):
+    household = get_household_or_403(household_id)
+    page = paginate_keyset(household.shopping_lists, [ShoppingList.date, ShoppingList.id], descending=True,
+                           after=request.args.get('after'), before=request.args.get('before'))
+    return jsonify(page_to_dict(page, list_to_dict))
+
+
+@bp.route('/households/<int:household_id>/lists', methods=['POST'])
+@login_required
+@retry_on_busy()
+def create_list(household_id):
+    household = get_household_or_403(household_id)
+    form = validate_form(CreateShoppingListForm, json_body())
+    if form.errors:
+        return jsonify(error='Bad Request', errors=form.errors), 400
+    shopping_list = ShoppingList(name=form.name.data, date=form.date.data, household_id=household.id)
+    db.session.add(shopping_list)
+    touch_households(household.id)
+    db.session.commit()
+    return jsonify(list_to_dict(shopping_list)), 201
+
+
+@bp.route('/households/<int:household_id>/suggestions')
+@login_required
+def suggestions(household_id):
+    """Autocomplete: ?q=<prefix>&field=name|category[&limit=N], most used first."""
+    if not is_household_member(household_id):
+        abort(403)
+    field = request.args.get('field', 'name')
+    if field not in SUGGESTION_FIELDS:
+        abort(400, '"field" must be "name" or "category".')
+    limit = max(1, min(request.args.get('limit', 10, type=int), MAX_SUGGESTIONS))
+    return jsonify(data=autocomplete.suggest(household_id, field, request.args.get('q', ''), limit))
+
+
+@bp.route('/households/<int:household_id>/aisles', methods=['GET'])
+@login_required
+def aisle_order(household_id):
+    """{"categories": [...in walking order], "unordered": [...used by items but not placed]}"""
+    household = get_household_or_403(household_id)
+    ordered, unordered = category_order(household.id)
+    return jsonify(categories=ordered, unordered=unordered)
+
+
+@bp.route('/households/<int:household_id>/aisles', methods=['PUT'])
+@login_required
+@retry_on_busy()
+def set_aisle_order(household_id):
+    """Replace the walking order: {"categories": ["Produce", "Bakery", ...]}"""
+    household = get_household_or_403(household_id)
+    names = json_body().get('categories')
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        abort(400, '"categories" must be a list of strings.')
+    if len(names) > current_app.config.get('API_MAX_BATCH', DEFAULT_MAX_BATCH):
+        abort(413, f'At most {current_app.config.get("API_MAX_BATCH", DEFAULT_MAX_BATCH)} entries per request.')
+    if any(len(name) > 50 for name in names):
+        abort(400, 'Category names are at most 50 characters.')
+    names = set_category_order(household.id, names)
+    db.session.commit()
+    return jsonify(categories=names)
+
+
+@bp.route('/households/<int:household_id>/sync', methods=['GET'])
+@login_required
+def sync_changes(household_id):
+    """Rows changed after ?since=<seq> (0 or absent: everything), in batches of ?limit=N."""
+    household = get_household_or_403(household_id)
+    since = request.args.get('since', 0, type=int)
+    limit = max(1, min(request.args.get('limit', sync.DEFAULT_LIMIT, type=int),
+                       current_app.config.get('API_MAX_BATCH', DEFAULT_MAX_BATCH)))
+    if since < 0:
+        abort(400, '"since" must be a sequence number from an earlier sync.')
+    changes = sync.changes(household.id, since, limit)
+    return jsonify(lists=[list_to_dict(l) for l in changes.lists], items=[item_to_dict(i) for i in changes.items],
+                   deleted={'lists': changes.deleted_lists, 'items': changes.deleted_items},
+                   since=changes.since, more=changes.more)
+
+
+@bp.route('/households/<int:household_id>/sync', methods=['POST'])
+@login_required
+@retry_on_busy()
+def sync_upload(household_id):
+    """Apply offline edits: {"lists": {"create", "update", "delete"}, "items": {"create", "update", "delete"}}"""
+    household = get_household_or_403(household_id)
+    data = json_body()
+    groups = {}
+    for key in ('lists', 'items'):
+        group = data.get(key, {})
+        if not isinstance(group, dict) or not all(isinstance(group.get(op, []), list)
+                                                  for op in ('create', 'update', 'delete')):
+            abort(400, f'"{key}" must be an object of "create", "update" and "delete" lists.')
+        groups[key] = group
+    size = sum(len(group.get(op, [])) for group in groups.values() for op in ('create', 'update', 'delete'))
+    if size > current_app.config.get('API_MAX_BATCH', DEFAULT_MAX_BATCH):
+        abort(413, f'At most {current_app.config.get("API_MAX_BATCH", DEFAULT_MAX_BATCH)} entries per request.')
+    try:
+        result = sync.apply_upload(household, groups['lists'], groups['items'])
+    except sync.UploadError as error:
+        db.session.rollback()
+        return jsonify(error='Bad Request', errors=error.errors), 400
+    conflicts = [item_to_dict(item) for item in result['conflicts']] # Before the commit expires them
+    db.session.commit()
+    return jsonify({**result, 'conflicts': conflicts})
+
+
+# Lists
+
+@bp.route('/lists/<int:list_id>', methods=['GET'])
+@login_required
+def get_list(list_id):
+    return jsonify(list_to_dict(get_list_or_403(list_id)))
+
+
+@bp.route('/lists/<int:list_id>/clone', methods=['POST'])
+@login_required
+@retry_on_busy()
+def clone(list_id):
+    """New list with copies of this one's items: {"name", "date", "only_unbought", "reset_bought"}"""
+    source = get_list_or_403(list_id)
+    data = json_body()
+    for flag in ('only_unbought', 'reset_bought'):
+        if not isinstance(data.get(flag, False), bool):
+            abort(400, f'"{flag}" must be true or false.')
+    form = validate_form(CloneShoppingListForm, {'name': source.name, **data})
+    if form.errors:
+        return jsonify(error='Bad Request', errors=form.errors), 400
+    shopping_list, copied = clone_list(source, form.name.data, form.date.data,
+                                       only_unbought=data.get('only_unbought', False),
+                                       reset_bought=data.get('reset_bought', False))
+    db.session.commit()
+    return jsonify({**list_to_dict(shopping_list), 'items_copied': copied}), 201
+
+
+@bp.route('/lists/<int:list_id>', methods=['DELETE'])
+@login_required
+@retry_on_busy()
+def delete_list(list_id):
+    shopping_list = get_list_or_403(list_id)
+    db.session.delete(shopping_list)
+    touch_households(shopping_list.household_id)
+    forget_lists(list_id)
+    db.session.commit()
+    return '', 204
+
+
+@bp.route('/lists/<int:list_id>/items', methods=['GET'])
+@login_required
+def list_items(list_id):
+    shopping_list = get_list_or_403(list_id)
+    page = paginate_keyset(shopping_list.items, [ShoppingItem.bought, ShoppingItem.name, ShoppingItem.id],
+                           after=request.args.get('after'), before=request.args.get('before'))
+    return jsonify(page_to_dict(page, item_to_dict))
+
+
+@bp.route('/lists/<int:list_id>/aisles', methods=['GET'])
+@login_required
+def list_aisles(list_id):
+    """All of the list's items grouped by category, in the household's walking order."""
+    groups, to_buy = grouped_items(get_list_or_403(list_id))
+    return jsonify(data=[aisle_group_to_dict(group) for group in groups], to_buy=to_buy)
+
+
+@bp.route('/lists/<int:list_id>/items', methods=['POST'])
+@login_required
+@retry_on_busy()
+def add_items(list_id):
+    """Add N items: {"items": [{"name": ..., "category": ..., ...}, ...]}"""
+    shopping_list = get_list_or_403(list_id)
+    entries = batch_of(json_body(), 'items')
+
+    rows, errors = [], {}
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            errors[index] = {'item': ['Expected a JSON object.']}
+            continue
+        form = validate_form(AddShoppingItemForm, entry)
+        if form.errors:
+            errors[index] = form.errors
+            continue
+        rows.append({'name': form.name.data, 'category': form.category.data, 'amount': form.amount.data,
+                     'free_text': form.free_text.data, 'bought': False, 'shopping_list_id': shopping_list.id})
+    if errors:
+        return jsonify(error='Bad Request', errors=errors), 400
+
+    # One executemany INSERT ... RETURNING for the whole batch, one commit.
+    items = db.session.scalars(insert(ShoppingItem).returning(ShoppingItem), rows).all()
+    touch_lists(shopping_list.id)
+    for item in items:
+        live_updates.publish(shopping_list.id, 'add', item_to_dict(item))
+    autocomplete.record(shopping_list.household_id, [(item.name, item.category) for item in items])
+    db.session.commit()
+    return jsonify(data=[item_to_dict(item) for item in items]), 201
+
+
+# Items
+
+@bp.route('/items/<int:item_id>', methods=['GET'])
+@login_required
+def get_item(item_id):
+    return jsonify(item_to_dict(get_item_or_403(item_id)))
+
+
+@bp.route('/items/<int:item_id>', methods=['PATCH'])
+@login_required
+@retry_on_busy()
+def edit_item(item_id):
+    """Change some fields; with the "version" that was read, a newer edit gets a 409 instead of being overwritten."""
+    item = get_item_or_403(item_id)
+    data = {**item_to_dict(item), **json_body()}
+    form = validate_form(EditShoppingItemForm, data)
+    errors = dict(form.errors)
+    if not isinstance(data['bought'], bool):
+        errors['bought'] = ['Must be true or false.']
+    if errors:
+        return jsonify(error='Bad Request', errors=errors), 400
+    previous = (item.name, item.category)
+    values = {'name': form.name.data, 'category': form.category.data, 'amount': form.amount.data,
+              'free_text': form.free_text.data, 'bought': data['bought']}
+    try:
+        # Conditional on the "version" the client read (default: the one just loaded)
+        save_item(item, values, form.version.data)
+    except EditConflict as conflict:
+        current = item_to_dict(conflict.item) # Before the rollback expires it
+        db.session.rollback()
+        return jsonify(error='Conflict', message='The item was changed since it was read.', current=current), 409
+    touch_lists(item.shopping_list_id)
+    if previous != (item.name, item.category):
+        autocomplete.record(item.shopping_list.household_id, [(item.name, item.category)], [previous])
+    live_updates.publish(item.shopping_list_id, 'edit', item_to_dict(item))
+    db.session.commit()
+    return jsonify(item_to_dict(item))
+
+
+@bp.route('/items/toggle', methods=['POST'])
+@login_required
+@retry_on_busy()
+def toggle_items():
+    """Flip (or, with "bought": true/false, set) the bought flag of N items."""
+    data = json_body()
+    ids = batch_ids(data)
+    bought = data.get('bought')
+    if bought is not None and not isinstance(bought, bool):
+        abort(400, '"bought" must be true, false or omitted.')
+
+    stmt = (update(ShoppingItem)
+            .where(ShoppingItem.id.in_(ids), ShoppingItem.shopping_list_id.in_(accessible_list_ids()))
+            .values(bought=~ShoppingItem.bought if bought is None else bought, version=ShoppingItem.version + 1)
+            .returning(ShoppingItem.id, ShoppingItem.bought, ShoppingItem.version, ShoppingItem.shopping_list_id)
+            .execution_options(synchronize_session=False))
+    changed = db.session.execute(stmt).all()
+    if len(changed) != len(ids):
+        db.session.rollback() # All or nothing
+        abort(404, 'Some items do not exist or are not accessible.')
+    touch_lists(*[row.shopping_list_id for row in changed])
+    for row in changed:
+        live_updates.publish(row.shopping_list_id, 'toggle', {'id': row.id, 'bought': row.bought})
+    db.session.commit()
+    return jsonify(data=[{'id': row.id, 'bought': row.bought, 'version': row.version} for row in changed])
+
+
+@bp.route('/items/delete', methods=['POST'])
+@login_required
+@retry_on_busy()
+def delete_items():
+    """Delete N items: {"ids": [...]}"""
+    ids = batch_ids(json_body())
+    stmt = (delete(ShoppingItem)
+            .where(ShoppingItem.id.in_(ids), ShoppingItem.shopping_list_id.in_(accessible_list_ids()))
+            .returning(ShoppingItem.id, ShoppingItem.shopping_list_id)
+            .execution_options(synchronize_session=False))
+    deleted = db.session.execute(stmt).all()
+    if len(deleted) != len(ids):
+        db.session.rollback()
+        abort(404, 'Some items do not exist or are not accessible.')
+    touch_lists(*[row.shopping_list_id for row in deleted])
+    for row in deleted:
+        live_updates.publish(row.shopping_list_id, 'delete', {'id': row.id})
+    db.session.commit()
+    return jsonify(deleted=sorted(ids))
+
+
+# Search
+
+@bp.route('/search')
+@login_required
+def search():
+    """Full-text search: ?q=...[&household_id=N][&after=cursor], best match first."""
+    scope = full_text.scope(request.args.get('household_id', type=int))
+    page = full_text.search(request.args.get('q', ''), scope, after=request.args.get('after'))
+    return jsonify(page_to_dict(page, search_result_to_dict))
+
+
+# Admin
+
+@bp.route('/admin/provision', methods=['POST'])
+@login_required
+@retry_on_busy(immediate=False)
+def provision_users():
+    """Create users in bulk: {"users": [{"username", "email", "password", "households": [...]}, ...]}
+
+    Admins only (ADMIN_EMAILS). Same rules and report as `flask provision users`.
+    """
+    if not is_admin():
+        abort(403)
+    users = json_body().get('users')
+    if not isinstance(users, list) or not users:
+        abort(400, '"users" must be a non-empty list.')
+    limit = current_app.config.get('PROVISION_MAX_USERS', DEFAULT_MAX_PROVISION)
+    if len(users) > limit:
+        abort(413, f'At most {limit} users per request; use `flask provision users` for more.')
+    # The login check may have opened a transaction; end it so no lock is held
+    # while the passwords are hashed, then check and insert in one short one
+    db.session.commit()
+    prepared = provisioning.prepare(enumerate(users, 1)) # Hashed in the shared PASSWORD_HASH_WORKERS pool
+    report = provisioning.write(prepared)
+    db.session.commit()
+    status = 201 if report.count('created') else 200
+    return jsonify({**report.summary(), 'households': report.households, 'rows': report.rows}), status
@@ -0,0 +1,169 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, select, func
+
+# Item name / category suggestions for the add and edit item forms.
+# Each household gets a PrefixIndex per field: its distinct values, case-folded
+# and kept in a sorted list, so the values starting with what the user typed
+# are one bisect away and no keystroke ever reaches the database (no LIKE).
+# Matches are ranked by how often the household used them. An index is built
+# on first use from one GROUP BY over the household's items and kept in a
+# per-worker LRU. Items added or edited through this worker update the cached
+# index after their transaction commits; changes made by other workers (and
+# deletions) show up when the entry expires after AUTOCOMPLETE_TTL seconds.
+#
+# Config: AUTOCOMPLETE_MAX_HOUSEHOLDS (default 256), AUTOCOMPLETE_TTL (default 600).
+
+FIELDS = ('name', 'category')
+DEFAULT_LIMIT = 10
+DEFAULT_MAX_HOUSEHOLDS = 256
+DEFAULT_TTL = 600
+
+
+def normalize(value):
+    """Key for a name/category: collapsed whitespace, case-folded; None for blanks."""
+    value = ' '.join((value or '').split())
+    return value.casefold() or None
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.keys = []  # Sorted, distinct
+        self.counts = {}  # key -> uses
+        self.spellings = {}  # key -> Counter of how it was typed
+
+    def add(self, value, uses=1):
+        key = normalize(value)
+        if key is None:
+            return
+        if key not in self.counts:
+            insort(self.keys, key)
+            self.counts[key] = 0
+            self.spellings[key] = Counter()
+        self.counts[key] += uses
+        self.spellings[key][' '.join(value.split())] += uses
+
+    def remove(self, value):
+        key = normalize(value)
+        if key not in self.counts:
+            return
+        self.counts[key] -= 1
+        spelling = ' '.join(value.split())
+        self.spellings[key][spelling] -= 1
+        if self.spellings[key][spelling] <= 0:
+            del self.spellings[key][spelling]
+        if self.counts[key] <= 0:
+            del self.keys[bisect_left(self.keys, key)]
+            del self.counts[key], self.spellings[key]
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        """Most used values starting with `prefix`, in their most common spelling."""
+        prefix = normalize(prefix)
+        if prefix is None:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        best = heapq.nsmallest(limit, self.keys[start:end], key=lambda k: (-self.counts[k], k))
+        return [self.spellings[key].most_common(1)[0][0] for key in best]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Autocomplete:
+    """Configured by AUTOCOMPLETE_MAX_HOUSEHOLDS and AUTOCOMPLETE_TTL; one per app, in app.extensions['autocomplete']."""
+
+    def __init__(self, app=None, db=None):
+        self.max_households = DEFAULT_MAX_HOUSEHOLDS
+        self.ttl = DEFAULT_TTL
+        self.session = None
+        self._indexes = OrderedDict()  # household id -> (expires_at, {field: PrefixIndex})
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.session = db.session
+        self.max_households = app.config.get('AUTOCOMPLETE_MAX_HOUSEHOLDS', DEFAULT_MAX_HOUSEHOLDS)
+        self.ttl = app.config.get('AUTOCOMPLETE_TTL', DEFAULT_TTL)
+        # db.session is shared by every app create_app() builds; listen once and
+        # apply the writes to the Autocomplete of the app committing them
+        for name, listener in (('after_commit', _after_commit), ('after_soft_rollback', _after_rollback)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+        app.extensions['autocomplete'] = self
+
+    def suggest(self, household_id, field, prefix, limit=DEFAULT_LIMIT):
+        indexes = self._get(household_id)
+        if indexes is None:
+            indexes = self._build(household_id)
+        with self._lock:  # Lookups are short; this keeps them off a half-applied update
+            return indexes[field].lookup(prefix, limit)
+
+    def record(self, household_id, added=(), removed=()):
+        """Queue (name, category) pairs written to the household; applied if the transaction commits."""
+        pending = self.session.info.setdefault('autocomplete', [])
+        pending.append((household_id, list(added), list(removed)))
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def _get(self, household_id):
+        with self._lock:
+            entry = self._indexes.get(household_id)
+            if entry is None:
+                return None
+            expires_at, indexes = entry
+            if expires_at <= time.monotonic():
+                del self._indexes[household_id]
+                return None
+            self._indexes.move_to_end(household_id)
+            return indexes
+
+    def _build(self, household_id):
+        from .models import ShoppingList, ShoppingItem
+        indexes = {field: PrefixIndex() for field in FIELDS}
+        rows = self.session.execute(
+            select(ShoppingItem.name, ShoppingItem.category, func.count())
+            .join(ShoppingList, ShoppingList.id == ShoppingItem.shopping_list_id)
+            .where(ShoppingList.household_id == household_id)
+            .group_by(ShoppingItem.name, ShoppingItem.category))
+        for name, category, uses in rows:
+            indexes['name'].add(name, uses)
+            indexes['category'].add(category, uses)
+        with self._lock:
+            self._indexes[household_id] = (time.monotonic() + self.ttl, indexes)
+            while len(self._indexes) > self.max_households:
+                self._indexes.popitem(last=False)  # Least recently used
+        return indexes
+
+    def apply(self, pending):
+        """Apply committed (household id, added, removed) writes to the cached indexes."""
+        with self._lock:
+            for household_id, added, removed in pending:
+                entry = self._indexes.get(household_id)
+                if entry is None:
+                    continue  # Not cached; the next build reads it from the database
+                indexes = entry[1]
+                for name, category in removed:
+                    indexes['name'].remove(name)
+                    indexes['category'].remove(category)
+                for name, category in added:
+                    indexes['name'].add(name)
+                    indexes['category'].add(category)
+
+
+def _after_commit(session):
+    pending = session.info.pop('autocomplete', None)
+    if pending:
+        current_app.extensions['autocomplete'].apply(pending)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('autocomplete', None)
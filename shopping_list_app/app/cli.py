@@ -0,0 +1,170 @@
+import contextlib
+import json
+import os
+import time
+
+import click
+from flask.cli import AppGroup
+
+from .extensions import db, fragment_cache
+
+# Maintenance commands, registered on the app by create_app() (`flask <group> <command>`).
+
+fragment_cache_cli = AppGroup('fragment-cache', help='Inspect or clear the rendered fragment cache.')
+
+
+@fragment_cache_cli.command('stats')
+def fragment_cache_stats():
+    """Print backend size and hit/miss counters as JSON.
+
+    Hit/miss counters are per process; the sqlite backend also reports totals
+    shared by all workers (shared_hits / shared_misses).
+    """
+    click.echo(json.dumps(fragment_cache.stats(), indent=2))
+
+
+@fragment_cache_cli.command('clear')
+def fragment_cache_clear():
+    """Drop every cached fragment."""
+    fragment_cache.clear()
+    click.echo('Fragment cache cleared.')
+
+
+import_cli = AppGroup('import', help='Bulk-load data exported from other tools.')
+
+
+@import_cli.command('items')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--household', 'household_id', type=int, required=True, help='Household that receives the lists.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format (default: from the file extension).')
+@click.option('--batch-size', type=click.IntRange(min=1), default=1000, show_default=True,
+              help='Rows per INSERT/commit.')
+@click.option('--restart', is_flag=True, help='Ignore saved progress and start again from the first row.')
+def import_items(source, household_id, fmt, batch_size, restart):
+    """Import lists and items from a CSV or JSON Lines file.
+
+    Columns / keys: list, date (YYYY-MM-DD), name, category, amount,
+    free_text, bought. Invalid rows are reported and skipped. Re-running the
+    same file for the same household resumes after the last committed batch.
+    """
+    from .models import Household
+    from .importer import ItemImporter, read_rows
+
+    household = db.session.get(Household, household_id)
+    if household is None:
+        raise click.ClickException(f'No household with id {household_id}.')
+    if fmt is None:
+        fmt = 'csv' if source.lower().endswith('.csv') else 'jsonl'
+
+    def report_batch(job, rows_per_second):
+        click.echo(f'{job.rows_done} rows read, {job.items_imported} items imported, '
+                   f'{job.rows_rejected} rejected ({rows_per_second:,.0f} rows/s)', err=True)
+
+    def report_reject(number, errors):
+        click.echo(f'row {number} rejected: {json.dumps(errors)}', err=True)
+
+    key = '<stdin>' if source == '-' else os.path.abspath(source)
+    importer = ItemImporter(household, key, batch_size, on_batch=report_batch, on_reject=report_reject)
+    started = time.perf_counter()
+    if source == '-':
+        stream = contextlib.nullcontext(click.get_text_stream('stdin'))
+    else:
+        stream = open(source, encoding='utf-8', newline='') # newline='' lets csv handle quoted newlines
+    with stream as stream:
+        job = importer.job()
+        if job.finished and not restart:
+            raise click.ClickException(f'{source} was already imported into this household (use --restart).')
+        if job.rows_done and not restart:
+            click.echo(f'Resuming after row {job.rows_done}.', err=True)
+        job = importer.run(read_rows(stream, fmt), restart=restart)
+    click.echo(f'Imported {job.items_imported} items from {job.rows_done} rows '
+               f'({job.rows_rejected} rejected) in {time.perf_counter() - started:.1f}s.')
+
+
+export_cli = AppGroup('export', help='Write data out in the import format.')
+
+
+@export_cli.command('household')
+@click.argument('household_id', type=int)
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8', lazy=True), default='-',
+              help='File to write (default: stdout).')
+def export_household(household_id, fmt, output):
+    """Stream every list and item of a household as CSV or JSON Lines."""
+    from .models import Household
+    from .exporter import generate
+
+    if db.session.get(Household, household_id) is None:
+        raise click.ClickException(f'No household with id {household_id}.')
+    for chunk in generate(fmt, household_id):
+        output.write(chunk)
+
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+
+@search_cli.command('rebuild')
+def rebuild_search_index():
+    """Re-index every list and item (after a restore, or if search results look stale)."""
+    from .search import rebuild
+
+    started = time.perf_counter()
+    count = rebuild()
+    click.echo(f'Indexed {count} lists and items in {time.perf_counter() - started:.1f}s.')
+
+
+provision_cli = AppGroup('provision', help='Create users and households in bulk.')
+
+
+@provision_cli.command('users')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Input format (default: from the file extension).')
+@click.option('--batch-size', type=click.IntRange(min=1), default=500, show_default=True,
+              help='Rows per uniqueness query / INSERT.')
+@click.option('--workers', type=click.IntRange(min=0),
+              help='Processes hashing passwords (default: one per CPU; 0 hashes inline).')
+@click.option('--report', type=click.File('w', encoding='utf-8', lazy=True),
+              help='Write a JSON Lines report with one line per input row.')
+def provision_users(source, fmt, batch_size, workers, report):
+    """Create users and their household memberships from a CSV or JSON Lines file.
+
+    Columns / keys: username, email, password, households. households is
+    ';'-separated: '#<id>' joins an existing household, any other entry names
+    a household to create (once per name). Rows whose username or email is
+    taken, or repeats an earlier row, are reported and skipped. Everything
+    else is created in one transaction.
+    """
+    from .importer import read_rows
+    from .provisioning import provision
+
+    if fmt is None:
+        fmt = 'csv' if source.lower().endswith('.csv') else 'jsonl'
+    started = time.perf_counter()
+    if source == '-':
+        stream = contextlib.nullcontext(click.get_text_stream('stdin'))
+    else:
+        stream = open(source, encoding='utf-8', newline='') # newline='' lets csv handle quoted newlines
+    with stream as stream:
+        result = provision(read_rows(stream, fmt), batch_size=batch_size,
+                           workers=(os.cpu_count() or 1) if workers is None else workers)
+    db.session.commit()
+    for row in result.rows:
+        if row['status'] != 'created':
+            click.echo(f"row {row['row']} {row['status']}: {json.dumps(row.get('errors') or row.get('reasons'))}",
+                       err=True)
+        if report is not None:
+            report.write(json.dumps(row) + '\n')
+    summary = result.summary()
+    click.echo(f"Created {summary['created']} users and {summary['households_created']} households "
+               f"({summary['duplicate']} duplicates, {summary['invalid']} invalid) "
+               f"in {time.perf_counter() - started:.1f}s.")
+
+
+def register_commands(app):
+    app.cli.add_command(fragment_cache_cli)
+    app.cli.add_command(import_cli)
+    app.cli.add_command(export_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(provision_cli)
@@ -0,0 +1,38 @@
+from sqlalchemy import select, insert, literal, false
+
+from .models import ShoppingList, ShoppingItem
+from .extensions import db
+from .versioning import touch_lists, touch_households
+
+# "Reuse last week's list": a new list with a copy of another list's items.
+# The copy is a single INSERT ... SELECT, so items never pass through Python
+# and the cost on this side is the same for 5 items or 5000. Any list can be
+# the source, which is how template lists ("Weekly staples") are used.
+# New item rows reach the search index through its triggers (search.py).
+# The new list is touched like any other list whose items changed, so its
+# version (ETag, fragment cache key) moves past the one it was created with.
+
+
+def clone_list(source, name, date, only_unbought=False, reset_bought=False):
+    """Create a list in the source's household holding copies of its items.
+
+    Returns (new_list, items_copied). Runs in the caller's transaction.
+    """
+    shopping_list = ShoppingList(name=name, date=date, household_id=source.household_id)
+    db.session.add(shopping_list)
+    db.session.flush() # The new id goes into the SELECT below
+
+    copied = (select(literal(shopping_list.id), ShoppingItem.name, ShoppingItem.category, ShoppingItem.amount,
+                     ShoppingItem.free_text, false() if reset_bought else ShoppingItem.bought)
+              .where(ShoppingItem.shopping_list_id == source.id))
+    if only_unbought:
+        copied = copied.where(ShoppingItem.bought == false())
+    # Copied in the order the list shows them, which the (shopping_list_id, bought, name)
+    # index already holds; ordering by id alone would sort every row first
+    copied = copied.order_by(ShoppingItem.bought, ShoppingItem.name, ShoppingItem.id)
+    result = db.session.execute(
+        insert(ShoppingItem).from_select(['shopping_list_id', 'name', 'category', 'amount', 'free_text', 'bought'],
+                                         copied))
+    touch_lists(shopping_list.id)
+    touch_households(source.household_id)
+    return shopping_list, result.rowcount
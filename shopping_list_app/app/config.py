@@ -0,0 +1,82 @@
+import os
+
+# Named configuration profiles for create_app() (see app/__init__.py).
+# APP_CONFIG picks one when the caller doesn't: 'prod' (default), 'dev' or
+# 'test'. Profiles read the environment when they are loaded, not when this
+# module is imported, so gunicorn_config.py can still set DB_POOL_SIZE etc.
+# before the app is built. SQLALCHEMY_DATABASE_URI left as None means the
+# instance folder's app.db.
+
+DEFAULT_PROFILE = 'prod'
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_list(name):
+    return [v.strip() for v in os.environ.get(name, '').split(',') if v.strip()]
+
+
+def prod():
+    config = {
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'your_secret_key_here'),
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL') or None,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # 'sqlite' shares rendered fragments between gunicorn workers
+        'FRAGMENT_CACHE_BACKEND': os.environ.get('FRAGMENT_CACHE_BACKEND', 'memory'),
+        # How long (seconds) a worker may serve a cached login identity
+        'USER_CACHE_TTL': _env_int('USER_CACHE_TTL', 60),
+        # Password hashing policy; hashes made under an older one are upgraded at login
+        'PASSWORD_HASH_METHOD': os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        'PASSWORD_HASH_WORKERS': _env_int('PASSWORD_HASH_WORKERS', 1),
+        # Users allowed to call the admin API (comma-separated emails)
+        'ADMIN_EMAILS': _env_list('ADMIN_EMAILS'),
+        # 'sqlite' fans live list updates out to every gunicorn worker (gunicorn_config.py sets it)
+        'LIVE_UPDATES_BACKEND': os.environ.get('LIVE_UPDATES_BACKEND', 'memory'),
+    }
+    # Connection pool per worker, sized by gunicorn_config.py from its worker/thread count
+    if os.environ.get('DB_POOL_SIZE') and ':memory:' not in (config['SQLALCHEMY_DATABASE_URI'] or ''):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ['DB_POOL_SIZE']),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 0),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        }
+    return config
+
+
+def dev():
+    # prod's settings, plus the debugger and inline password hashing (no pool to start)
+    config = prod()
+    config.update(DEBUG=True, PASSWORD_HASH_WORKERS=_env_int('PASSWORD_HASH_WORKERS', 0))
+    return config
+
+
+def test():
+    # Fixed; the environment of whoever runs the suite must not leak into it
+    return {
+        'TESTING': True,
+        'SECRET_KEY': 'test_secret_key',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'WTF_CSRF_ENABLED': False,
+        'USER_CACHE_ENABLED': False,  # User ids restart with every in-memory database
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',  # Cheap hashes keep the suite fast
+        'PASSWORD_HASH_WORKERS': 0,  # Hash inline
+        'FRAGMENT_CACHE_BACKEND': 'memory',
+        'LIVE_UPDATES_BACKEND': 'memory',
+        'ADMIN_EMAILS': [],
+    }
+
+
+PROFILES = {'prod': prod, 'dev': dev, 'test': test}
+
+
+def load(name=None):
+    """Settings dict of the named profile (APP_CONFIG, else prod)."""
+    name = name or os.environ.get('APP_CONFIG') or DEFAULT_PROFILE
+    try:
+        return PROFILES[name]()
+    except KeyError:
+        raise ValueError(f'Unknown config profile: {name!r} (expected one of {", ".join(PROFILES)})') from None
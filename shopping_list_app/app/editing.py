@@ -0,0 +1,46 @@
+from flask import abort
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .models import ShoppingItem
+from .extensions import db
+
+# Optimistic concurrency for item edits.
+# ShoppingItem.version moves on every write to the item (toggles included).
+# An edit carries the version the editor started from and is saved with one
+#   UPDATE shopping_items SET ..., version = version + 1 WHERE id = ? AND version = ?
+# so nothing is locked while someone has the form open. If another member
+# saved in between, no row matches: nothing is written and the caller gets an
+# EditConflict holding the item as it is now, to show the user (HTML) or send
+# back for the client to merge (API, 409).
+
+FIELDS = ('name', 'category', 'amount', 'free_text', 'bought')
+
+
+class EditConflict(Exception):
+    def __init__(self, item):
+        super().__init__(item.id)
+        self.item = item  # Reloaded, as it is now
+
+
+def save_item(item, values, version=None):
+    """Write `values` to `item` if it is still at `version` (default: as loaded); returns the new version.
+
+    `item` is updated in place without another query, so it can be rendered afterwards.
+    """
+    expected = item.version if version is None else version
+    new_version = db.session.scalar(
+        update(ShoppingItem)
+        .where(ShoppingItem.id == item.id, ShoppingItem.version == expected)
+        .values(**values, version=ShoppingItem.version + 1)
+        .returning(ShoppingItem.version)
+        .execution_options(synchronize_session=False))
+    if new_version is None:
+        current = db.session.get(ShoppingItem, item.id, populate_existing=True)
+        if current is None:
+            abort(404) # Deleted meanwhile
+        raise EditConflict(current)
+    for key, value in values.items():
+        set_committed_value(item, key, value)
+    set_committed_value(item, 'version', new_version)
+    return new_version
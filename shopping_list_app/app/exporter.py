@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from .models import ShoppingList, ShoppingItem
+from .extensions import db
+
+# Streaming export of a household's whole history (every list and item).
+# One ordered LEFT JOIN, read with yield_per so the driver hands rows over in
+# chunks as the cursor steps through them. The generators below turn those
+# rows into CSV / JSON Lines text a buffer at a time; nothing ever holds the
+# full result. Columns match the import format (importer.py), so an export
+# can be imported into another household as is; the importer creates a list
+# without items from its row with no name.
+
+EXPORT_COLUMNS = ('list', 'date', 'name', 'category', 'amount', 'free_text', 'bought')
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+ROWS_PER_FETCH = 1000
+CHUNK_SIZE = 64 * 1024  # Characters of output per yielded chunk
+
+
+def history_rows(household_id, rows_per_fetch=ROWS_PER_FETCH):
+    """Yield one dict per item, oldest list first; a list without items yields one row with no name."""
+    stmt = (select(ShoppingList.name.label('list'), ShoppingList.date, ShoppingItem.name,
+                   ShoppingItem.category, ShoppingItem.amount, ShoppingItem.free_text, ShoppingItem.bought)
+            .outerjoin(ShoppingItem, ShoppingItem.shopping_list_id == ShoppingList.id)
+            .where(ShoppingList.household_id == household_id)
+            # Within a list, the page order (index on list_id, bought, name)
+            .order_by(ShoppingList.date, ShoppingList.id, ShoppingItem.bought, ShoppingItem.name, ShoppingItem.id)
+            .execution_options(yield_per=rows_per_fetch))
+    for row in db.session.execute(stmt):
+        yield {'list': row.list, 'date': row.date.strftime('%Y-%m-%d'), 'name': row.name,
+               'category': row.category, 'amount': row.amount, 'free_text': row.free_text,
+               'bought': row.bought}
+
+
+def generate_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    yield _drain(buffer) # Header goes out before the query has returned anything
+    for row in rows:
+        if row['bought'] is not None:
+            row['bought'] = int(row['bought'])
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def generate_jsonl(rows):
+    parts, size = [], CHUNK_SIZE # Full "buffer": the first row goes out on its own, right away
+    for row in rows:
+        line = json.dumps(row) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(parts)
+            parts, size = [], 0
+    yield ''.join(parts)
+
+
+def generate(fmt, household_id):
+    rows = history_rows(household_id)
+    return generate_csv(rows) if fmt == 'csv' else generate_jsonl(rows)
+
+
+def _drain(buffer):
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
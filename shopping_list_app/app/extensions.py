@@ -1,14 +1,23 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
+from werkzeug.local import LocalProxy
 
 db = SQLAlchemy()
-migrate = Migrate()
 login_manager = LoginManager()
 
+# create_app() gives every app its own instance of these in app.extensions;
+# the names below always find the current app's
+fragment_cache = LocalProxy(lambda: current_app.extensions['fragment_cache']) # Rendered HTML fragments, see fragment_cache.py
+user_cache = LocalProxy(lambda: current_app.extensions['user_cache']) # Identities for load_user, see user_cache.py
+live_updates = LocalProxy(lambda: current_app.extensions['live_updates']) # Server-Sent Events for open list pages, see live_updates.py
+autocomplete = LocalProxy(lambda: current_app.extensions['autocomplete']) # Item name/category suggestions, see autocomplete.py
+
 # Basic login manager configuration
 login_manager.login_view = 'main.login' # Corrected to main blueprint's login route
 login_manager.login_message_category = 'info'
+# JSON API requests get a plain 401 instead of a redirect to the login page
+login_manager.blueprint_login_views = {'api': None}
 
 # User loader function for Flask-Login
 # This needs to be here or imported after User model is defined,
@@ -18,5 +27,7 @@ login_manager.login_message_category = 'info'
 @login_manager.user_loader
 def load_user(user_id):
     # Import User model locally to avoid circular dependency if models imports db from here
+    from flask import current_app
     from .models import User
-    return User.query.get(int(user_id))
+    # Served from a per-worker TTL cache unless USER_CACHE_ENABLED is off
+    return user_cache.load(int(user_id), db.session, User, current_app.config)
@@ -1,14 +1,21 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, DateField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
+from werkzeug.datastructures import MultiDict
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, DateField, TextAreaField, IntegerField
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, ValidationError
+from wtforms.widgets import HiddenInput
 from .models import User # To check if username/email already exists
+from .aisles import normalize_category
 
-class RegistrationForm(FlaskForm):
+class ProvisionUserForm(FlaskForm):
+    # One row of a bulk provisioning file (see provisioning.py); uniqueness is
+    # checked there for the whole file at once instead of a query per row
     username = StringField('Username',
                            validators=[DataRequired(), Length(min=2, max=20)])
     email = StringField('Email',
                         validators=[DataRequired(), Email()])
     password = PasswordField('Password', validators=[DataRequired(), Length(min=6)])
+
+class RegistrationForm(ProvisionUserForm):
     confirm_password = PasswordField('Confirm Password',
                                      validators=[DataRequired(), EqualTo('password')])
     submit = SubmitField('Sign Up')
@@ -39,17 +46,41 @@ class CreateShoppingListForm(FlaskForm):
     date = DateField('Date', format='%Y-%m-%d', validators=[DataRequired()])
     submit = SubmitField('Create List')
 
+class CloneShoppingListForm(CreateShoppingListForm):
+    only_unbought = BooleanField('Only items not bought yet')
+    reset_bought = BooleanField('Mark copied items as not bought')
+    submit = SubmitField('Duplicate List')
+
+class CategoryOrderForm(FlaskForm):
+    categories = TextAreaField('Categories in the order you walk the store, one per line')
+    submit = SubmitField('Save Order')
+
+    def validate_categories(self, categories):
+        too_long = [line.strip() for line in (categories.data or '').splitlines() if len(line.strip()) > 50]
+        if too_long:
+            raise ValidationError(f'Category names are at most 50 characters: {too_long[0][:50]}...')
+
 class AddShoppingItemForm(FlaskForm):
     name = StringField('Item Name', validators=[DataRequired(), Length(min=1, max=100)])
-    category = StringField('Category', validators=[Length(max=50)])
+    category = StringField('Category', validators=[Length(max=50)], filters=[normalize_category])
     amount = StringField('Amount', validators=[Length(max=50)])
     free_text = StringField('Notes', validators=[Length(max=200)]) # Using StringField for TextArea-like behavior if not using specific TextArea field
     submit = SubmitField('Add Item')
 
 class EditShoppingItemForm(FlaskForm):
     name = StringField('Item Name', validators=[DataRequired(), Length(min=1, max=100)])
-    category = StringField('Category', validators=[Length(max=50)])
+    category = StringField('Category', validators=[Length(max=50)], filters=[normalize_category])
     amount = StringField('Amount', validators=[Length(max=50)])
     free_text = StringField('Notes', validators=[Length(max=200)])
     bought = BooleanField('Bought')
+    version = IntegerField(widget=HiddenInput(), validators=[Optional()]) # The version being edited, see editing.py
     submit = SubmitField('Update Item')
+
+def validate_form(form_class, data):
+    # Run the same WTForms rules as the HTML forms on a plain dict
+    # (a JSON object from the API, a row from an import file).
+    formdata = MultiDict({k: '' if v is None else v for k, v in data.items()
+                          if isinstance(v, (str, int, float, type(None)))})
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    form.validate()
+    return form
@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache for rendered HTML fragments (e.g. the <li> rows of a list page).
+# Keys embed the owning object's version (see app/versioning.py), so a bumped
+# version can never be served stale; invalidate_prefix() just frees the space
+# held by older versions. Two backends:
+#   memory - per-process LRU bounded by total size in bytes
+#   sqlite - a file shared by every gunicorn worker, bounded by entry count
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete_prefix(self, prefix):
+        pass
+
+    def clear(self):
+        pass
+
+    def record(self, hits, misses):
+        pass
+
+    def stats(self):
+        return {'entries': 0, 'bytes': 0}
+
+
+class MemoryBackend(NullBackend):
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._data[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False) # Least recently used
+                self._size -= len(evicted)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                self._size -= len(self._data.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'bytes': self._size}
+
+
+class SQLiteBackend(NullBackend):
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS fragments '
+        '(key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_fragments_accessed ON fragments (accessed)',
+        'CREATE TABLE IF NOT EXISTS fragment_stats '
+        '(id INTEGER PRIMARY KEY CHECK (id = 1), hits INTEGER NOT NULL, misses INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO fragment_stats (id, hits, misses) VALUES (1, 0, 0)',
+    )
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        # One connection per thread (and per forked worker, see _conn)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @property
+    def _conn(self):
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.conn = self._connect()
+            self._local.pid = pid
+        return self._local.conn
+
+    def get(self, key):
+        row = self._conn.execute('SELECT value FROM fragments WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        conn = self._conn
+        conn.execute('INSERT OR REPLACE INTO fragments (key, value, accessed) VALUES (?, ?, ?)',
+                     (key, value, time.time()))
+        # Trim the oldest entries once in a while rather than on every write
+        self._writes += 1
+        if self._writes % 64 == 0:
+            conn.execute('DELETE FROM fragments WHERE key IN (SELECT key FROM fragments '
+                         'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def delete_prefix(self, prefix):
+        # Range scan on the primary key instead of LIKE
+        self._conn.execute('DELETE FROM fragments WHERE key >= ? AND key < ?', (prefix, prefix + '\uffff'))
+
+    def clear(self):
+        self._conn.execute('DELETE FROM fragments')
+        self._conn.execute('UPDATE fragment_stats SET hits = 0, misses = 0')
+
+    def record(self, hits, misses):
+        self._conn.execute('UPDATE fragment_stats SET hits = hits + ?, misses = misses + ? WHERE id = 1',
+                           (hits, misses))
+
+    def stats(self):
+        entries, size = self._conn.execute('SELECT count(*), coalesce(sum(length(value)), 0) FROM fragments').fetchone()
+        hits, misses = self._conn.execute('SELECT hits, misses FROM fragment_stats WHERE id = 1').fetchone()
+        return {'entries': entries, 'bytes': size, 'shared_hits': hits, 'shared_misses': misses}
+
+
+class FragmentCache:
+    """Front end used by the views; configured from FRAGMENT_CACHE_* settings.
+
+    One per app, in app.extensions['fragment_cache'] (extensions.fragment_cache
+    finds the current app's).
+    """
+
+    # Hit/miss counts are pushed to shared backends in batches of this many lookups
+    FLUSH_EVERY = 50
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.hits = 0
+        self.misses = 0
+        self._unflushed = [0, 0]
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get('FRAGMENT_CACHE_BACKEND', 'memory')
+        if kind == 'memory':
+            self.backend = MemoryBackend(app.config.get('FRAGMENT_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+        elif kind == 'sqlite':
+            path = app.config.get('FRAGMENT_CACHE_PATH') or os.path.join(app.instance_path, 'fragments.db')
+            self.backend = SQLiteBackend(path, app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+        elif kind in (None, 'null', 'none'):
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown FRAGMENT_CACHE_BACKEND: {kind!r}')
+        app.extensions['fragment_cache'] = self
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._unflushed[0 if hit else 1] += 1
+            if sum(self._unflushed) < self.FLUSH_EVERY:
+                return
+            hits, misses = self._unflushed
+            self._unflushed = [0, 0]
+        self.backend.record(hits, misses)
+
+    def get_or_render(self, key, render):
+        """Return (html, hit) for `key`, calling render() and storing the result on a miss."""
+        value = self.backend.get(key)
+        if value is not None:
+            self._count(True)
+            return value, True
+        self._count(False)
+        value = str(render())
+        self.backend.set(key, value)
+        return value, False
+
+    def invalidate_prefix(self, prefix):
+        self.backend.delete_prefix(prefix)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+            self._unflushed = [0, 0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'backend': type(self.backend).__name__, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None, **self.backend.stats()}
@@ -0,0 +1,163 @@
+import csv
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import select, insert
+
+from .models import ShoppingList, ShoppingItem, ImportJob
+from .forms import AddShoppingItemForm, CreateShoppingListForm, validate_form
+from .extensions import db, autocomplete
+from .versioning import touch_lists, touch_households
+
+# Streaming bulk import of lists and items (`flask import items`, see cli.py).
+# One input row is one item plus the list it belongs to:
+#   list, date (YYYY-MM-DD), name, category, amount, free_text, bought
+# as CSV with a header line or as JSON Lines. Rows are validated with the
+# same forms as the HTML pages and inserted with one executemany INSERT per
+# batch; lists are created the first time a (list, date) pair shows up.
+# A row that has no item fields at all only creates its list; that is how an
+# export (exporter.py) carries a list without items.
+# Only the current batch is held in memory.
+#
+# Progress lives in an ImportJob row that is updated in the same transaction
+# as each batch, so after a crash a re-run skips exactly the rows that were
+# committed and carries on from there.
+
+DEFAULT_BATCH_SIZE = 1000
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'x')
+ITEM_FIELDS = ('name', 'category', 'amount', 'free_text')
+
+
+def read_rows(stream, fmt):
+    """Yield (row_number, row) pairs; row is None if a JSON line does not parse."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), 1):
+            yield number, row
+        return
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def parse_bought(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+class ItemImporter:
+    def __init__(self, household, source, batch_size=DEFAULT_BATCH_SIZE, on_batch=None, on_reject=None):
+        self.household = household
+        self.source = source
+        self.batch_size = batch_size
+        self.on_batch = on_batch or (lambda job, rows_per_second: None)
+        self.on_reject = on_reject or (lambda number, errors: None)
+        self.lists = None
+        self.list_forms = {}
+
+    def job(self, restart=False):
+        job = ImportJob.query.filter_by(household_id=self.household.id, source=self.source).first()
+        if job is None:
+            job = ImportJob(household_id=self.household.id, source=self.source,
+                            rows_done=0, items_imported=0, rows_rejected=0, finished=False)
+            db.session.add(job)
+        elif restart:
+            job.rows_done = job.items_imported = job.rows_rejected = 0
+            job.finished = False
+        db.session.commit()
+        return job
+
+    def run(self, rows, restart=False):
+        """Import `rows` (from read_rows) and return the finished ImportJob."""
+        job = self.job(restart)
+        skip = job.rows_done
+        # (name, date) -> id for the household's lists; one entry per list, not per item
+        self.lists = {}
+        for list_id, name, date in db.session.execute(
+                select(ShoppingList.id, ShoppingList.name, ShoppingList.date)
+                .where(ShoppingList.household_id == self.household.id).order_by(ShoppingList.id)):
+            self.lists.setdefault((name, date.date()), list_id)
+
+        batch, touched, rejected, created = [], set(), 0, False
+        last = skip
+        started = time.perf_counter()
+        for number, row in rows:
+            if number <= skip:
+                continue # Committed by an earlier run
+            last = number
+            values, errors = self.validate(row)
+            if errors:
+                rejected += 1
+                self.on_reject(number, errors)
+            else:
+                list_id, new = self.list_id(values.pop('list_key'))
+                created = created or new
+                if values:
+                    values['shopping_list_id'] = list_id
+                    touched.add(list_id)
+                    batch.append(values)
+            if len(batch) >= self.batch_size:
+                self.commit(job, batch, touched, rejected, created, last, started)
+                batch, touched, rejected, created = [], set(), 0, False
+                started = time.perf_counter()
+        self.commit(job, batch, touched, rejected, created, last, started, finished=True)
+        return job
+
+    def validate(self, row):
+        if not isinstance(row, dict):
+            return None, {'row': ['Not a JSON object.']}
+        list_key, errors = self.validate_list(row.get('list'), row.get('date'))
+        if not any(row.get(k) for k in ITEM_FIELDS):
+            return (None, errors) if errors else ({'list_key': list_key}, {}) # Just the list
+        form = validate_form(AddShoppingItemForm, {k: row.get(k) for k in ITEM_FIELDS})
+        errors = {**errors, **form.errors}
+        if errors:
+            return None, errors
+        return {'name': form.name.data, 'category': form.category.data or None,
+                'amount': form.amount.data or None, 'free_text': form.free_text.data or None,
+                'bought': parse_bought(row.get('bought')), 'list_key': list_key}, {}
+
+    def validate_list(self, name, date):
+        # Thousands of rows share a handful of lists; validate each pair once
+        key = (name, date)
+        if key not in self.list_forms:
+            form = validate_form(CreateShoppingListForm, {'name': name, 'date': date})
+            if form.errors:
+                self.list_forms[key] = (None, {f'list_{k}': v for k, v in form.errors.items()})
+            else:
+                self.list_forms[key] = ((form.name.data, form.date.data), {})
+        return self.list_forms[key]
+
+    def list_id(self, key):
+        if key in self.lists:
+            return self.lists[key], False
+        name, date = key
+        list_id = db.session.scalar(insert(ShoppingList).returning(ShoppingList.id).values(
+            name=name, date=datetime.combine(date, datetime.min.time()), household_id=self.household.id))
+        self.lists[key] = list_id
+        return list_id, True
+
+    def commit(self, job, batch, touched, rejected, created, last, started, finished=False):
+        if batch:
+            db.session.execute(insert(ShoppingItem), batch) # executemany
+            touch_lists(*touched)
+            autocomplete.record(self.household.id, [(row['name'], row['category']) for row in batch])
+        if created:
+            touch_households(self.household.id)
+        consumed = last - job.rows_done
+        job.rows_done = last
+        job.items_imported += len(batch)
+        job.rows_rejected += rejected
+        job.finished = finished
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        if consumed:
+            elapsed = time.perf_counter() - started
+            self.on_batch(job, consumed / elapsed if elapsed else 0.0)
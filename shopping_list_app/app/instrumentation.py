@@ -0,0 +1,145 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request, current_app
+from sqlalchemy import event
+
+from .extensions import db
+
+# Per-request SQL accounting.
+# Engine events time every statement and add it to the stats of the
+# request that ran it (kept on flask.g). After the request the totals go out
+# as a Server-Timing header (visible in the browser's network panel) and as
+# one JSON log line on the 'shopping_list.requests' logger. A statement text
+# that repeats SQL_REPEAT_THRESHOLD times or more in one request is almost
+# always a lazy load inside a loop (N+1); it is logged as a warning.
+# The cost per statement is two perf_counter() calls and a dict update.
+#
+# Config: SQL_METRICS_ENABLED (default True), SQL_METRICS_LOG (default True),
+# SQL_REPEAT_THRESHOLD (default 5).
+
+logger = logging.getLogger('shopping_list.requests')
+
+DEFAULT_REPEAT_THRESHOLD = 5
+# Transaction control and connection setup are not queries the app asked for
+IGNORED_PREFIXES = ('BEGIN', 'PRAGMA', 'SAVEPOINT', 'RELEASE', 'ROLLBACK')
+
+_captures = []  # Active capture_queries() blocks (tests); usually empty
+_captures_lock = threading.Lock()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold):
+        """Statements run `threshold` times or more, most frequent first."""
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+
+def init_app(app):
+    if not app.config.get('SQL_METRICS_ENABLED', True):
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if not logger.handlers and not logging.getLogger().handlers:
+        # Nothing configured logging (plain gunicorn): one JSON object per line on stderr
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if statement.startswith(IGNORED_PREFIXES):
+        return
+    elapsed = time.perf_counter() - started
+    if _captures:
+        with _captures_lock:
+            for capture in _captures:
+                capture.append(statement)
+    if has_app_context():
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats.add(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time, or it stays on the pooled connection and skews every later timing.
+    # No statement means the error came from connecting or fetching, which
+    # before_cursor_execute did not see.
+    conn = exception_context.connection
+    if conn is not None and exception_context.statement is not None:
+        started = conn.info.get('query_started')
+        if started:
+            started.pop()
+
+
+def _start_request():
+    g.sql_stats = QueryStats()
+    g.request_started = time.perf_counter()
+
+
+def _finish_request(response):
+    stats = g.pop('sql_stats', None)
+    if stats is None:
+        return response
+    total_ms = (time.perf_counter() - g.pop('request_started')) * 1000
+    db_ms = stats.seconds * 1000
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{stats.count} queries"')
+    response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+
+    config = current_app.config
+    repeated = stats.repeated(config.get('SQL_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD))
+    if config.get('SQL_METRICS_LOG', True) or repeated:
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'queries': stats.count,
+            'db_ms': round(db_ms, 2),
+        }
+        if repeated:
+            record['repeated'] = [{'statement': s[:200], 'count': n} for s, n in repeated]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+    return response
+
+
+@contextmanager
+def capture_queries():
+    """Collect the text of every statement run inside the block, from any request."""
+    statements = []
+    with _captures_lock:
+        _captures.append(statements)
+    try:
+        yield statements
+    finally:
+        with _captures_lock:
+            _captures[:] = [c for c in _captures if c is not statements]
@@ -0,0 +1,268 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, insert, select, delete, func, text
+
+# Live list updates pushed to browsers over Server-Sent Events.
+# Views call publish(list_id, kind, data) next to their write; events are
+# held on the session and only go out if the transaction commits. Open event
+# streams subscribe to a list on the in-process Broker, which fans events out
+# to one bounded queue per stream. How a committed event reaches the Broker
+# of every worker depends on the backend (LIVE_UPDATES_BACKEND):
+#   memory - straight to this process's Broker; enough for a single process
+#   sqlite - written to the list_events table in the same transaction (an
+#            outbox), and every worker polls the table for new rows every
+#            LIVE_UPDATES_POLL_INTERVAL seconds while it has subscribers.
+#            Old rows are pruned after LIVE_UPDATES_RETENTION seconds. The
+#            row id doubles as the SSE event id, so a reconnecting browser
+#            gets what it missed (Last-Event-ID).
+# A reconnecting stream whose missed events are gone (pruned, or never kept
+# by the memory backend) is told to reload instead.
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_POLL_INTERVAL = 0.5
+DEFAULT_RETENTION = 3600
+PRUNE_EVERY = 60  # seconds between retention sweeps
+
+RELOAD = 'reload'  # Sent when a stream fell too far behind to catch up with deltas
+
+
+class Subscription:
+    def __init__(self, list_id, max_size):
+        self.list_id = list_id
+        self.queue = queue.Queue(max_size)
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next (id, kind, data) message, (None, RELOAD, None) after an overflow, or None on timeout."""
+        if self.overflowed:
+            self.overflowed = False
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            return None, RELOAD, None
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    """In-process pub/sub: list id -> the subscriptions of open event streams."""
+
+    def __init__(self, max_size=DEFAULT_QUEUE_SIZE):
+        self.max_size = max_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, list_id):
+        subscription = Subscription(list_id, self.max_size)
+        with self._lock:
+            self._subscribers[list_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.list_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.list_id]
+
+    def dispatch(self, event_id, list_id, kind, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(list_id, ()))
+        for subscription in subscribers:
+            subscription.put((event_id, kind, data))
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+class MemoryBackend:
+    def __init__(self, broker):
+        self.broker = broker
+        self._ids = itertools.count(1)
+        self._last = {}  # list id -> id of its last event
+
+    def before_commit(self, session, events):
+        pass
+
+    def after_commit(self, events):
+        for list_id, kind, data in events:
+            self._last[list_id] = event_id = next(self._ids)
+            self.broker.dispatch(event_id, list_id, kind, data)
+
+    def started(self):
+        pass
+
+    def replay(self, list_id, after_id):
+        # Nothing is kept: fine if the list had no event since, else a reload
+        return [] if after_id == self._last.get(list_id, 0) else None
+
+
+class SQLiteBackend:
+    def __init__(self, broker, engine, poll_interval=DEFAULT_POLL_INTERVAL, retention=DEFAULT_RETENTION):
+        self.broker = broker
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.last_id = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def before_commit(self, session, events):
+        # One executemany INSERT into the outbox, inside the caller's transaction
+        from .models import ListEvent
+        now = datetime.utcnow()
+        session.execute(insert(ListEvent), [
+            {'list_id': list_id, 'kind': kind, 'payload': json.dumps(data), 'created_at': now}
+            for list_id, kind, data in events])
+
+    def after_commit(self, events):
+        self._wake.set()  # Subscribers in this process need not wait for the next poll
+
+    def started(self):
+        """Called when a stream subscribes: make sure this process is polling."""
+        with self._lock:
+            if self.last_id is None or not len(self.broker):
+                # Idle until now, so the poller did not follow along; new subscribers
+                # only want what is committed from here on
+                self.last_id = self.max_id()
+            # A poller inherited through fork is not running in this process
+            if self.poll_interval and (self._thread is None or self._pid != os.getpid()):
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='live-updates-poller', daemon=True)
+                self._thread.start()
+
+    def max_id(self):
+        from .models import ListEvent
+        with self.engine.connect() as conn:
+            return conn.scalar(select(func.max(ListEvent.id))) or 0
+
+    def poll_once(self):
+        """Hand rows committed since the last poll to the Broker; returns how many."""
+        from .models import ListEvent
+        if self.last_id is None:
+            self.last_id = self.max_id()
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(ListEvent.id, ListEvent.list_id, ListEvent.kind, ListEvent.payload)
+                .where(ListEvent.id > self.last_id).order_by(ListEvent.id).limit(1000)).all()
+        for row in rows:
+            self.broker.dispatch(row.id, row.list_id, row.kind, json.loads(row.payload))
+            self.last_id = row.id
+        return len(rows)
+
+    def prune(self):
+        from .models import ListEvent
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        with self.engine.begin() as conn:
+            conn.execute(delete(ListEvent).where(ListEvent.created_at < cutoff))
+
+    def replay(self, list_id, after_id):
+        from .models import ListEvent
+        with self.engine.connect() as conn:
+            # Ids are AUTOINCREMENT and pruned oldest first, so events after
+            # after_id are all kept unless it is below the oldest row kept
+            newest = conn.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = 'list_events'")) or 0
+            oldest = conn.scalar(select(func.min(ListEvent.id))) or newest + 1
+            if not oldest - 1 <= after_id <= newest:
+                return None
+            rows = conn.execute(
+                select(ListEvent.id, ListEvent.kind, ListEvent.payload)
+                .where(ListEvent.list_id == list_id, ListEvent.id > after_id).order_by(ListEvent.id)).all()
+        return [(row.id, row.kind, json.loads(row.payload)) for row in rows]
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if not len(self.broker):
+                continue
+            try:
+                self.poll_once()
+                if time.monotonic() - self._last_prune > PRUNE_EVERY:
+                    self._last_prune = time.monotonic()
+                    self.prune()
+            except Exception:  # Keep polling; a locked or busy database is temporary
+                time.sleep(self.poll_interval)
+
+
+class LiveUpdates:
+    """Configured by LIVE_UPDATES_BACKEND ('memory' or 'sqlite'), LIVE_UPDATES_POLL_INTERVAL,
+    LIVE_UPDATES_RETENTION and LIVE_UPDATES_QUEUE_SIZE; one per app, in app.extensions['live_updates']."""
+
+    def __init__(self, app=None, db=None):
+        self.broker = Broker()
+        self.backend = MemoryBackend(self.broker)
+        self.session = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.session = db.session
+        self.broker = Broker(app.config.get('LIVE_UPDATES_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+        if app.config.get('LIVE_UPDATES_BACKEND', 'memory') == 'sqlite':
+            with app.app_context():
+                engine = db.engine
+            self.backend = SQLiteBackend(self.broker, engine,
+                                         app.config.get('LIVE_UPDATES_POLL_INTERVAL', DEFAULT_POLL_INTERVAL),
+                                         app.config.get('LIVE_UPDATES_RETENTION', DEFAULT_RETENTION))
+        else:
+            self.backend = MemoryBackend(self.broker)
+        # db.session is shared by every app create_app() builds; listen once and
+        # hand the events to the LiveUpdates of the app committing them
+        for name, listener in (('before_commit', _before_commit), ('after_commit', _after_commit),
+                               ('after_soft_rollback', _after_rollback)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+        app.extensions['live_updates'] = self
+
+    def publish(self, list_id, kind, data):
+        """Queue an event for list_id; it is delivered only if the current transaction commits."""
+        self.session.info.setdefault('live_events', []).append((list_id, kind, data))
+
+    def subscribe(self, list_id):
+        self.backend.started()
+        return self.broker.subscribe(list_id)
+
+    def unsubscribe(self, subscription):
+        self.broker.unsubscribe(subscription)
+
+    def replay(self, list_id, after_id):
+        """(id, kind, data) of list_id's events after after_id, or None if some are no longer kept."""
+        return self.backend.replay(list_id, after_id)
+
+
+
+def _before_commit(session):
+    events = session.info.get('live_events')
+    if events:
+        current_app.extensions['live_updates'].backend.before_commit(session, events)
+
+
+def _after_commit(session):
+    events = session.info.pop('live_events', None)
+    if events:
+        current_app.extensions['live_updates'].backend.after_commit(events)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('live_events', None)
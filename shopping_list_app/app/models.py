@@ -1,20 +1,27 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Index, UniqueConstraint, event, text
 from sqlalchemy.orm import relationship
 
 # Assuming db instance is created in extensions.py and imported here
-from .extensions import db
+from .extensions import db, user_cache
+from .passwords import hash_password, verify_password, needs_rehash
 # For now, to make this file parsable without extensions.py, we'll define a placeholder.
 # This will be replaced by the actual db object when extensions.py is created.
 # from flask_sqlalchemy import SQLAlchemy # No longer needed here
 # db = SQLAlchemy() # No longer needed here
 
+# Deletes cascade in the database (ON DELETE CASCADE, enforced through the
+# foreign_keys pragma, see sqlite_engine.py). The relationships below are
+# passive_deletes=True, so deleting a household or a list is one DELETE and the
+# ORM never loads the child rows just to delete them one by one.
+
 # Association table for User and Household many-to-many relationship
 user_households = Table('user_households', db.Model.metadata,
-    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('household_id', Integer, ForeignKey('households.id'), primary_key=True)
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('household_id', Integer, ForeignKey('households.id', ondelete='CASCADE'), primary_key=True),
+    # The primary key covers lookups by user_id; this one covers household_id lookups.
+    Index('ix_user_households_household_id', 'household_id')
 )
 
 class User(db.Model, UserMixin):
@@ -26,13 +33,17 @@ class User(db.Model, UserMixin):
     password_hash = Column(String(256), nullable=False)
 
     households = relationship('Household', secondary=user_households,
-                              back_populates='users', lazy='dynamic')
+                              back_populates='users', lazy='dynamic', passive_deletes=True)
 
+    # Hashing policy and worker pool come from config, see passwords.py
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     # Flask-Login required methods are inherited from UserMixin:
     # is_authenticated, is_active, is_anonymous, get_id()
@@ -41,48 +52,149 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f'<User {self.username}>'
 
+# Keep the login identity cache in step with changes made through the ORM
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
 class Household(db.Model):
     __tablename__ = 'households'
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
+    # Bumped whenever a list is added or removed; see app/versioning.py
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow)
 
     users = relationship('User', secondary=user_households,
-                         back_populates='households', lazy='dynamic')
+                         back_populates='households', lazy='dynamic', passive_deletes=True)
 
     shopping_lists = relationship('ShoppingList', back_populates='household', lazy='dynamic',
-                                  cascade="all, delete-orphan")
+                                  cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f'<Household {self.name}>'
 
 class ShoppingList(db.Model):
     __tablename__ = 'shopping_lists'
+    __table_args__ = (
+        # Serves view_household_lists: filter by household, ordered by date
+        Index('ix_shopping_lists_household_id_date', 'household_id', 'date'),
+        # Ids are never reused, so a new list cannot inherit a deleted one's
+        # cached fragments, ETags, search rowids or sync identity
+        {'sqlite_autoincrement': True},
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False, default='Unnamed List') # Added name attribute
     date = Column(DateTime, nullable=False, default=datetime.utcnow)
-    household_id = Column(Integer, ForeignKey('households.id'), nullable=False)
+    household_id = Column(Integer, ForeignKey('households.id', ondelete='CASCADE'), nullable=False)
+    # Bumped whenever one of the list's items changes; see app/versioning.py
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow)
 
     household = relationship('Household', back_populates='shopping_lists')
     items = relationship('ShoppingItem', back_populates='shopping_list', lazy='dynamic',
-                         cascade="all, delete-orphan")
+                         cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f'<ShoppingList id={self.id} date={self.date}>'
 
 class ShoppingItem(db.Model):
     __tablename__ = 'shopping_items'
+    __table_args__ = (
+        # Serves view_list_items: filter by list, ordered by (bought, name)
+        Index('ix_shopping_items_list_id_bought_name', 'shopping_list_id', 'bought', 'name'),
+        # Serves the aisle view's case-insensitive GROUP BY category (covering, bought included for the counts)
+        Index('ix_shopping_items_list_id_category_bought', 'shopping_list_id', text('category COLLATE nocase'), 'bought'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
-    category = Column(String(50), nullable=True)
+    category = Column(String(50), nullable=True) # Whitespace normalized on write, see aisles.normalize_category
     amount = Column(String(50), nullable=True)
     free_text = Column(Text, nullable=True)
     bought = Column(db.Boolean, default=False, nullable=False) # Added bought status
-    shopping_list_id = Column(Integer, ForeignKey('shopping_lists.id'), nullable=False)
+    # Bumped by every write to the item; edits are conditional on it, see app/editing.py
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    shopping_list_id = Column(Integer, ForeignKey('shopping_lists.id', ondelete='CASCADE'), nullable=False)
 
     shopping_list = relationship('ShoppingList', back_populates='items')
 
     def __repr__(self):
         return f'<ShoppingItem {self.name}>'
+
+class HouseholdCategory(db.Model):
+    """Where a category sits in the household's walk through the store (see aisles.py)."""
+    __tablename__ = 'household_categories'
+    __table_args__ = (
+        UniqueConstraint('household_id', 'name', name='uq_household_categories_household_id_name'),
+        Index('ix_household_categories_household_id_position', 'household_id', 'position'), # The household's order
+    )
+
+    id = Column(Integer, primary_key=True)
+    household_id = Column(Integer, ForeignKey('households.id', ondelete='CASCADE'), nullable=False)
+    name = Column(String(50, collation='nocase'), nullable=False) # Matches categories whatever their case
+    position = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<HouseholdCategory {self.name} at {self.position}>'
+
+class ImportJob(db.Model):
+    """Progress of one `flask import items` source, committed with each batch (see importer.py)."""
+    __tablename__ = 'import_jobs'
+    __table_args__ = (
+        UniqueConstraint('household_id', 'source', name='uq_import_jobs_household_id_source'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    household_id = Column(Integer, ForeignKey('households.id', ondelete='CASCADE'), nullable=False)
+    source = Column(String(500), nullable=False)
+    rows_done = Column(Integer, nullable=False, default=0) # Input rows consumed, valid or not
+    items_imported = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    finished = Column(db.Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ImportJob {self.source} rows={self.rows_done}>'
+
+class ListEvent(db.Model):
+    """Outbox row for live list updates, polled by every worker (see live_updates.py)."""
+    __tablename__ = 'list_events'
+    __table_args__ = (
+        # Replay for a reconnecting stream: one list's events after a given id
+        Index('ix_list_events_list_id_id', 'list_id', 'id'),
+        Index('ix_list_events_created_at', 'created_at'),
+        # Pollers and reconnecting streams read "id > last seen"; a reused id
+        # (after prune() removed the newest rows) would never be delivered
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    list_id = Column(Integer, nullable=False) # No foreign key: "deleted" events outlive their list
+    kind = Column(String(20), nullable=False)
+    payload = Column(Text, nullable=False) # JSON
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ListEvent {self.id} {self.kind} list={self.list_id}>'
+
+class ChangeLog(db.Model):
+    """One write to a list or item, numbered per household; written by triggers (see sync.py)."""
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        # Also the index behind "changes since seq N" and the next-number lookup
+        UniqueConstraint('household_id', 'seq', name='uq_change_log_household_id_seq'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    household_id = Column(Integer, ForeignKey('households.id', ondelete='CASCADE'), nullable=False)
+    seq = Column(Integer, nullable=False)
+    kind = Column(String(10), nullable=False) # 'list' or 'item'
+    row_id = Column(Integer, nullable=False) # No foreign key: tombstones outlive their row
+    op = Column(String(10), nullable=False) # 'insert', 'update' or 'delete'
+
+    def __repr__(self):
+        return f'<ChangeLog {self.household_id}#{self.seq} {self.op} {self.kind} {self.row_id}>'
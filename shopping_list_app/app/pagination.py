@@ -0,0 +1,98 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import abort, current_app
+from sqlalchemy import tuple_
+
+# Keyset ("seek") pagination helpers.
+# A page is located by the sort key of the row at its edge instead of an
+# OFFSET, so fetching page 500 costs the same as page 1. No COUNT is run:
+# one extra row is fetched to know whether another page exists.
+
+DEFAULT_PAGE_SIZE = 50
+
+# JSON types a cursor value may have, by the Python type of its sort column
+CURSOR_TYPES = {int: int, float: (int, float), bool: bool, str: str, datetime: str}
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError(token)
+        return [_cursor_value(v, column.type.python_type) for v, column in zip(payload, columns)]
+    except (ValueError, TypeError):
+        abort(400) # Malformed cursor
+
+
+def _cursor_value(value, python_type):
+    # Values are bound into the keyset WHERE clause, so only a scalar of the
+    # column's type gets through (bool is an int to isinstance; not here)
+    if isinstance(value, bool) != (python_type is bool) or not isinstance(value, CURSOR_TYPES.get(python_type, ())):
+        raise ValueError(value)
+    return datetime.fromisoformat(value) if python_type is datetime else value
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def page_size():
+    return current_app.config.get('PAGE_SIZE', DEFAULT_PAGE_SIZE)
+
+
+def paginate_keyset(query, columns, descending=False, after=None, before=None, per_page=None):
+    """Return a KeysetPage of `query` ordered by `columns`.
+
+    `columns` must end with a unique column (the primary key) so the sort
+    key is total. `after` / `before` are cursors from a previous page.
+    """
+    per_page = per_page or page_size()
+    key = tuple_(*columns)
+    backwards = before is not None
+
+    if after is not None:
+        values = decode_cursor(after, columns)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+    elif before is not None:
+        values = decode_cursor(before, columns)
+        query = query.filter(key > tuple_(*values) if descending else key < tuple_(*values))
+
+    # Walking backwards reads the rows in reverse order and flips them after.
+    reverse = descending != backwards
+    query = query.order_by(None).order_by(*[c.desc() if reverse else c.asc() for c in columns])
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows)
+
+    def cursor_for(row):
+        return encode_cursor([getattr(row, c.key) for c in columns])
+
+    has_next = more if not backwards else True
+    has_prev = more if backwards else after is not None
+    return KeysetPage(rows,
+                      next_cursor=cursor_for(rows[-1]) if has_next else None,
+                      prev_cursor=cursor_for(rows[0]) if has_prev else None)
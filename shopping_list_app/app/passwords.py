@@ -0,0 +1,84 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing policy and execution.
+# PASSWORD_HASH_METHOD / PASSWORD_HASH_SALT_LENGTH pick the algorithm and cost
+# (any werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000').
+# PASSWORD_HASH_WORKERS > 0 runs hashing in a per-process pool of that many
+# processes, so a burst of logins can only occupy that many CPUs while the
+# request threads keep serving other pages; 0 hashes inline.
+
+DEFAULT_METHOD = 'scrypt'
+DEFAULT_SALT_LENGTH = 16
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _pool(workers):
+    global _executor, _executor_pid
+    with _executor_lock:
+        # A pool inherited through fork (gunicorn preload) is unusable; start a new one
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run(func, *args):
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return func(*args)
+    return _pool(workers).submit(func, *args).result()
+
+
+def hash_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def hash_password(password):
+    salt_length = current_app.config.get('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH)
+    return _run(generate_password_hash, password, hash_method(), salt_length)
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash many passwords under the current policy, in order.
+
+    By default in the pool PASSWORD_HASH_WORKERS bounds (inline if 0), shared
+    with logins, so requests never start processes of their own. Bulk
+    provisioning from the CLI passes `workers` for a pool of its own instead.
+    """
+    method = hash_method()
+    salt_length = current_app.config.get('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH)
+    if workers is None:
+        shared = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+        if shared:
+            return list(_pool(shared).map(generate_password_hash, passwords, repeat(method), repeat(salt_length)))
+        workers = 0
+    if workers <= 1 or len(passwords) < 2:
+        return [generate_password_hash(password, method, salt_length) for password in passwords]
+    with ProcessPoolExecutor(max_workers=min(workers, len(passwords))) as pool:
+        return list(pool.map(generate_password_hash, passwords, repeat(method), repeat(salt_length),
+                             chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # werkzeug expands defaults ('scrypt' -> 'scrypt:32768:8:1'); let it tell us how
+    return generate_password_hash('', method, 1).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """True if `password_hash` was made with other parameters than the current policy."""
+    return password_hash.split('$', 1)[0] != _method_prefix(hash_method())
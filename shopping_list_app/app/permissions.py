@@ -0,0 +1,80 @@
+from flask import g, abort, current_app
+from flask_login import current_user
+from sqlalchemy import select, exists, and_
+from sqlalchemy.orm import joinedload
+
+from .models import Household, ShoppingList, ShoppingItem, user_households
+from .extensions import db
+
+# Central authorization helpers for household-owned objects.
+# Membership is answered with a single EXISTS query against user_households
+# (never by loading household.users) and the answer is cached on flask.g,
+# keyed by user, so repeated checks for the same household/list within one
+# request are free and a context that outlives a login switch cannot leak them.
+
+
+def _membership_cache():
+    cache = getattr(g, '_membership_cache', None)
+    if cache is None:
+        cache = g._membership_cache = {}
+    return cache
+
+
+def _cached_exists(key, condition):
+    cache = _membership_cache()
+    if key not in cache:
+        cache[key] = bool(db.session.scalar(select(exists().where(condition))))
+    return cache[key]
+
+
+def is_household_member(household_id):
+    """True if the current user belongs to the given household."""
+    if not current_user.is_authenticated:
+        return False
+    return _cached_exists(('household', current_user.id, household_id), and_(
+        user_households.c.household_id == household_id,
+        user_households.c.user_id == current_user.id))
+
+
+def is_admin():
+    """True if the current user's email is listed in ADMIN_EMAILS."""
+    return current_user.is_authenticated and current_user.email in current_app.config.get('ADMIN_EMAILS', ())
+
+
+def member_household_ids():
+    """Ids of the current user's households."""
+    return db.session.scalars(select(user_households.c.household_id)
+                              .where(user_households.c.user_id == current_user.id)).all()
+
+
+def accessible_list_ids():
+    """Subquery of the ids of every list in the current user's households.
+
+    For set-based writes that must check membership inside the statement itself.
+    """
+    return (select(ShoppingList.id)
+            .join(user_households, user_households.c.household_id == ShoppingList.household_id)
+            .where(user_households.c.user_id == current_user.id))
+
+
+def get_household_or_403(household_id):
+    household = Household.query.get_or_404(household_id)
+    if not is_household_member(household.id):
+        abort(403) # Forbidden
+    return household
+
+
+def get_list_or_403(list_id):
+    shopping_list = ShoppingList.query.get_or_404(list_id)
+    if not is_household_member(shopping_list.household_id):
+        abort(403)
+    return shopping_list
+
+
+def get_item_or_403(item_id):
+    # The parent list is joined in since every item view needs its name/id anyway.
+    item = (ShoppingItem.query.options(joinedload(ShoppingItem.shopping_list))
+            .filter_by(id=item_id).first_or_404())
+    if not is_household_member(item.shopping_list.household_id):
+        abort(403)
+    return item
@@ -0,0 +1,159 @@
+from sqlalchemy import select, insert
+
+from .models import User, Household, user_households
+from .extensions import db
+from .forms import ProvisionUserForm, validate_form
+from .passwords import hash_passwords
+
+# Bulk onboarding of users and their households (`flask provision users`,
+# POST /api/v1/admin/provision). One row per user:
+#   username, email, password, households
+# households is a ';'-separated list (or a JSON list): '#12' adds the user to
+# existing household 12, any other entry names a household created by this
+# run, one per distinct name, shared by every row that names it.
+# Work is done per phase over the whole input rather than per user:
+#   1. every row is checked with the registration form's rules, no queries;
+#   2. passwords of the accepted rows are hashed, in the shared request pool
+#      (see passwords.hash_passwords) or a pool of the CLI's own;
+#   3. usernames and emails are checked against the database with one IN
+#      query per batch, and against earlier rows of the input;
+#   4. users, new households and user_households rows are inserted with one
+#      executemany per batch, in the caller's transaction.
+# Phases 1-2 (prepare) touch no database, so callers run them outside any
+# transaction: hashing thousands of passwords takes seconds, and SQLite's
+# write lock must not be held meanwhile. Phases 3-4 (write) are one short
+# transaction that takes the write lock up front, so the uniqueness checks
+# still hold when the rows go in. Rows found to be duplicates in phase 3 were
+# hashed for nothing; that is the price of not hashing under the lock.
+# Every row ends up in the report as created, duplicate or invalid.
+
+DEFAULT_BATCH_SIZE = 500  # Rows per IN query / executemany; well under SQLite's variable limit
+
+
+def batches(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def parse_households(value):
+    if isinstance(value, list):
+        entries = value
+    else:
+        entries = str(value or '').split(';')
+    return list(dict.fromkeys(' '.join(str(entry).split()) for entry in entries if str(entry).strip()))
+
+
+class ProvisionReport:
+    def __init__(self):
+        self.rows = []  # One dict per input row, in input order
+        self.households = {}  # Name -> id of the households this run created
+
+    def add(self, number, status, username=None, email=None, **details):
+        self.rows.append({'row': number, 'status': status, 'username': username, 'email': email, **details})
+
+    def count(self, status):
+        return sum(1 for row in self.rows if row['status'] == status)
+
+    def summary(self):
+        return {'created': self.count('created'), 'duplicate': self.count('duplicate'),
+                'invalid': self.count('invalid'), 'households_created': len(self.households)}
+
+
+def _existing(column, values, batch_size):
+    found = set()
+    for batch in batches(values, batch_size):
+        found.update(db.session.scalars(select(column).where(column.in_(batch))))
+    return found
+
+
+def prepare(rows, workers=None):
+    """Check `rows` ((number, dict) pairs) and hash the accepted passwords, without touching the database.
+
+    `workers` as for passwords.hash_passwords. Returns (report, accepted): the report holds the invalid rows so far, and
+    accepted the (number, username, email, password_hash, households) of the rest.
+    """
+    report = ProvisionReport()
+    accepted = []  # (number, username, email, password, households)
+    for number, row in rows:
+        if not isinstance(row, dict):
+            report.add(number, 'invalid', errors={'row': ['Expected an object with username, email and password.']})
+            continue
+        form = validate_form(ProvisionUserForm, {k: row.get(k) for k in ('username', 'email', 'password')})
+        households = parse_households(row.get('households'))
+        bad_refs = [entry for entry in households if entry.startswith('#') and not entry[1:].isdigit()]
+        errors = dict(form.errors)
+        if bad_refs:
+            errors['households'] = [f'Not a household id: {bad_refs[0]}']
+        if errors:
+            report.add(number, 'invalid', row.get('username'), row.get('email'), errors=errors)
+            continue
+        accepted.append((number, form.username.data, form.email.data, form.password.data, households))
+    hashes = hash_passwords([password for _, _, _, password, _ in accepted], workers)
+    return report, [(number, username, email, password_hash, households)
+                    for (number, username, email, _, households), password_hash in zip(accepted, hashes)]
+
+
+def write(prepared, batch_size=DEFAULT_BATCH_SIZE):
+    """Check prepare()'s rows for uniqueness and insert them; returns the ProvisionReport.
+
+    Nothing is committed; the caller commits (or rolls back) the whole run.
+    """
+    report, accepted = prepared
+    if not db.session().in_transaction():
+        # The reads below decide the inserts: take the write lock before them
+        db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+    # Uniqueness for the whole input: two IN queries per batch, then a pass over the rows
+    taken_usernames = _existing(User.username, {a[1] for a in accepted}, batch_size)
+    taken_emails = _existing(User.email, {a[2] for a in accepted}, batch_size)
+    household_ids = {int(entry[1:]) for a in accepted for entry in a[4] if entry.startswith('#')}
+    known_households = _existing(Household.id, household_ids, batch_size)
+    first_row = {}
+    new_users = []
+    for number, username, email, password_hash, households in accepted:
+        reasons = []
+        for kind, value, taken in (('username', username, taken_usernames), ('email', email, taken_emails)):
+            if value in taken:
+                reasons.append(f'{kind} already registered')
+            elif (kind, value) in first_row:
+                reasons.append(f'{kind} repeats row {first_row[(kind, value)]}')
+        missing = [entry for entry in households if entry.startswith('#') and int(entry[1:]) not in known_households]
+        if missing:
+            report.add(number, 'invalid', username, email, errors={'households': [f'No household {missing[0]}.']})
+            continue
+        if reasons:
+            report.add(number, 'duplicate', username, email, reasons=reasons)
+            continue
+        first_row[('username', username)] = first_row[('email', email)] = number
+        new_users.append((number, username, email, password_hash, households))
+
+    names = list(dict.fromkeys(entry for u in new_users for entry in u[4] if not entry.startswith('#')))
+    for batch in batches(names, batch_size):
+        created = db.session.execute(insert(Household).returning(Household.id, Household.name),
+                                     [{'name': name} for name in batch])
+        report.households.update({row.name: row.id for row in created})
+
+    user_ids = {}
+    for batch in batches(new_users, batch_size):
+        created = db.session.execute(insert(User).returning(User.id, User.username),
+                                     [{'username': u[1], 'email': u[2], 'password_hash': u[3]} for u in batch])
+        user_ids.update({row.username: row.id for row in created})
+
+    memberships = [{'user_id': user_ids[u[1]],
+                    'household_id': int(entry[1:]) if entry.startswith('#') else report.households[entry]}
+                   for u in new_users for entry in u[4]]
+    for batch in batches(memberships, batch_size):
+        db.session.execute(insert(user_households), batch)
+
+    for number, username, email, _, households in new_users:
+        report.add(number, 'created', username, email, user_id=user_ids[username], households=households)
+    report.rows.sort(key=lambda row: row['row'])
+    return report
+
+
+def provision(rows, batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """prepare() then write(): create the users in `rows` and their memberships; returns a ProvisionReport.
+
+    Call it with no transaction open, so the hashing holds no lock.
+    """
+    return write(prepare(rows, workers), batch_size)
@@ -1,14 +1,31 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+import json
+import time
+from datetime import date
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify, g,
+                   Response, stream_with_context, current_app)
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy import update
+from markupsafe import Markup
 from .models import User, Household, ShoppingList, ShoppingItem # Added ShoppingItem
 from .forms import (LoginForm, RegistrationForm, CreateHouseholdForm,
-                    CreateShoppingListForm, AddShoppingItemForm, EditShoppingItemForm) # Added item forms
-from .extensions import db
+                    CreateShoppingListForm, CloneShoppingListForm, AddShoppingItemForm,
+                    EditShoppingItemForm, CategoryOrderForm) # Added item forms
+from .extensions import db, fragment_cache, live_updates, autocomplete
+from .permissions import get_household_or_403, get_list_or_403, get_item_or_403, accessible_list_ids
+from .pagination import paginate_keyset, page_size
+from .versioning import touch_lists, touch_households, forget_lists, make_etag, conditional_response, list_fragment_prefix
+from .sqlite_engine import retry_on_busy
+from . import exporter, search as full_text
+from .cloning import clone_list
+from .aisles import grouped_items, category_order, set_category_order
+from .editing import save_item, EditConflict
+from .api import item_to_dict
+from .live_updates import RELOAD
 
 # Using a blueprint named 'main' for these routes.
 # If you have auth-specific routes and other main routes, you might split them.
 # For this task, one blueprint should suffice.
-bp = Blueprint('main', __name__) # 'main' can be used in url_for e.g. url_for('main.index')
+bp = Blueprint('main', __name__, template_folder='templates') # 'main' can be used in url_for e.g. url_for('main.index')
 
 @bp.route('/')
 @bp.route('/index')
@@ -17,6 +34,7 @@ def index():
     return render_template('index.html', title='Home')
 
 @bp.route('/register', methods=['GET', 'POST'])
+@retry_on_busy(immediate=False)
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
@@ -31,6 +49,7 @@ def register():
     return render_template('register.html', title='Register', form=form)
 
 @bp.route('/login', methods=['GET', 'POST'])
+@retry_on_busy(immediate=False)
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
@@ -40,6 +59,9 @@ def login():
         if user is None or not user.check_password(form.password.data):
             flash('Invalid username or password', 'danger')
             return redirect(url_for('main.login'))
+        if user.password_needs_rehash(): # Hashed under an older policy; upgrade it now
+            user.set_password(form.password.data)
+            db.session.commit()
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         if not next_page or not next_page.startswith('/'): # Basic security: ensure next_page is local
@@ -57,6 +79,7 @@ def logout():
 
 @bp.route('/create_household', methods=['GET', 'POST'])
 @login_required
+@retry_on_busy()
 def create_household():
     form = CreateHouseholdForm()
     if form.validate_on_submit():
@@ -78,10 +101,9 @@ def view_households():
 
 @bp.route('/household/<int:household_id>/new_list', methods=['GET', 'POST'])
 @login_required
+@retry_on_busy()
 def create_shopping_list(household_id):
-    household = Household.query.get_or_404(household_id)
-    if current_user not in household.users.all(): # Check membership
-        abort(403) # Forbidden
+    household = get_household_or_403(household_id) # Check membership
 
     form = CreateShoppingListForm()
     if form.validate_on_submit():
@@ -89,6 +111,7 @@ def create_shopping_list(household_id):
                                      date=form.date.data,
                                      household_id=household.id)
         db.session.add(shopping_list)
+        touch_households(household.id)
         db.session.commit()
         flash(f'Shopping list "{shopping_list.name}" created for household "{household.name}"!', 'success')
         return redirect(url_for('main.view_household_lists', household_id=household.id))
@@ -97,34 +120,100 @@ def create_shopping_list(household_id):
 @bp.route('/household/<int:household_id>/lists')
 @login_required
 def view_household_lists(household_id):
-    household = Household.query.get_or_404(household_id)
-    if current_user not in household.users.all(): # Check membership
-        abort(403)
+    household = get_household_or_403(household_id) # Check membership
+
+    # shopping_lists relation is lazy='dynamic', so it's a query object.
+    # Newest first, paged by (date, id) so older pages cost the same as the first.
+    def render():
+        page = paginate_keyset(household.shopping_lists, [ShoppingList.date, ShoppingList.id], descending=True,
+                               after=request.args.get('after'), before=request.args.get('before'))
+        return render_template('view_household_lists.html', title=f'Lists for {household.name}', household=household,
+                               shopping_lists=page.items, page=page)
+    # Unchanged since the client's copy: answer 304 without querying the lists
+    return conditional_response(make_etag('household', household), household.updated_at, render)
 
-    # shopping_lists relation is lazy='dynamic', so it's a query object
-    shopping_lists = household.shopping_lists.order_by(ShoppingList.date.desc())
-    return render_template('view_household_lists.html', title=f'Lists for {household.name}', household=household, shopping_lists=shopping_lists)
+@bp.route('/household/<int:household_id>/export')
+@login_required
+def export_household(household_id):
+    household = get_household_or_403(household_id) # Check membership
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exporter.FORMATS:
+        abort(400)
+    # Streamed: the first bytes go out before the history query has finished,
+    # and memory stays flat however many items the household has.
+    response = Response(stream_with_context(exporter.generate(fmt, household.id)),
+                        mimetype=exporter.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=household-{household.id}.{fmt}'
+    return response
+
+@bp.route('/household/<int:household_id>/aisles', methods=['GET', 'POST'])
+@login_required
+@retry_on_busy()
+def edit_aisle_order(household_id):
+    household = get_household_or_403(household_id) # Check membership
+
+    form = CategoryOrderForm()
+    if form.validate_on_submit():
+        set_category_order(household.id, form.categories.data.splitlines())
+        db.session.commit()
+        flash('Aisle order saved.', 'success')
+        return redirect(url_for('main.view_household_lists', household_id=household_id))
+    if request.method == 'GET':
+        # The current order, then the household's other categories so they can be placed too
+        ordered, unordered = category_order(household.id)
+        form.categories.data = '\n'.join(ordered + unordered)
+    return render_template('edit_aisle_order.html', title='Aisle Order', form=form, household=household)
+
+@bp.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    household_id = request.args.get('household_id', type=int)
+    page = full_text.search(query, full_text.scope(household_id), after=request.args.get('after'))
+    args = {'q': query} if household_id is None else {'q': query, 'household_id': household_id}
+    return render_template('search.html', title='Search', query=query, results=page.items, page=page, args=args)
+
+@bp.route('/shopping_list/<int:list_id>/clone', methods=['GET', 'POST'])
+@login_required
+@retry_on_busy()
+def clone_shopping_list(list_id):
+    source = get_list_or_403(list_id) # Check membership
+
+    form = CloneShoppingListForm()
+    if request.method == 'GET':
+        form.name.data = source.name
+        form.date.data = date.today()
+        form.reset_bought.data = True
+    if form.validate_on_submit():
+        shopping_list, copied = clone_list(source, form.name.data, form.date.data,
+                                           only_unbought=form.only_unbought.data, reset_bought=form.reset_bought.data)
+        new_id = shopping_list.id
+        message = f'Shopping list "{shopping_list.name}" created with {copied} items from "{source.name}".'
+        db.session.commit() # Expires both lists; nothing below needs them reloaded
+        flash(message, 'success')
+        return redirect(url_for('main.view_list_items', list_id=new_id))
+    return render_template('clone_shopping_list.html', title='Duplicate List', form=form, source=source)
 
 @bp.route('/shopping_list/<int:list_id>/delete', methods=['POST'])
 @login_required
+@retry_on_busy()
 def delete_shopping_list(list_id):
-    shopping_list = ShoppingList.query.get_or_404(list_id)
-    household = shopping_list.household
-    if current_user not in household.users.all(): # Check membership
-        abort(403)
+    shopping_list = get_list_or_403(list_id) # Check membership
+    household_id = shopping_list.household_id
 
     db.session.delete(shopping_list)
+    touch_households(household_id)
+    forget_lists(list_id)
     db.session.commit()
     flash(f'Shopping list "{shopping_list.name}" has been deleted.', 'success')
-    return redirect(url_for('main.view_household_lists', household_id=household.id))
+    return redirect(url_for('main.view_household_lists', household_id=household_id))
 
 # Shopping Item Routes
 @bp.route('/shopping_list/<int:list_id>/add_item', methods=['GET', 'POST'])
 @login_required
+@retry_on_busy()
 def add_item_to_list(list_id):
-    shopping_list = ShoppingList.query.get_or_404(list_id)
-    if current_user not in shopping_list.household.users.all():
-        abort(403)
+    shopping_list = get_list_or_403(list_id)
 
     form = AddShoppingItemForm()
     if form.validate_on_submit():
@@ -134,6 +223,10 @@ def add_item_to_list(list_id):
                             free_text=form.free_text.data,
                             shopping_list_id=list_id)
         db.session.add(item)
+        db.session.flush() # Assigns item.id for the live update
+        touch_lists(list_id)
+        live_updates.publish(list_id, 'add', item_to_dict(item))
+        autocomplete.record(shopping_list.household_id, [(item.name, item.category)])
         db.session.commit()
         flash(f'Item "{item.name}" added to list "{shopping_list.name}".', 'success')
         return redirect(url_for('main.view_list_items', list_id=list_id))
@@ -142,29 +235,63 @@ def add_item_to_list(list_id):
 @bp.route('/shopping_list/<int:list_id>/items')
 @login_required
 def view_list_items(list_id):
-    shopping_list = ShoppingList.query.get_or_404(list_id)
-    if current_user not in shopping_list.household.users.all():
-        abort(403)
+    shopping_list = get_list_or_403(list_id)
 
-    # items relation is lazy='dynamic', can order it here if needed
-    items = shopping_list.items.order_by(ShoppingItem.bought.asc(), ShoppingItem.name.asc())
-    return render_template('view_list_items.html', title=f'Items for {shopping_list.name}', shopping_list=shopping_list, items=items)
+    # items relation is lazy='dynamic'; unbought first, then by name, paged by (bought, name, id)
+    after, before = request.args.get('after'), request.args.get('before')
+
+    def render_items():
+        page = paginate_keyset(shopping_list.items, [ShoppingItem.bought, ShoppingItem.name, ShoppingItem.id],
+                               after=after, before=before)
+        return render_template('_list_items.html', shopping_list=shopping_list, items=page.items, page=page)
+
+    def render():
+        # The item rows only change when the list version does, so they are cached under it
+        key = f'{list_fragment_prefix(shopping_list.id)}v{shopping_list.version}:{after}:{before}:{page_size()}'
+        items_html, hit = fragment_cache.get_or_render(key, render_items)
+        g.fragment_cache_status = 'hit' if hit else 'miss'
+        return render_template('view_list_items.html', title=f'Items for {shopping_list.name}', shopping_list=shopping_list,
+                               items_html=Markup(items_html))
+    # Unchanged since the client's copy: answer 304 without querying the items
+    response = conditional_response(make_etag('list', shopping_list), shopping_list.updated_at, render)
+    if g.get('fragment_cache_status'):
+        response.headers['X-Fragment-Cache'] = g.fragment_cache_status
+    return response
+
+@bp.route('/shopping_list/<int:list_id>/aisles')
+@login_required
+def view_list_aisles(list_id):
+    shopping_list = get_list_or_403(list_id)
+
+    # Grouped, counted and ordered in SQL; see aisles.grouped_items
+    groups, to_buy = grouped_items(shopping_list)
+    return render_template('view_list_aisles.html', title=f'{shopping_list.name} by Aisle', shopping_list=shopping_list,
+                           groups=groups, to_buy=to_buy)
 
 @bp.route('/item/<int:item_id>/edit', methods=['GET', 'POST'])
 @login_required
+@retry_on_busy()
 def edit_item(item_id):
-    item = ShoppingItem.query.get_or_404(item_id)
+    item = get_item_or_403(item_id)
     shopping_list = item.shopping_list
-    if current_user not in shopping_list.household.users.all():
-        abort(403)
 
     form = EditShoppingItemForm(obj=item) # Pre-populate form with item data
     if form.validate_on_submit():
-        item.name = form.name.data
-        item.category = form.category.data
-        item.amount = form.amount.data
-        item.free_text = form.free_text.data
-        item.bought = form.bought.data
+        previous = (item.name, item.category)
+        values = {'name': form.name.data, 'category': form.category.data, 'amount': form.amount.data,
+                  'free_text': form.free_text.data, 'bought': form.bought.data}
+        try:
+            save_item(item, values, form.version.data) # Only if nobody saved since the form was loaded
+        except EditConflict as conflict:
+            # Nothing was written. Show what changed and keep what this user typed,
+            # now based on the current version so saving again is deliberate.
+            form.version.data, form.version.raw_data = conflict.item.version, None
+            return render_template('edit_item.html', title='Edit Item', form=form, item=conflict.item,
+                                   conflict=conflict.item), 409
+        touch_lists(shopping_list.id)
+        if previous != (item.name, item.category):
+            autocomplete.record(shopping_list.household_id, [(item.name, item.category)], [previous])
+        live_updates.publish(shopping_list.id, 'edit', item_to_dict(item))
         db.session.commit()
         flash(f'Item "{item.name}" updated successfully.', 'success')
         return redirect(url_for('main.view_list_items', list_id=shopping_list.id))
@@ -172,28 +299,93 @@ def edit_item(item_id):
 
 @bp.route('/item/<int:item_id>/delete', methods=['POST'])
 @login_required
+@retry_on_busy()
 def delete_item(item_id):
-    item = ShoppingItem.query.get_or_404(item_id)
+    item = get_item_or_403(item_id)
     shopping_list_id = item.shopping_list_id
     shopping_list_name = item.shopping_list.name # For flash message
 
-    if current_user not in item.shopping_list.household.users.all():
-        abort(403)
-
     db.session.delete(item)
+    touch_lists(shopping_list_id)
+    live_updates.publish(shopping_list_id, 'delete', {'id': item_id})
     db.session.commit()
     flash(f'Item "{item.name}" deleted from list "{shopping_list_name}".', 'success')
     return redirect(url_for('main.view_list_items', list_id=shopping_list_id))
 
+def wants_json():
+    # fetch() callers ask for JSON; plain form posts (and the tests) get HTML.
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
 @bp.route('/item/<int:item_id>/toggle_bought', methods=['POST'])
 @login_required
+@retry_on_busy()
 def toggle_item_bought(item_id):
-    item = ShoppingItem.query.get_or_404(item_id)
-    if current_user not in item.shopping_list.household.users.all():
+    # One conditional UPDATE flips the flag and checks membership at the same
+    # time; nothing is loaded unless it fails and we need to pick 404 vs 403.
+    row = db.session.execute(
+        update(ShoppingItem)
+        .where(ShoppingItem.id == item_id, ShoppingItem.shopping_list_id.in_(accessible_list_ids()))
+        .values(bought=~ShoppingItem.bought, version=ShoppingItem.version + 1)
+        .returning(ShoppingItem.bought, ShoppingItem.name, ShoppingItem.shopping_list_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        db.session.rollback()
+        ShoppingItem.query.get_or_404(item_id)
         abort(403)
-
-    item.bought = not item.bought
+    touch_lists(row.shopping_list_id)
+    live_updates.publish(row.shopping_list_id, 'toggle', {'id': item_id, 'bought': row.bought})
     db.session.commit()
-    status = "bought" if item.bought else "not bought"
-    flash(f'Item "{item.name}" marked as {status}.', 'info')
-    return redirect(url_for('main.view_list_items', list_id=item.shopping_list_id))
+
+    if wants_json():
+        return jsonify(id=item_id, bought=row.bought)
+    status = "bought" if row.bought else "not bought"
+    flash(f'Item "{row.name}" marked as {status}.', 'info')
+    return redirect(url_for('main.view_list_items', list_id=row.shopping_list_id))
+
+@bp.route('/shopping_list/<int:list_id>/events')
+@login_required
+def list_events(list_id):
+    """Server-Sent Events: add/edit/toggle/delete of this list's items as they are committed."""
+    get_list_or_403(list_id)
+    keepalive = current_app.config.get('SSE_KEEPALIVE', 15)
+    # Streams end after a while and the browser reconnects (with Last-Event-ID),
+    # so a server thread is never tied to one tab forever
+    max_seconds = current_app.config.get('SSE_MAX_SECONDS', 300)
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    # Subscribe before replaying: an event committed in between is then in the
+    # replay, the subscription or both, and the stream skips what it has sent
+    subscription = live_updates.subscribe(list_id)
+    missed = live_updates.replay(list_id, last_id) if last_id is not None else []
+
+    # Not wrapped in stream_with_context: the request's session and database
+    # connection are released as soon as this view returns.
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            if missed is None: # What the page missed is no longer kept
+                yield sse_message(None, RELOAD, None)
+                return
+            seen = last_id or 0
+            for message in missed:
+                yield sse_message(*message)
+                seen = message[0]
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                message = subscription.get(timeout=keepalive)
+                if message is None:
+                    yield ': keepalive\n\n'
+                elif message[0] is None or message[0] > seen:
+                    yield sse_message(*message)
+        finally:
+            live_updates.unsubscribe(subscription)
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Tell nginx not to buffer the stream
+    return response
+
+def sse_message(event_id, kind, data):
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines += [f'event: {kind}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
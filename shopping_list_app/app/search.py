@@ -0,0 +1,175 @@
+import re
+
+from flask import abort
+from sqlalchemy import event, text, column, Float, Integer
+
+from .models import ShoppingList, ShoppingItem
+from .extensions import db
+from .pagination import KeysetPage, encode_cursor, decode_cursor, page_size
+from .permissions import is_household_member, member_household_ids
+
+# Full-text search over a household's lists and items (SQLite FTS5).
+# search_index holds one row per item (name, category, free_text) and one per
+# list (name). Row ids are derived from the source row so triggers can find
+# them without a lookup: item id * 2 for items, list id * 2 + 1 for lists.
+# The owning household is indexed as a token ('h<id>') in its own column, so
+# the household scope is part of the MATCH itself: FTS intersects posting
+# lists instead of scoring every household's matches and filtering after.
+# Triggers on shopping_lists / shopping_items keep the index in sync with
+# every write path (ORM, bulk statements, the importer, FK cascades).
+#
+# The migration (e5b2c7a1f304) creates all of this in real databases;
+# create_all() (tests, fresh dev databases) gets it from the DDL events below.
+# `flask search rebuild` refills the index from the tables.
+
+# bm25 weights per column: household (never ranks), name, category, free_text
+BM25 = 'bm25(search_index, 0.0, 10.0, 4.0, 1.0)'
+MAX_TERMS = 8
+
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "household, name, category, free_text, "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+)
+
+LIST_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS search_lists_ai AFTER INSERT ON shopping_lists BEGIN
+        INSERT INTO search_index (rowid, household, name) VALUES (new.id * 2 + 1, 'h' || new.household_id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_lists_au AFTER UPDATE OF name ON shopping_lists BEGIN
+        UPDATE search_index SET name = new.name WHERE rowid = new.id * 2 + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_lists_ad AFTER DELETE ON shopping_lists BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END""",
+)
+
+ITEM_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS search_items_ai AFTER INSERT ON shopping_items BEGIN
+        INSERT INTO search_index (rowid, household, name, category, free_text)
+        SELECT new.id * 2, 'h' || household_id, new.name, new.category, new.free_text
+        FROM shopping_lists WHERE id = new.shopping_list_id;
+    END""",
+    # Toggling bought does not touch the index
+    """CREATE TRIGGER IF NOT EXISTS search_items_au AFTER UPDATE OF name, category, free_text ON shopping_items BEGIN
+        UPDATE search_index SET name = new.name, category = new.category, free_text = new.free_text
+        WHERE rowid = new.id * 2;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_items_ad AFTER DELETE ON shopping_items BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END""",
+)
+
+REBUILD = (
+    'DELETE FROM search_index',
+    "INSERT INTO search_index (rowid, household, name) "
+    "SELECT id * 2 + 1, 'h' || household_id, name FROM shopping_lists",
+    "INSERT INTO search_index (rowid, household, name, category, free_text) "
+    "SELECT i.id * 2, 'h' || l.household_id, i.name, i.category, i.free_text "
+    "FROM shopping_items i JOIN shopping_lists l ON l.id = i.shopping_list_id",
+    "INSERT INTO search_index (search_index) VALUES ('optimize')",  # Merge the b-trees the bulk insert left behind
+)
+
+_CURSOR_COLUMNS = (column('score', Float), column('rowid', Integer))
+
+
+def _is_sqlite(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+@event.listens_for(ShoppingList.__table__, 'after_create')
+def _create_index(target, connection, **kw):
+    if _is_sqlite(connection):
+        connection.exec_driver_sql(CREATE_INDEX)
+        for statement in LIST_TRIGGERS:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(ShoppingItem.__table__, 'after_create')
+def _create_item_triggers(target, connection, **kw):
+    if _is_sqlite(connection):
+        for statement in ITEM_TRIGGERS:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(ShoppingList.__table__, 'after_drop')
+def _drop_index(target, connection, **kw):
+    # Triggers go with their tables; the virtual table has to be dropped itself
+    if _is_sqlite(connection):
+        connection.exec_driver_sql('DROP TABLE IF EXISTS search_index')
+
+
+def rebuild():
+    """Refill the index from shopping_lists / shopping_items; returns the number of rows indexed."""
+    for statement in REBUILD:
+        db.session.execute(text(statement))
+    count = db.session.scalar(text('SELECT count(*) FROM search_index'))
+    db.session.commit()
+    return count
+
+
+def match_expression(query, household_ids):
+    """FTS5 MATCH string for what the user typed, or None if nothing searchable is left.
+
+    Every word becomes a quoted prefix term, so FTS5 operators and punctuation
+    in the input are searched for literally instead of being parsed.
+    """
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    if not terms or not household_ids:
+        return None
+    households = ' OR '.join(f'h{int(household_id)}' for household_id in household_ids)
+    words = ' AND '.join(f'"{term}"*' for term in terms)
+    return f'household : ({households}) AND {{name category free_text}} : ({words})'
+
+
+def scope(household_id=None):
+    """Households to search: the one asked for (members only) or all of the user's."""
+    if household_id is None:
+        return member_household_ids()
+    if not is_household_member(household_id):
+        abort(403)
+    return [household_id]
+
+
+class SearchResult:
+    def __init__(self, kind, shopping_list, item=None):
+        self.kind = kind  # 'list' or 'item'
+        self.shopping_list = shopping_list
+        self.item = item
+
+
+def search(query, household_ids, after=None, per_page=None):
+    """KeysetPage of SearchResults for `query` in the given households, best bm25 match first."""
+    per_page = per_page or page_size()
+    expression = match_expression(query, household_ids)
+    if expression is None:
+        return KeysetPage([])
+    score, rowid = decode_cursor(after, _CURSOR_COLUMNS) if after else (None, None)
+    # Ordered by (score, rowid) so the cursor is a total key; bm25 is lower-is-better
+    rows = db.session.execute(text(
+        f'SELECT rowid, score FROM (SELECT rowid, {BM25} AS score FROM search_index WHERE search_index MATCH :match) '
+        + ('WHERE (score, rowid) > (:score, :rowid) ' if after else '')
+        + 'ORDER BY score, rowid LIMIT :limit'),
+        {'match': expression, 'score': score, 'rowid': rowid, 'limit': per_page + 1}).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    # Two primary-key lookups resolve the whole page
+    item_ids = [row.rowid // 2 for row in rows if row.rowid % 2 == 0]
+    items = {item.id: item for item in ShoppingItem.query.filter(ShoppingItem.id.in_(item_ids))} if item_ids else {}
+    list_ids = {row.rowid // 2 for row in rows if row.rowid % 2} | {item.shopping_list_id for item in items.values()}
+    lists = {l.id: l for l in ShoppingList.query.filter(ShoppingList.id.in_(list_ids))} if list_ids else {}
+    household_ids = set(household_ids)
+    lists = {list_id: l for list_id, l in lists.items() if l.household_id in household_ids}  # Belt and braces
+    results = []
+    for row in rows:
+        if row.rowid % 2:
+            shopping_list = lists.get(row.rowid // 2)
+            if shopping_list is not None:
+                results.append(SearchResult('list', shopping_list))
+        else:
+            item = items.get(row.rowid // 2)
+            # Only missing if the index is out of sync; see `flask search rebuild`
+            if item is not None and item.shopping_list_id in lists:
+                results.append(SearchResult('item', lists[item.shopping_list_id], item))
+    return KeysetPage(results, next_cursor=encode_cursor([rows[-1].score, rows[-1].rowid]) if more else None)
@@ -0,0 +1,109 @@
+import random
+import time
+from functools import wraps
+
+from flask import has_request_context, request, g
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from .extensions import db
+
+# SQLite tuning for several gunicorn processes sharing one database file.
+# Every new connection gets the pragmas below (override any of them with the
+# SQLITE_PRAGMAS config dict). WAL lets readers run alongside the single
+# writer, and busy_timeout makes a blocked writer wait instead of failing.
+#
+# Write serialization: SQLAlchemy takes over BEGIN from the sqlite3 driver, and
+# with SQLITE_IMMEDIATE_WRITES (default on) the transaction of every non-GET
+# request starts with BEGIN IMMEDIATE. The write lock is then taken up front,
+# where busy_timeout applies, rather than on the first INSERT of a transaction
+# that already read an older snapshot, which SQLite can only refuse. Whatever
+# still fails with "database is locked" is retried by @retry_on_busy.
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,       # ms
+    'synchronous': 'NORMAL',    # Safe with WAL; fsync on checkpoint, not every commit
+    'cache_size': -20000,       # KiB (negative) -> about 20 MB page cache per connection
+    'mmap_size': 134217728,     # 128 MB
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def init_app(app):
+    pragmas = {**DEFAULT_PRAGMAS, **app.config.get('SQLITE_PRAGMAS', {})}
+    immediate_writes = app.config.get('SQLITE_IMMEDIATE_WRITES', True)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != 'sqlite':
+                continue
+            # An in-memory database is one connection shared by everything in
+            # the process (StaticPool): there is no other writer to wait for,
+            # and explicit BEGINs would collide on the shared connection.
+            in_memory = engine.url.database in (None, '', ':memory:')
+            tune_engine(engine, pragmas, immediate_writes and not in_memory)
+
+
+def tune_engine(engine, pragmas=None, immediate_writes=True):
+    pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        if immediate_writes:
+            # Stop the driver from issuing its own BEGIN; on_begin below does it
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    if not immediate_writes:
+        return engine
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(connection):
+        mode = connection.get_execution_options().get('sqlite_begin')
+        if mode is None and has_request_context():
+            mode = g.get('sqlite_begin')
+        if mode is None:
+            writing = immediate_writes and has_request_context() and request.method not in SAFE_METHODS
+            mode = 'IMMEDIATE' if writing else 'DEFERRED'
+        connection.exec_driver_sql(f'BEGIN {mode}')
+
+    return engine
+
+
+def is_busy_error(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_on_busy(retries=5, backoff=0.05, immediate=True):
+    """Re-run a unit of work (usually a view) that lost the race for the write lock.
+
+    The session is rolled back before each retry, so the wrapped function must
+    not have committed anything yet when it fails. immediate=False keeps the
+    request's transaction DEFERRED, for views that do slow work (password
+    hashing) before their only write and should not hold the lock meanwhile.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not immediate and has_request_context():
+                g.sqlite_begin = 'DEFERRED'
+            attempt = 0
+            while True:
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as error:
+                    db.session.rollback()
+                    if not is_busy_error(error) or attempt >= retries:
+                        raise
+                    # Exponential backoff with jitter so retries do not collide again
+                    time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+                    attempt += 1
+        return wrapper
+    return decorator
@@ -0,0 +1,299 @@
+from sqlalchemy import event, select, insert, update, delete, func, bindparam
+
+from .models import ShoppingList, ShoppingItem, ChangeLog
+from .extensions import db, live_updates, autocomplete
+from .forms import CreateShoppingListForm, AddShoppingItemForm, EditShoppingItemForm, validate_form
+from .versioning import touch_lists, touch_households, forget_lists
+
+# Delta sync for offline clients.
+# change_log is an append-only journal of every list and item write, numbered
+# per household (seq 1, 2, 3, ...). Triggers on shopping_lists / shopping_items
+# append to it, so every write path is covered (ORM, bulk statements, the
+# importer, list duplication). A client remembers the last seq it has seen and
+# asks for what changed since: each changed row once, in its current state,
+# or a tombstone if its last change was a delete. What a reconnect downloads
+# depends on how much changed, not on the size of the household's history.
+# The next seq is max(seq) + 1 read through the (household_id, seq) index;
+# SQLite has one writer at a time, so two writes cannot take the same number.
+#
+# Deleting a list deletes its items through the foreign key; those items are
+# not logged one by one, the list's tombstone stands for them.
+#
+# The migration (b7d1f0c4e825) creates the triggers in real databases;
+# create_all() (tests, fresh dev databases) gets them from the DDL event below.
+
+DEFAULT_LIMIT = 500
+
+TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS change_log_lists_ai AFTER INSERT ON shopping_lists BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT new.household_id, coalesce(max(seq), 0) + 1, 'list', new.id, 'insert'
+        FROM change_log WHERE household_id = new.household_id;
+    END""",
+    # version/updated_at bumps (versioning.touch_lists) are not changes to the list
+    """CREATE TRIGGER IF NOT EXISTS change_log_lists_au AFTER UPDATE OF name, date ON shopping_lists BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT new.household_id, coalesce(max(seq), 0) + 1, 'list', new.id, 'update'
+        FROM change_log WHERE household_id = new.household_id;
+    END""",
+    # Nothing is logged when the household itself is being deleted
+    """CREATE TRIGGER IF NOT EXISTS change_log_lists_ad AFTER DELETE ON shopping_lists BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT h.id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = h.id), 'list', old.id, 'delete'
+        FROM households h WHERE h.id = old.household_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS change_log_items_ai AFTER INSERT ON shopping_items BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT l.household_id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = l.household_id),
+               'item', new.id, 'insert'
+        FROM shopping_lists l WHERE l.id = new.shopping_list_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS change_log_items_au
+       AFTER UPDATE OF name, category, amount, free_text, bought ON shopping_items BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT l.household_id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = l.household_id),
+               'item', new.id, 'update'
+        FROM shopping_lists l WHERE l.id = new.shopping_list_id;
+    END""",
+    # Finds no list (and logs nothing) when the delete cascades from the list
+    """CREATE TRIGGER IF NOT EXISTS change_log_items_ad AFTER DELETE ON shopping_items BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT l.household_id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = l.household_id),
+               'item', old.id, 'delete'
+        FROM shopping_lists l WHERE l.id = old.shopping_list_id;
+    END""",
+)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_triggers(target, connection, **kw):
+    # After every table exists: the triggers reference three of them
+    if connection.dialect.name == 'sqlite':
+        for statement in TRIGGERS:
+            connection.exec_driver_sql(statement)
+
+
+class ChangeSet:
+    def __init__(self, lists, items, deleted_lists, deleted_items, since, more):
+        self.lists = lists  # Current state of changed lists / items
+        self.items = items
+        self.deleted_lists = deleted_lists  # Ids
+        self.deleted_items = deleted_items
+        self.since = since  # Pass back as ?since= for the next batch
+        self.more = more
+
+
+def changes(household_id, since=0, limit=DEFAULT_LIMIT):
+    """ChangeSet of the rows changed after seq `since`, oldest change first, at most `limit` rows."""
+    latest = func.max(ChangeLog.seq).label('seq')
+    stmt = (select(ChangeLog.kind, ChangeLog.row_id, latest, ChangeLog.op) # SQLite: op comes from the max(seq) row
+            .where(ChangeLog.household_id == household_id, ChangeLog.seq > since)
+            .group_by(ChangeLog.kind, ChangeLog.row_id)
+            .order_by(latest).limit(limit + 1))
+    if not since:
+        stmt = stmt.having(ChangeLog.op != 'delete') # A first sync has nothing to delete
+    rows = db.session.execute(stmt).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    wanted = {'list': set(), 'item': set()}
+    for row in rows:
+        if row.op != 'delete':
+            wanted[row.kind].add(row.row_id)
+    lists = (ShoppingList.query.filter(ShoppingList.id.in_(wanted['list']), ShoppingList.household_id == household_id)
+             .order_by(ShoppingList.id).all() if wanted['list'] else [])
+    # The household check is a subquery rather than a join, so the rows come out of the
+    # primary key already in id order
+    items = (ShoppingItem.query
+             .filter(ShoppingItem.id.in_(wanted['item']),
+                     ShoppingItem.shopping_list_id.in_(select(ShoppingList.id).where(ShoppingList.household_id == household_id)))
+             .order_by(ShoppingItem.id).all() if wanted['item'] else [])
+    # A row whose last change is not a delete but which is gone went with its list
+    found = {'list': {l.id for l in lists}, 'item': {i.id for i in items}}
+    deleted = {kind: sorted(row.row_id for row in rows if row.kind == kind and row.row_id not in found[kind])
+               for kind in ('list', 'item')}
+    return ChangeSet(lists, items, deleted['list'], deleted['item'], rows[-1].seq if rows else since, more)
+
+
+class UploadError(Exception):
+    """Validation errors of an upload, keyed by where they are, e.g. 'items.create.3'."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _ids(values, where):
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in values):
+        raise UploadError({where: ['Expected a list of integers.']})
+    return set(values)
+
+
+def apply_upload(household, lists=None, items=None):
+    """Apply a batch of offline edits to the household in the current transaction.
+
+    `lists` and `items` are {"create": [...], "update": [...], "delete": [ids]};
+    created entries may carry a client "ref", and new items name their list by
+    "list_id" or by the "list_ref" of a list created in the same upload. Edits
+    of rows that are gone (deleted by someone else meanwhile) are skipped and
+    reported, not treated as errors. An item update that names the "version"
+    it was made against is only applied if the item is still at that version;
+    otherwise the item's current state is returned under "conflicts" for the
+    client to merge (see editing.py). Each kind of write is one bulk statement,
+    whatever the size of the batch. Raises UploadError on invalid entries.
+    """
+    lists, items = lists or {}, items or {}
+    errors = {}
+    skipped = {'lists': [], 'items': []}
+    conflicts = []
+
+    def valid(form_class, entry, where, flags=(), refs=()):
+        if not isinstance(entry, dict):
+            errors[where] = ['Expected a JSON object.']
+            return None
+        form = validate_form(form_class, entry)
+        found = dict(form.errors)
+        found.update({flag: ['Must be true or false.'] for flag in flags
+                      if flag in entry and not isinstance(entry[flag], bool)})
+        # Refs are dict keys here and in the reply, so only strings and integers
+        found.update({ref: ['Must be a string or an integer.'] for ref in refs
+                      if entry.get(ref) is not None
+                      and (isinstance(entry[ref], bool) or not isinstance(entry[ref], (str, int)))})
+        if found:
+            errors[where] = found
+            return None
+        return form
+
+    # Validate everything before writing anything
+    new_lists = []
+    for index, entry in enumerate(lists.get('create', [])):
+        form = valid(CreateShoppingListForm, entry, f'lists.create.{index}', refs=('ref',))
+        if form is not None:
+            new_lists.append((entry.get('ref'), {'name': form.name.data, 'date': form.date.data,
+                                                 'household_id': household.id}))
+    list_updates = [entry for entry in lists.get('update', []) if isinstance(entry, dict)]
+    list_ids = _ids([entry.get('id') for entry in list_updates], 'lists.update')
+    item_updates = [entry for entry in items.get('update', []) if isinstance(entry, dict)]
+    item_ids = _ids([entry.get('id') for entry in item_updates], 'items.update')
+    deleted_list_ids = _ids(lists.get('delete', []), 'lists.delete')
+    deleted_item_ids = _ids(items.get('delete', []), 'items.delete')
+    target_list_ids = _ids([entry['list_id'] for entry in items.get('create', [])
+                            if isinstance(entry, dict) and 'list_id' in entry], 'items.create')
+
+    # One query each for the existing rows the upload refers to
+    current_lists = {l.id: l for l in ShoppingList.query.filter(
+        ShoppingList.id.in_(list_ids | target_list_ids), ShoppingList.household_id == household.id)}
+    current_items = {i.id: i for i in ShoppingItem.query.join(ShoppingList, ShoppingList.id == ShoppingItem.shopping_list_id)
+                     .filter(ShoppingItem.id.in_(item_ids), ShoppingList.household_id == household.id)}
+
+    list_rows = []
+    for index, entry in enumerate(list_updates):
+        shopping_list = current_lists.get(entry['id'])
+        if shopping_list is None:
+            skipped['lists'].append(entry['id'])
+            continue
+        data = {'name': shopping_list.name, 'date': shopping_list.date.strftime('%Y-%m-%d'), **entry}
+        form = valid(CreateShoppingListForm, data, f'lists.update.{index}')
+        if form is not None:
+            list_rows.append({'id': shopping_list.id, 'name': form.name.data, 'date': form.date.data})
+
+    refs = {ref for ref, _ in new_lists if ref is not None}
+    new_items = []
+    for index, entry in enumerate(items.get('create', [])):
+        form = valid(AddShoppingItemForm, entry, f'items.create.{index}', ('bought',), ('ref', 'list_ref'))
+        if form is None:
+            continue
+        if entry.get('list_ref') is not None and entry['list_ref'] in refs:
+            target = ('ref', entry['list_ref'])
+        elif entry.get('list_id') in current_lists:
+            target = ('id', entry['list_id'])
+        elif 'list_id' in entry:
+            skipped['items'].append(entry.get('ref'))
+            continue
+        else:
+            errors[f'items.create.{index}'] = {'list_id': ['Give "list_id" or the "list_ref" of a new list.']}
+            continue
+        new_items.append((entry.get('ref'), target, {
+            'name': form.name.data, 'category': form.category.data, 'amount': form.amount.data,
+            'free_text': form.free_text.data, 'bought': entry.get('bought', False)}))
+
+    item_rows, added, removed = [], [], []
+    for index, entry in enumerate(item_updates):
+        item = current_items.get(entry['id'])
+        if item is None:
+            skipped['items'].append(entry['id'])
+            continue
+        current = {'name': item.name, 'category': item.category, 'amount': item.amount,
+                   'free_text': item.free_text, 'bought': item.bought}
+        form = valid(EditShoppingItemForm, {**current, **entry}, f'items.update.{index}', ('bought',))
+        if form is None:
+            continue
+        if form.version.data is not None and form.version.data != item.version:
+            conflicts.append(item) # Changed on the server since the client read it
+            continue
+        row = {'b_id': item.id, 'b_version': item.version, 'version': item.version + 1,
+               'name': form.name.data, 'category': form.category.data, 'amount': form.amount.data,
+               'free_text': form.free_text.data, 'bought': entry.get('bought', item.bought)}
+        item_rows.append(row)
+        if (row['name'], row['category']) != (item.name, item.category):
+            added.append((row['name'], row['category']))
+            removed.append((item.name, item.category))
+    if errors:
+        raise UploadError(errors)
+
+    # Writes: lists first so new items can point at them, deletes last
+    touched = set(list_ids) & set(current_lists)
+    created_lists = {}
+    if new_lists:
+        # New rowids ascend in VALUES order, so sorted ids line up with the rows
+        ids = sorted(db.session.scalars(insert(ShoppingList).returning(ShoppingList.id), [row for _, row in new_lists]))
+        created_lists = {ref: list_id for (ref, _), list_id in zip(new_lists, ids) if ref is not None}
+    if list_rows:
+        db.session.execute(update(ShoppingList), list_rows)
+    created_items = {}
+    if new_items:
+        rows = [{**row, 'shopping_list_id': created_lists[value] if how == 'ref' else value}
+                for _, (how, value), row in new_items]
+        ids = sorted(db.session.scalars(insert(ShoppingItem).returning(ShoppingItem.id), rows))
+        created_items = {ref: item_id for (ref, _, _), item_id in zip(new_items, ids) if ref is not None}
+        touched.update(row['shopping_list_id'] for row in rows)
+        added.extend((row['name'], row['category']) for row in rows)
+    if item_rows:
+        # The same conditional UPDATE as editing.save_item, as one executemany
+        items_table = ShoppingItem.__table__
+        db.session.execute(update(items_table).where(items_table.c.id == bindparam('b_id'),
+                                                     items_table.c.version == bindparam('b_version')), item_rows)
+        touched.update(current_items[row['b_id']].shopping_list_id for row in item_rows)
+    deleted_items = []
+    if deleted_item_ids:
+        deleted = db.session.execute(
+            delete(ShoppingItem)
+            .where(ShoppingItem.id.in_(deleted_item_ids),
+                   ShoppingItem.shopping_list_id.in_(select(ShoppingList.id).where(ShoppingList.household_id == household.id)))
+            .returning(ShoppingItem.id, ShoppingItem.shopping_list_id, ShoppingItem.name, ShoppingItem.category)
+            .execution_options(synchronize_session=False)).all()
+        deleted_items = sorted(row.id for row in deleted)
+        touched.update(row.shopping_list_id for row in deleted)
+        removed.extend((row.name, row.category) for row in deleted)
+        skipped['items'].extend(sorted(deleted_item_ids - set(deleted_items)))
+    deleted_lists = []
+    if deleted_list_ids:
+        deleted_lists = db.session.scalars(
+            delete(ShoppingList)
+            .where(ShoppingList.id.in_(deleted_list_ids), ShoppingList.household_id == household.id)
+            .returning(ShoppingList.id)
+            .execution_options(synchronize_session=False)).all()
+        skipped['lists'].extend(sorted(deleted_list_ids - set(deleted_lists)))
+        touched.difference_update(deleted_lists)
+        forget_lists(*deleted_lists)
+
+    touch_lists(*touched)
+    if new_lists or list_rows or deleted_lists:
+        touch_households(household.id)
+    for list_id in touched:
+        live_updates.publish(list_id, 'reload', {}) # Open pages re-read the list
+    if added or removed:
+        autocomplete.record(household.id, added, removed)
+    return {'lists': {'created': created_lists, 'deleted': sorted(deleted_lists)},
+            'items': {'created': created_items, 'deleted': deleted_items},
+            'skipped': skipped, 'conflicts': conflicts}
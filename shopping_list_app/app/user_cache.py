@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import make_transient_to_detached
+
+# Per-worker cache of the logged-in user's identity for Flask-Login.
+# Only lightweight column values (no password hash) are kept. On a hit the
+# User is rebuilt and attached to the session without a SELECT; columns that
+# were not cached load lazily if something actually touches them.
+# Entries expire after USER_CACHE_TTL seconds, which bounds how stale another
+# worker's copy can get; changes made through this worker's session drop the
+# entry immediately (see the User mapper events in models.py).
+
+CACHED_COLUMNS = ('id', 'username', 'email')
+
+
+class TTLCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class UserCache:
+    """Configured by USER_CACHE_ENABLED, USER_CACHE_TTL and USER_CACHE_MAX_ENTRIES; one per app."""
+
+    def __init__(self, app=None):
+        self.cache = TTLCache()
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.cache = TTLCache(app.config.get('USER_CACHE_MAX_ENTRIES', 1024))
+        app.extensions['user_cache'] = self
+
+    def load(self, user_id, session, model, config):
+        """Return the User for `user_id`, from the cache when possible."""
+        if not config.get('USER_CACHE_ENABLED', True):
+            return session.get(model, user_id)
+        record = self.cache.get(user_id)
+        if record is None:
+            user = session.get(model, user_id)
+            if user is not None:
+                self.cache.set(user_id, {c: getattr(user, c) for c in CACHED_COLUMNS},
+                               config.get('USER_CACHE_TTL', self.ttl))
+            return user
+        user = session.identity_map.get(session.identity_key(model, user_id))
+        if user is not None:
+            return user
+        user = model(**record)
+        make_transient_to_detached(user) # Persistent identity, no pending changes
+        session.add(user)
+        return user
+
+    def invalidate(self, user_id):
+        self.cache.delete(user_id)
+
+    def clear(self):
+        self.cache.clear()
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from flask import request, session, make_response
+from flask_login import current_user
+from sqlalchemy import update
+from werkzeug.http import is_resource_modified
+
+from .models import Household, ShoppingList
+from .extensions import db, fragment_cache
+
+# Change counters for conditional GETs.
+# ShoppingList.version moves whenever one of its items changes and
+# Household.version whenever one of its lists is created or deleted. Views
+# turn the counter into an ETag (and updated_at into Last-Modified) so a
+# client holding the current page gets a 304 before anything is rendered.
+# The bumps run in the caller's transaction and are committed with it.
+# Bumping a list also drops its cached fragments (they are keyed by version,
+# so this only frees space; an old version can never be served). Deleting one
+# drops them too: list ids are AUTOINCREMENT and never come back, but the
+# entries would otherwise sit in the cache until evicted.
+
+
+def touch_lists(*list_ids):
+    if list_ids:
+        db.session.execute(
+            update(ShoppingList)
+            .where(ShoppingList.id.in_(set(list_ids)))
+            .values(version=ShoppingList.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False))
+        for list_id in set(list_ids):
+            fragment_cache.invalidate_prefix(list_fragment_prefix(list_id))
+
+
+def forget_lists(*list_ids):
+    """Drop the cached fragments of deleted lists."""
+    for list_id in set(list_ids):
+        fragment_cache.invalidate_prefix(list_fragment_prefix(list_id))
+
+
+def list_fragment_prefix(list_id):
+    return f'list-items:{list_id}:'
+
+
+def touch_households(*household_ids):
+    if household_ids:
+        db.session.execute(
+            update(Household)
+            .where(Household.id.in_(set(household_ids)))
+            .values(version=Household.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False))
+
+
+def make_etag(kind, obj):
+    # The page also shows who is logged in, so the user is part of the tag.
+    return f'{kind}-{obj.id}-v{obj.version}-u{current_user.get_id()}'
+
+
+def conditional_response(etag, last_modified, render):
+    """Return a 304 if the client's copy is current, else render() with validators.
+
+    A pending flash message is part of the page, so it always forces a render.
+    """
+    if '_flashes' not in session and not is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let browsers keep the page but revalidate it on every visit
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
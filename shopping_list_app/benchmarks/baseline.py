@@ -0,0 +1,51 @@
+"""Baseline comparison for route_latency.py results (plain data, no app imports)."""
+
+NOISE_FLOOR_MS = 0.5  # p95 changes smaller than this are never a regression
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def mismatched_settings(current, baseline):
+    """Names of run settings that differ, which makes timings incomparable."""
+    now, before = current['meta'], baseline['meta']
+    checks = {
+        'dataset': (now['dataset']['sizes'], before['dataset']['sizes']),
+        'seed': (now['dataset']['seed'], before['dataset']['seed']),
+        'thread count': (now['threads'], before['threads']),
+        'password hash method': (now['password_hash_method'], before['password_hash_method']),
+    }
+    return [name for name, (a, b) in checks.items() if a != b]
+
+
+def compare(current, baseline, tolerance):
+    """Return (rows, regressions) comparing two result documents route by route.
+
+    A route regresses if its p95 grew by more than `tolerance` (and by more
+    than the noise floor), if it runs more queries, or if it fails more often.
+    Query counts do not depend on timing, so any increase counts.
+    """
+    rows, regressions = [], []
+    for name, now in current['routes'].items():
+        before = baseline['routes'].get(name)
+        if before is None:
+            rows.append((name, None, now['p95_ms'], None, now['queries_max'], 'new'))
+            continue
+        problems = []
+        limit = before['p95_ms'] * (1 + tolerance)
+        if now['p95_ms'] > limit and now['p95_ms'] - before['p95_ms'] > NOISE_FLOOR_MS:
+            problems.append('slower')
+        if now['queries_max'] > before['queries_max']:
+            problems.append('more queries')
+        if now['errors'] > before['errors']:
+            problems.append('errors')
+        if problems:
+            regressions.append(name)
+        rows.append((name, before['p95_ms'], now['p95_ms'], before['queries_max'], now['queries_max'],
+                     ', '.join(problems) or 'ok'))
+    return rows, regressions
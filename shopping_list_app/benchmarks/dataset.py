@@ -0,0 +1,129 @@
+"""Deterministic benchmark dataset.
+
+The same seed and sizes always produce the same rows, so two benchmark runs
+(or a run and a saved baseline) measure the same data. Users belong to
+several households that overlap in membership, and every household has a
+weekly list going back `years` years with a realistic number of items, most
+of them already bought in all but the newest lists.
+
+Rows are written with bulk INSERTs. All users get the same password (hashed
+once) so seeding does not spend minutes in scrypt.
+"""
+import importlib
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+# The app package by the same path this module was reached through: `app`
+# when a benchmark script runs from the project root, `shopping_list_app.app`
+# under the test suite. Importing the other one would load a second set of
+# models bound to a second `db`.
+_APP = __package__.rpartition('.')[0] + '.app' if '.' in (__package__ or '') else 'app'
+db = importlib.import_module(_APP + '.extensions').db
+_models = importlib.import_module(_APP + '.models')
+User, Household, ShoppingList, ShoppingItem, user_households = (
+    _models.User, _models.Household, _models.ShoppingList, _models.ShoppingItem, _models.user_households)
+hash_password = importlib.import_module(_APP + '.passwords').hash_password
+
+PASSWORD = 'benchmark-password'
+
+# Fixed origin so dates do not depend on the day the benchmark runs
+END_DATE = datetime(2025, 6, 30)
+
+PRODUCE = ['Apples', 'Bananas', 'Carrots', 'Tomatoes', 'Onions', 'Potatoes', 'Lettuce', 'Cucumbers',
+           'Peppers', 'Lemons', 'Garlic', 'Avocados', 'Spinach', 'Grapes', 'Mushrooms']
+DAIRY = ['Milk', 'Butter', 'Yogurt', 'Cheddar', 'Eggs', 'Cream', 'Feta', 'Cottage cheese']
+PANTRY = ['Rice', 'Pasta', 'Flour', 'Sugar', 'Olive oil', 'Coffee', 'Tea', 'Cereal', 'Lentils',
+          'Canned tomatoes', 'Peanut butter', 'Honey', 'Salt', 'Oats']
+OTHER = ['Bread', 'Chicken', 'Salmon', 'Tofu', 'Dish soap', 'Toilet paper', 'Shampoo', 'Batteries',
+         'Trash bags', 'Sponges']
+CATALOG = ([(name, 'Produce') for name in PRODUCE] + [(name, 'Dairy') for name in DAIRY] +
+           [(name, 'Pantry') for name in PANTRY] + [(name, None) for name in OTHER])
+AMOUNTS = [None, '1', '2', '3', '6', '500g', '1kg', '2 packs', '1 dozen']
+
+
+class Sizes:
+    def __init__(self, users=200, households=60, members=(2, 5), years=2, items=(5, 30)):
+        self.users = users
+        self.households = households
+        self.members = members        # (min, max) users per household
+        self.years = years            # one list per household per week
+        self.items = items            # (min, max) items per list
+
+    def as_dict(self):
+        return {'users': self.users, 'households': self.households, 'members': list(self.members),
+                'years': self.years, 'items': list(self.items)}
+
+
+def generate(sizes, seed=1):
+    """Create the dataset in the current app's database (tables must exist).
+
+    Returns a summary with row counts and a few ids the benchmark drives:
+    a member user, one of their households, a list and an item in it.
+    """
+    rng = random.Random(seed)
+    password_hash = hash_password(PASSWORD)
+
+    db.session.execute(insert(User), [
+        {'id': n, 'username': f'user{n}', 'email': f'user{n}@example.com', 'password_hash': password_hash}
+        for n in range(1, sizes.users + 1)])
+    db.session.execute(insert(Household), [
+        {'id': n, 'name': f'Household {n}'} for n in range(1, sizes.households + 1)])
+
+    # Households draw members from a sliding window of users, so neighbours
+    # overlap and most users end up in more than one household.
+    memberships = set()
+    for household_id in range(1, sizes.households + 1):
+        window = max(sizes.members[1] * 2, 1)
+        start = (household_id * sizes.users // max(sizes.households, 1)) % sizes.users
+        candidates = [(start + k) % sizes.users + 1 for k in range(window)]
+        for user_id in rng.sample(candidates, min(len(candidates), rng.randint(*sizes.members))):
+            memberships.add((user_id, household_id))
+    db.session.execute(insert(user_households), [
+        {'user_id': u, 'household_id': h} for u, h in sorted(memberships)])
+
+    weeks = sizes.years * 52
+    list_id = item_id = 0
+    list_rows, item_rows = [], []
+    for household_id in range(1, sizes.households + 1):
+        for week in range(weeks):
+            list_id += 1
+            date = END_DATE - timedelta(weeks=weeks - 1 - week, hours=rng.randint(0, 96))
+            list_rows.append({'id': list_id, 'name': f'Week {week + 1}', 'date': date,
+                              'household_id': household_id, 'updated_at': date})
+            recent = week >= weeks - 2
+            for name, category in rng.sample(CATALOG, min(len(CATALOG), rng.randint(*sizes.items))):
+                item_id += 1
+                item_rows.append({'id': item_id, 'name': name, 'category': category,
+                                  'amount': rng.choice(AMOUNTS), 'free_text': None,
+                                  'bought': not recent or rng.random() < 0.3,
+                                  'shopping_list_id': list_id})
+        # Flush in chunks to keep memory flat on large sizes
+        if len(item_rows) > 20000:
+            _flush(list_rows, item_rows)
+    _flush(list_rows, item_rows)
+    db.session.commit()
+
+    member_id, household_id = min(memberships, key=lambda m: (m[1], m[0]))
+    newest_list = household_id * weeks
+    first_item = db.session.query(db.func.min(ShoppingItem.id)).filter_by(shopping_list_id=newest_list).scalar()
+    return {
+        'seed': seed,
+        'sizes': sizes.as_dict(),
+        'rows': {'users': sizes.users, 'households': sizes.households, 'memberships': len(memberships),
+                 'lists': list_id, 'items': item_id},
+        'member_email': f'user{member_id}@example.com',
+        'household_id': household_id,
+        'list_id': newest_list,
+        'item_id': first_item,
+    }
+
+
+def _flush(list_rows, item_rows):
+    if list_rows:
+        db.session.execute(insert(ShoppingList), list_rows)
+    if item_rows:
+        db.session.execute(insert(ShoppingItem), item_rows)
+    list_rows.clear()
+    item_rows.clear()
@@ -0,0 +1,96 @@
+"""Startup benchmark: how long a gunicorn worker takes to import the app.
+
+Runs `python -X importtime -c "import wsgi"` in fresh interpreters (the
+prod profile, as a worker loads it), keeps the fastest run, and prints the
+total plus the heaviest top-level imports. Exits with status 1 if the total
+is over --budget or a module that only the flask CLI needs (Alembic and
+friends, see app/__init__.py) was imported.
+
+    python benchmarks/import_time.py [--runs 5] [--budget 600] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUDGET_MS = 600  # Import of wsgi, cumulative; about 270 ms on a laptop
+CLI_ONLY = ('flask_migrate', 'alembic', 'mako')  # Loaded by `flask db`, never by a worker
+
+
+class ImportTimes:
+    def __init__(self, target, modules):
+        self.target = target
+        self.modules = modules  # name -> (self_us, cumulative_us, depth), in import order
+
+    @property
+    def total_ms(self):
+        return self.modules[self.target][1] / 1000
+
+    def top(self, n):
+        """(name, cumulative ms) of the heaviest imports made directly by the target."""
+        direct = [(name, cumulative / 1000) for name, (_, cumulative, depth) in self.modules.items() if depth == 1]
+        return sorted(direct, key=lambda entry: -entry[1])[:n]
+
+    def loaded(self, packages):
+        """Those of `packages` that were imported, by themselves or through a submodule."""
+        return sorted({p for p in packages for name in self.modules if name == p or name.startswith(p + '.')})
+
+
+def parse(stderr, target):
+    # "import time:  self [us] | cumulative | imported package", one line per
+    # module, indented two spaces per level below whatever imported it
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    if target not in modules:
+        raise RuntimeError(f'{target} was not imported:\n{stderr[-2000:]}')
+    return ImportTimes(target, modules)
+
+
+def measure(target='wsgi', runs=3, env=None):
+    """ImportTimes of the fastest of `runs` fresh imports of `target`."""
+    env = {**os.environ, 'APP_CONFIG': 'prod', 'DATABASE_URL': 'sqlite:///:memory:', **(env or {})}
+    best = None
+    for _ in range(runs):
+        done = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+                              cwd=ROOT, env=env, capture_output=True, text=True)
+        if done.returncode:
+            raise RuntimeError(f'import {target} failed:\n{done.stderr[-2000:]}')
+        times = parse(done.stderr, target)
+        if best is None or times.total_ms < best.total_ms:
+            best = times
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', default='wsgi', help='module to import')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=BUDGET_MS, help='milliseconds')
+    parser.add_argument('--top', type=int, default=15, help='heaviest direct imports to list')
+    args = parser.parse_args()
+
+    times = measure(args.target, args.runs)
+    print(f'{"import":<40} {"cumulative ms":>14}')
+    for name, ms in times.top(args.top):
+        print(f'{name:<40} {ms:>14.1f}')
+    print(f'{args.target + " (total)":<40} {times.total_ms:>14.1f}   budget {args.budget:.0f}')
+    failed = False
+    if times.total_ms > args.budget:
+        print(f'over budget by {times.total_ms - args.budget:.1f} ms')
+        failed = True
+    cli_only = times.loaded(CLI_ONLY)
+    if cli_only:
+        print('CLI-only modules imported: ' + ', '.join(cli_only))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Login throughput benchmark: inline password hashing vs. the hashing pool.
+
+Runs a burst of concurrent logins while other threads keep loading a cheap
+page, once with PASSWORD_HASH_WORKERS=0 (hash inline, the old behaviour) and
+once with the process pool, and prints logins/s plus page latency for both.
+
+    python benchmarks/login_throughput.py [--logins 64] [--threads 8] [--pool 2]
+"""
+import argparse
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, _tmp, True)
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from wsgi import app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import User  # noqa: E402
+
+PASSWORD = 'benchmark-password'
+
+
+def setup(users):
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, PASSWORD_HASH_WORKERS=0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for n in range(users):
+            user = User(username=f'bench{n}', email=f'bench{n}@example.com')
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+
+
+def run(workers, logins, threads):
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    page_client = app.test_client()
+    page_client.post('/login', data={'email': 'bench0@example.com', 'password': PASSWORD})
+    page_client.get('/index')
+
+    done = threading.Event()
+    page_latencies = []
+
+    def load_pages():
+        while not done.is_set():
+            start = time.perf_counter()
+            page_client.get('/index')
+            page_latencies.append(time.perf_counter() - start)
+
+    remaining = iter(range(logins))
+    lock = threading.Lock()
+
+    def do_logins():
+        client = app.test_client()
+        while True:
+            with lock:
+                n = next(remaining, None)
+            if n is None:
+                return
+            client.post('/login', data={'email': f'bench{n % threads}@example.com', 'password': PASSWORD})
+            client.get('/logout')
+
+    pager = threading.Thread(target=load_pages)
+    pager.start()
+    start = time.perf_counter()
+    workers_threads = [threading.Thread(target=do_logins) for _ in range(threads)]
+    for t in workers_threads:
+        t.start()
+    for t in workers_threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    pager.join()
+
+    latencies = sorted(page_latencies) or [0.0]
+    return {
+        'logins_per_s': round(logins / elapsed, 1),
+        'page_p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'page_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0] * 1000, 1),
+        'pages_served': len(page_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--pool', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    args = parser.parse_args()
+
+    setup(args.threads)
+    before = run(0, args.logins, args.threads)
+    after = run(args.pool, args.logins, args.threads)
+    print(f"method: {app.config.get('PASSWORD_HASH_METHOD')}, {args.logins} logins on {args.threads} threads")
+    print(f"{'':24}{'inline':>12}{f'pool({args.pool})':>12}")
+    for key in before:
+        print(f'{key:24}{before[key]:>12}{after[key]:>12}')
+
+
+if __name__ == '__main__':
+    main()
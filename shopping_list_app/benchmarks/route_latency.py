@@ -0,0 +1,329 @@
+"""Route benchmark: latency, throughput and SQL query count for every page.
+
+Seeds a deterministic dataset (see dataset.py) into a scratch SQLite file,
+then drives each route of the 'main' blueprint through the Flask test client
+and reports p50/p95/p99 latency, requests/s and queries per request.
+
+    python benchmarks/route_latency.py                      # print the table
+    python benchmarks/route_latency.py --save baseline.json # ... and keep it
+    python benchmarks/route_latency.py --compare baseline.json
+
+--compare exits with status 1 if a route got slower than the baseline by more
+than --tolerance (p95, with a small absolute noise floor) or runs more queries
+than it did. Only compare runs made with the same dataset sizes and seed.
+"""
+import argparse
+import atexit
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, _tmp, True)
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmp, 'bench.db'))
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from wsgi import app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import ShoppingList, ShoppingItem  # noqa: E402
+from benchmarks.dataset import Sizes, generate, PASSWORD  # noqa: E402
+from benchmarks.baseline import percentile, compare, mismatched_settings  # noqa: E402
+
+
+class Scenario:
+    """One timed request shape.
+
+    `path` and `data` are called with (ctx, n, target); `prepare` (untimed) is
+    called once per request before the clock starts and returns the target,
+    e.g. a freshly inserted row for the delete routes to remove.
+    `client` is 'member' (logged in), 'anon' or 'fresh' (logged in anew for
+    every request, for logout).
+    """
+
+    def __init__(self, name, endpoint, method, path, data=None, client='member', prepare=None, headers=None):
+        self.name = name
+        self.endpoint = endpoint
+        self.method = method
+        self.path = path
+        self.data = data
+        self.client = client
+        self.prepare = prepare
+        self.headers = headers
+
+
+def new_list(ctx, n):
+    row = db.session.execute(insert(ShoppingList).returning(ShoppingList.id), [
+        {'name': f'Bench {n}', 'date': datetime(2025, 7, 1), 'household_id': ctx['household_id']}]).first()
+    db.session.commit()
+    return row.id
+
+
+def new_item(ctx, n):
+    row = db.session.execute(insert(ShoppingItem).returning(ShoppingItem.id), [
+        {'name': f'Bench item {n}', 'bought': False, 'shopping_list_id': ctx['list_id']}]).first()
+    db.session.commit()
+    return row.id
+
+
+def list_etag(ctx, n):
+    # Ask once for the current ETag so the timed request can revalidate
+    response = ctx['member'].get(f"/shopping_list/{ctx['list_id']}/items")
+    return response.headers['ETag']
+
+
+SCENARIOS = [
+    Scenario('index', 'main.index', 'GET', lambda c, n, t: '/index'),
+    Scenario('register_form', 'main.register', 'GET', lambda c, n, t: '/register', client='anon'),
+    Scenario('register', 'main.register', 'POST', lambda c, n, t: '/register', client='anon',
+             data=lambda c, n, t: {'username': f'bench{n}', 'email': f'bench{n}@example.com',
+                                   'password': PASSWORD, 'confirm_password': PASSWORD}),
+    Scenario('login_form', 'main.login', 'GET', lambda c, n, t: '/login', client='anon'),
+    Scenario('login', 'main.login', 'POST', lambda c, n, t: '/login', client='anon',
+             data=lambda c, n, t: {'email': c['member_email'], 'password': PASSWORD}),
+    Scenario('logout', 'main.logout', 'GET', lambda c, n, t: '/logout', client='fresh'),
+    Scenario('create_household_form', 'main.create_household', 'GET', lambda c, n, t: '/create_household'),
+    Scenario('create_household', 'main.create_household', 'POST', lambda c, n, t: '/create_household',
+             data=lambda c, n, t: {'name': f'Bench household {n}'}),
+    Scenario('view_households', 'main.view_households', 'GET', lambda c, n, t: '/households'),
+    Scenario('create_list_form', 'main.create_shopping_list', 'GET',
+             lambda c, n, t: f"/household/{c['household_id']}/new_list"),
+    Scenario('create_list', 'main.create_shopping_list', 'POST',
+             lambda c, n, t: f"/household/{c['household_id']}/new_list",
+             data=lambda c, n, t: {'name': f'Bench list {n}', 'date': '2025-07-01'}),
+    Scenario('view_household_lists', 'main.view_household_lists', 'GET',
+             lambda c, n, t: f"/household/{c['household_id']}/lists"),
+    Scenario('export_household', 'main.export_household', 'GET',
+             lambda c, n, t: f"/household/{c['household_id']}/export?format=csv"),
+    Scenario('delete_list', 'main.delete_shopping_list', 'POST',
+             lambda c, n, t: f'/shopping_list/{t}/delete', prepare=new_list),
+    Scenario('clone_list', 'main.clone_shopping_list', 'POST',
+             lambda c, n, t: f"/shopping_list/{c['list_id']}/clone",
+             data=lambda c, n, t: {'name': f'Bench copy {n}', 'date': '2025-07-01', 'reset_bought': 'y'}),
+    Scenario('add_item_form', 'main.add_item_to_list', 'GET',
+             lambda c, n, t: f"/shopping_list/{c['list_id']}/add_item"),
+    Scenario('add_item', 'main.add_item_to_list', 'POST',
+             lambda c, n, t: f"/shopping_list/{c['list_id']}/add_item",
+             data=lambda c, n, t: {'name': f'Bench item {n}', 'amount': '1'}),
+    Scenario('view_list_items', 'main.view_list_items', 'GET',
+             lambda c, n, t: f"/shopping_list/{c['list_id']}/items"),
+    Scenario('view_list_items_304', 'main.view_list_items', 'GET',
+             lambda c, n, t: f"/shopping_list/{c['list_id']}/items", prepare=list_etag,
+             headers=lambda c, n, t: {'If-None-Match': t}),
+    Scenario('view_list_aisles', 'main.view_list_aisles', 'GET',
+             lambda c, n, t: f"/shopping_list/{c['list_id']}/aisles"),
+    Scenario('aisle_order_form', 'main.edit_aisle_order', 'GET',
+             lambda c, n, t: f"/household/{c['household_id']}/aisles"),
+    Scenario('edit_item_form', 'main.edit_item', 'GET', lambda c, n, t: f"/item/{c['item_id']}/edit"),
+    Scenario('edit_item', 'main.edit_item', 'POST', lambda c, n, t: f"/item/{c['item_id']}/edit",
+             data=lambda c, n, t: {'name': 'Milk', 'amount': str(n % 5 + 1)}),
+    Scenario('delete_item', 'main.delete_item', 'POST', lambda c, n, t: f'/item/{t}/delete', prepare=new_item),
+    Scenario('toggle_bought', 'main.toggle_item_bought', 'POST',
+             lambda c, n, t: f"/item/{c['item_id']}/toggle_bought"),
+    Scenario('search', 'main.search', 'GET',
+             lambda c, n, t: f"/search?q={['milk', 'olive oil', 'bat', 'canned tom'][n % 4]}"),
+    Scenario('search_household', 'main.search', 'GET',
+             lambda c, n, t: f"/search?household_id={c['household_id']}&q={['milk', 'olive', 'bat'][n % 3]}"),
+    Scenario('suggest_item_name', 'api.suggestions', 'GET',
+             lambda c, n, t: f"/api/v1/households/{c['household_id']}/suggestions?q={'bmet'[n % 4]}"),
+]
+
+
+class QueryCounter:
+    """Counts SQL statements per thread (the test client runs a request in the calling thread)."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(('BEGIN', 'PRAGMA')):
+            self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self.local, 'count', 0)
+
+
+def login(client, email):
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'benchmark login failed for {email}')
+
+
+def seed(sizes, seed_value):
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        summary = generate(sizes, seed_value)
+        summary['seed_seconds'] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def run_scenario(scenario, ctx, counter, requests, threads):
+    numbers = itertools.count()
+    lock = threading.Lock()
+    latencies, queries, errors = [], [], []
+
+    def worker(per_thread):
+        member = app.test_client()
+        login(member, ctx['member_email'])
+        thread_ctx = dict(ctx, member=member)
+        for _ in range(per_thread):
+            with lock:
+                n = next(numbers)
+            if scenario.client == 'member':
+                client = member
+            else:
+                client = app.test_client()
+                if scenario.client == 'fresh':
+                    login(client, ctx['member_email'])
+            with app.app_context():
+                target = scenario.prepare(thread_ctx, n) if scenario.prepare else None
+            kwargs = {}
+            if scenario.data:
+                kwargs['data'] = scenario.data(thread_ctx, n, target)
+            if scenario.headers:
+                kwargs['headers'] = scenario.headers(thread_ctx, n, target)
+            path = scenario.path(thread_ctx, n, target)
+
+            counter.reset()
+            start = time.perf_counter()
+            response = client.open(path, method=scenario.method, **kwargs)
+            response.get_data() # Drain streamed bodies inside the timing
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                queries.append(counter.count)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    per_thread = max(1, requests // threads)
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - started
+    # Time spent in untimed setup is excluded from throughput
+    busy = sum(latencies) / threads
+
+    latencies.sort()
+    return {
+        'endpoint': scenario.endpoint,
+        'method': scenario.method,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / busy, 1) if busy else 0.0,
+        'wall_seconds': round(wall, 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def check_coverage(scenarios):
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint.startswith('main.')}
+    return sorted(endpoints - {s.endpoint for s in scenarios})
+
+
+def run(args):
+    sizes = Sizes(users=args.users, households=args.households, years=args.years)
+    dataset = seed(sizes, args.seed)
+    ctx = {key: dataset[key] for key in ('member_email', 'household_id', 'list_id', 'item_id')}
+
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    counter = QueryCounter()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter)
+    results = {}
+    try:
+        for scenario in scenarios:
+            results[scenario.name] = run_scenario(scenario, ctx, counter, args.requests, args.threads)
+            r = results[scenario.name]
+            print(f"  {scenario.name:24} p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+                  f"{r['throughput_rps']:8.1f} req/s  {r['queries_mean']:5.1f} queries", file=sys.stderr)
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'threads': args.threads,
+            'requests_per_route': args.requests,
+            'password_hash_method': app.config.get('PASSWORD_HASH_METHOD'),
+            'dataset': dataset,
+            'uncovered_endpoints': check_coverage(SCENARIOS),
+        },
+        'routes': results,
+    }
+
+
+def print_results(results):
+    print(f"{'route':24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>9}{'errors':>8}")
+    for name, r in results['routes'].items():
+        print(f"{name:24}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['throughput_rps']:>10.1f}{r['queries_mean']:>9.1f}{r['errors']:>8}")
+    uncovered = results['meta']['uncovered_endpoints']
+    if uncovered:
+        print(f"not benchmarked: {', '.join(uncovered)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--households', type=int, default=60)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True, default=str)
+        print(f'saved baseline to {args.save}')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for setting in mismatched_settings(results, baseline):
+            print(f'warning: baseline was recorded with a different {setting}')
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print(f"\n{'route':24}{'base p95':>10}{'p95':>10}{'base q':>8}{'q':>6}  status")
+        for name, base_p95, p95, base_q, q, status in rows:
+            print(f"{name:24}{'-' if base_p95 is None else f'{base_p95:.2f}':>10}{p95:>10.2f}"
+                  f"{'-' if base_q is None else base_q:>8}{q:>6}  {status}")
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
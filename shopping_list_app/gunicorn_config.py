@@ -1,5 +1,66 @@
-bind = "0.0.0.0:5000"
-workers = 4  # Adjust based on your server's CPU cores
+import multiprocessing
+import os
+
+# Production profile, driven by environment variables with CPU-based defaults.
+#   GUNICORN_WORKER_CLASS  gthread (default) or sync
+#   WEB_CONCURRENCY        worker processes (default: 2 * CPUs + 1)
+#   GUNICORN_THREADS       threads per gthread worker (default 4)
+#   GUNICORN_PRELOAD       load the app once in the master before forking (default 1)
+#   GUNICORN_MAX_REQUESTS  recycle a worker after this many requests (default 1000, 0 = never)
+# The SQLAlchemy pool of every worker is sized from the same numbers (see
+# DB_POOL_SIZE / DB_MAX_OVERFLOW below), so a worker never has more threads
+# than connections to give them.
+# No gevent: the database is SQLite, whose lock waits (busy_timeout) block
+# inside C, and under gevent one such wait stalls every greenlet in the worker.
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+cpus = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class not in ('gthread', 'sync'):
+    raise ValueError(f'GUNICORN_WORKER_CLASS must be gthread or sync, not {worker_class!r}')
+workers = env_int('WEB_CONCURRENCY', 2 * cpus + 1)
+threads = env_int('GUNICORN_THREADS', 4) if worker_class == 'gthread' else 1
+
+# Graceful recycling; the jitter keeps workers from restarting all at once
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') not in ('0', 'false', 'False')
+
 accesslog = "-"  # Log to stdout
 errorlog = "-"   # Log to stderr
-loglevel = "info"
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+# One connection per thread, plus a little headroom. At most 20 stay open;
+# the overflow covers any threads above that, opened under load and closed
+# again when returned.
+# The prod profile (app/config.py) reads these into SQLALCHEMY_ENGINE_OPTIONS.
+pool_size = min(threads, 20)
+os.environ.setdefault('DB_POOL_SIZE', str(pool_size))
+os.environ.setdefault('DB_MAX_OVERFLOW', str(max(2, threads - pool_size)))
+# Live list updates must reach event streams held open by other workers
+if workers > 1:
+    os.environ.setdefault('LIVE_UPDATES_BACKEND', 'sqlite')
+
+
+def post_fork(server, worker):
+    # With preload_app the master may already have opened pooled connections;
+    # a forked child must not share them. Drop them without closing the
+    # parent's sockets/files (close=False) and let the child open its own.
+    if not preload_app:
+        return
+    from wsgi import app
+    from app.extensions import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
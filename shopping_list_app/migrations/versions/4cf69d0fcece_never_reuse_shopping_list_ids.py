@@ -0,0 +1,51 @@
+"""Never reuse shopping list ids
+
+Revision ID: 4cf69d0fcece
+Revises: c3e8a5d2f619
+Create Date: 2026-10-18 19:01:07.666162
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4cf69d0fcece'
+down_revision = 'c3e8a5d2f619'
+branch_labels = None
+depends_on = None
+
+
+# SQLite only accepts AUTOINCREMENT in CREATE TABLE, so batch mode rebuilds
+# the table (copy, drop, rename); the copy carries the high-water mark into
+# sqlite_sequence, and the change log's tombstones (b7d1f0c4e825) raise it
+# past lists deleted before this migration. The rebuild drops the table's own triggers, and SQLite
+# refuses the rename while another table's trigger names it (see
+# f6a9d3b8e127), so every trigger comes off first and is put back exactly as
+# it was stored.
+
+
+def _rebuild_shopping_lists(autoincrement):
+    triggers = op.get_bind().execute(sa.text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name")).all()
+    for name, _ in triggers:
+        op.execute(f'DROP TRIGGER {name}')
+    with op.batch_alter_table('shopping_lists', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    for _, statement in triggers:
+        op.execute(statement)
+
+
+def upgrade():
+    _rebuild_shopping_lists(True)
+    high_water_mark = op.get_bind().scalar(sa.text(
+        "SELECT max(id) FROM (SELECT max(seq) AS id FROM sqlite_sequence WHERE name = 'shopping_lists' "
+        "UNION ALL SELECT max(row_id) FROM change_log WHERE kind = 'list')"))
+    if high_water_mark:
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'shopping_lists'")
+        op.execute(f"INSERT INTO sqlite_sequence (name, seq) VALUES ('shopping_lists', {int(high_water_mark)})")
+
+
+def downgrade():
+    _rebuild_shopping_lists(False)
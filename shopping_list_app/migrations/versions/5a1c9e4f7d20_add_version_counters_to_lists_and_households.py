@@ -0,0 +1,40 @@
+"""Add version counters to lists and households
+
+Revision ID: 5a1c9e4f7d20
+Revises: b7e3d1a9c2f4
+Create Date: 2026-10-18 11:03:27.540911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1c9e4f7d20'
+down_revision = 'b7e3d1a9c2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('households', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('shopping_lists', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing rows start out as "changed now"
+    op.execute("UPDATE households SET updated_at = CURRENT_TIMESTAMP")
+    op.execute("UPDATE shopping_lists SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    with op.batch_alter_table('shopping_lists', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('households', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
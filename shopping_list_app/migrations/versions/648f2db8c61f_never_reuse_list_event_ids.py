@@ -0,0 +1,35 @@
+"""Never reuse list event ids
+
+Revision ID: 648f2db8c61f
+Revises: 4cf69d0fcece
+Create Date: 2026-10-18 19:02:52.148769
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '648f2db8c61f'
+down_revision = '4cf69d0fcece'
+branch_labels = None
+depends_on = None
+
+
+# SQLite only accepts AUTOINCREMENT in CREATE TABLE, so batch mode rebuilds
+# the table; the copy carries the current high-water mark into
+# sqlite_sequence. No trigger names list_events.
+
+
+def _rebuild_list_events(autoincrement):
+    with op.batch_alter_table('list_events', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+
+
+def upgrade():
+    _rebuild_list_events(True)
+
+
+def downgrade():
+    _rebuild_list_events(False)
@@ -0,0 +1,45 @@
+"""Add household category order and a case-insensitive category index
+
+Revision ID: a8c4e2f6b913
+Revises: f6a9d3b8e127
+Create Date: 2026-10-18 21:17:52.904133
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c4e2f6b913'
+down_revision = 'f6a9d3b8e127'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('household_categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('household_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50, collation='nocase'), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['household_id'], ['households.id'], name='fk_household_categories_household_id_households', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('household_id', 'name', name='uq_household_categories_household_id_name')
+    )
+    with op.batch_alter_table('household_categories', schema=None) as batch_op:
+        batch_op.create_index('ix_household_categories_household_id_position', ['household_id', 'position'], unique=False)
+
+    with op.batch_alter_table('shopping_items', schema=None) as batch_op:
+        # Categories keep their spelling; the aisle view groups them COLLATE NOCASE
+        batch_op.create_index('ix_shopping_items_list_id_category_bought',
+                              ['shopping_list_id', sa.text('category COLLATE nocase'), 'bought'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('shopping_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_shopping_items_list_id_category_bought')
+
+    with op.batch_alter_table('household_categories', schema=None) as batch_op:
+        batch_op.drop_index('ix_household_categories_household_id_position')
+
+    op.drop_table('household_categories')
@@ -0,0 +1,83 @@
+"""Add change log for delta sync
+
+Revision ID: b7d1f0c4e825
+Revises: a8c4e2f6b913
+Create Date: 2026-10-18 22:05:41.316507
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d1f0c4e825'
+down_revision = 'a8c4e2f6b913'
+branch_labels = None
+depends_on = None
+
+# Triggers appending to change_log; keep in step with app/sync.py
+STATEMENTS = (
+    """CREATE TRIGGER change_log_lists_ai AFTER INSERT ON shopping_lists BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT new.household_id, coalesce(max(seq), 0) + 1, 'list', new.id, 'insert'
+        FROM change_log WHERE household_id = new.household_id;
+    END""",
+    """CREATE TRIGGER change_log_lists_au AFTER UPDATE OF name, date ON shopping_lists BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT new.household_id, coalesce(max(seq), 0) + 1, 'list', new.id, 'update'
+        FROM change_log WHERE household_id = new.household_id;
+    END""",
+    """CREATE TRIGGER change_log_lists_ad AFTER DELETE ON shopping_lists BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT h.id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = h.id), 'list', old.id, 'delete'
+        FROM households h WHERE h.id = old.household_id;
+    END""",
+    """CREATE TRIGGER change_log_items_ai AFTER INSERT ON shopping_items BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT l.household_id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = l.household_id),
+               'item', new.id, 'insert'
+        FROM shopping_lists l WHERE l.id = new.shopping_list_id;
+    END""",
+    """CREATE TRIGGER change_log_items_au
+       AFTER UPDATE OF name, category, amount, free_text, bought ON shopping_items BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT l.household_id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = l.household_id),
+               'item', new.id, 'update'
+        FROM shopping_lists l WHERE l.id = new.shopping_list_id;
+    END""",
+    """CREATE TRIGGER change_log_items_ad AFTER DELETE ON shopping_items BEGIN
+        INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT l.household_id, (SELECT coalesce(max(seq), 0) + 1 FROM change_log WHERE household_id = l.household_id),
+               'item', old.id, 'delete'
+        FROM shopping_lists l WHERE l.id = old.shopping_list_id;
+    END""",
+    # Existing rows, as if each had just been inserted: lists, then items, in id order
+    """INSERT INTO change_log (household_id, seq, kind, row_id, op)
+        SELECT household_id, row_number() OVER (PARTITION BY household_id ORDER BY kind = 'item', row_id), kind, row_id, 'insert'
+        FROM (SELECT household_id, 'list' AS kind, id AS row_id FROM shopping_lists
+              UNION ALL
+              SELECT l.household_id, 'item', i.id FROM shopping_items i JOIN shopping_lists l ON l.id = i.shopping_list_id)""",
+)
+
+
+def upgrade():
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('household_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.ForeignKeyConstraint(['household_id'], ['households.id'], name='fk_change_log_household_id_households', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('household_id', 'seq', name='uq_change_log_household_id_seq')
+    )
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for trigger in ('change_log_items_ad', 'change_log_items_au', 'change_log_items_ai',
+                    'change_log_lists_ad', 'change_log_lists_au', 'change_log_lists_ai'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.drop_table('change_log')
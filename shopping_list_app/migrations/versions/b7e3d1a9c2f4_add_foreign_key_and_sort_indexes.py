@@ -0,0 +1,38 @@
+"""Add foreign key and sort indexes
+
+Revision ID: b7e3d1a9c2f4
+Revises: 44d2d22bf819
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3d1a9c2f4'
+down_revision = '44d2d22bf819'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('shopping_items', schema=None) as batch_op:
+        batch_op.create_index('ix_shopping_items_list_id_bought_name', ['shopping_list_id', 'bought', 'name'], unique=False)
+
+    with op.batch_alter_table('shopping_lists', schema=None) as batch_op:
+        batch_op.create_index('ix_shopping_lists_household_id_date', ['household_id', 'date'], unique=False)
+
+    with op.batch_alter_table('user_households', schema=None) as batch_op:
+        batch_op.create_index('ix_user_households_household_id', ['household_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_households', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_households_household_id')
+
+    with op.batch_alter_table('shopping_lists', schema=None) as batch_op:
+        batch_op.drop_index('ix_shopping_lists_household_id_date')
+
+    with op.batch_alter_table('shopping_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_shopping_items_list_id_bought_name')
@@ -0,0 +1,27 @@
+"""Add shopping item version for optimistic concurrency
+
+Revision ID: c3e8a5d2f619
+Revises: b7d1f0c4e825
+Create Date: 2026-10-18 22:48:09.127644
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a5d2f619'
+down_revision = 'b7d1f0c4e825'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('shopping_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    # Not batch_alter_table: rebuilding the table would drop the search and change_log
+    # triggers on it. SQLite (3.35+) drops the column in place.
+    op.execute('ALTER TABLE shopping_items DROP COLUMN version')
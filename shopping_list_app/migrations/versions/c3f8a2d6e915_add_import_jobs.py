@@ -0,0 +1,36 @@
+"""Add import jobs
+
+Revision ID: c3f8a2d6e915
+Revises: 5a1c9e4f7d20
+Create Date: 2026-10-18 14:21:09.318402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a2d6e915'
+down_revision = '5a1c9e4f7d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('household_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=500), nullable=False),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('items_imported', sa.Integer(), nullable=False),
+    sa.Column('rows_rejected', sa.Integer(), nullable=False),
+    sa.Column('finished', sa.Boolean(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['household_id'], ['households.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('household_id', 'source', name='uq_import_jobs_household_id_source')
+    )
+
+
+def downgrade():
+    op.drop_table('import_jobs')
@@ -0,0 +1,38 @@
+"""Add list events outbox
+
+Revision ID: d41b7e0c9a53
+Revises: c3f8a2d6e915
+Create Date: 2026-10-18 16:02:44.107215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41b7e0c9a53'
+down_revision = 'c3f8a2d6e915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('list_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('list_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('list_events', schema=None) as batch_op:
+        batch_op.create_index('ix_list_events_list_id_id', ['list_id', 'id'], unique=False)
+        batch_op.create_index('ix_list_events_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('list_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_list_events_created_at')
+        batch_op.drop_index('ix_list_events_list_id_id')
+
+    op.drop_table('list_events')
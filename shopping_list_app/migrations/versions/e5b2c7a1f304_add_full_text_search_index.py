@@ -0,0 +1,63 @@
+"""Add full-text search index
+
+Revision ID: e5b2c7a1f304
+Revises: d41b7e0c9a53
+Create Date: 2026-10-18 18:40:12.551903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2c7a1f304'
+down_revision = 'd41b7e0c9a53'
+branch_labels = None
+depends_on = None
+
+# FTS5 table and sync triggers; keep in step with app/search.py
+STATEMENTS = (
+    "CREATE VIRTUAL TABLE search_index USING fts5("
+    "household, name, category, free_text, "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER search_lists_ai AFTER INSERT ON shopping_lists BEGIN
+        INSERT INTO search_index (rowid, household, name) VALUES (new.id * 2 + 1, 'h' || new.household_id, new.name);
+    END""",
+    """CREATE TRIGGER search_lists_au AFTER UPDATE OF name ON shopping_lists BEGIN
+        UPDATE search_index SET name = new.name WHERE rowid = new.id * 2 + 1;
+    END""",
+    """CREATE TRIGGER search_lists_ad AFTER DELETE ON shopping_lists BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END""",
+    """CREATE TRIGGER search_items_ai AFTER INSERT ON shopping_items BEGIN
+        INSERT INTO search_index (rowid, household, name, category, free_text)
+        SELECT new.id * 2, 'h' || household_id, new.name, new.category, new.free_text
+        FROM shopping_lists WHERE id = new.shopping_list_id;
+    END""",
+    """CREATE TRIGGER search_items_au AFTER UPDATE OF name, category, free_text ON shopping_items BEGIN
+        UPDATE search_index SET name = new.name, category = new.category, free_text = new.free_text
+        WHERE rowid = new.id * 2;
+    END""",
+    """CREATE TRIGGER search_items_ad AFTER DELETE ON shopping_items BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END""",
+    # Index what is already there (`flask search rebuild` does the same later on)
+    "INSERT INTO search_index (rowid, household, name) "
+    "SELECT id * 2 + 1, 'h' || household_id, name FROM shopping_lists",
+    "INSERT INTO search_index (rowid, household, name, category, free_text) "
+    "SELECT i.id * 2, 'h' || l.household_id, i.name, i.category, i.free_text "
+    "FROM shopping_items i JOIN shopping_lists l ON l.id = i.shopping_list_id",
+    "INSERT INTO search_index (search_index) VALUES ('optimize')",
+)
+
+
+def upgrade():
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for trigger in ('search_items_ad', 'search_items_au', 'search_items_ai',
+                    'search_lists_ad', 'search_lists_au', 'search_lists_ai'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS search_index')
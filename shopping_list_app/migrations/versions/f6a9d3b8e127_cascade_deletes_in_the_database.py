@@ -0,0 +1,81 @@
+"""Cascade deletes in the database
+
+Revision ID: f6a9d3b8e127
+Revises: e5b2c7a1f304
+Create Date: 2026-10-18 20:05:37.640219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a9d3b8e127'
+down_revision = 'e5b2c7a1f304'
+branch_labels = None
+depends_on = None
+
+# The original foreign keys were created without names; this convention lets
+# batch mode find them when it copies each table
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# (table, column, referred table)
+FOREIGN_KEYS = (
+    ('user_households', 'user_id', 'users'),
+    ('user_households', 'household_id', 'households'),
+    ('shopping_lists', 'household_id', 'households'),
+    ('shopping_items', 'shopping_list_id', 'shopping_lists'),
+    ('import_jobs', 'household_id', 'households'),
+)
+
+# Batch mode rebuilds each table (copy, drop, rename). SQLite drops a table's
+# triggers with it and refuses the rename while another table's trigger still
+# names it, so the search index triggers (e5b2c7a1f304) come off first and go
+# back on afterwards.
+SEARCH_TRIGGERS = (
+    """CREATE TRIGGER search_lists_ai AFTER INSERT ON shopping_lists BEGIN
+        INSERT INTO search_index (rowid, household, name) VALUES (new.id * 2 + 1, 'h' || new.household_id, new.name);
+    END""",
+    """CREATE TRIGGER search_lists_au AFTER UPDATE OF name ON shopping_lists BEGIN
+        UPDATE search_index SET name = new.name WHERE rowid = new.id * 2 + 1;
+    END""",
+    """CREATE TRIGGER search_lists_ad AFTER DELETE ON shopping_lists BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END""",
+    """CREATE TRIGGER search_items_ai AFTER INSERT ON shopping_items BEGIN
+        INSERT INTO search_index (rowid, household, name, category, free_text)
+        SELECT new.id * 2, 'h' || household_id, new.name, new.category, new.free_text
+        FROM shopping_lists WHERE id = new.shopping_list_id;
+    END""",
+    """CREATE TRIGGER search_items_au AFTER UPDATE OF name, category, free_text ON shopping_items BEGIN
+        UPDATE search_index SET name = new.name, category = new.category, free_text = new.free_text
+        WHERE rowid = new.id * 2;
+    END""",
+    """CREATE TRIGGER search_items_ad AFTER DELETE ON shopping_items BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END""",
+)
+
+
+def _recreate_foreign_keys(ondelete):
+    for trigger in ('search_items_ad', 'search_items_au', 'search_items_ai',
+                    'search_lists_ad', 'search_lists_au', 'search_lists_ai'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for table in dict.fromkeys(table for table, _, _ in FOREIGN_KEYS):
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            for fk_table, column, referred in FOREIGN_KEYS:
+                if fk_table != table:
+                    continue
+                name = f'fk_{table}_{column}_{referred}'
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+    for statement in SEARCH_TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade():
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _recreate_foreign_keys(None)
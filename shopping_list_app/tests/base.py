@@ -1,21 +1,23 @@
 import unittest
-from shopping_list_app.wsgi import app # Adjusted import assuming tests run from /app or PYTHONPATH includes /app
-from shopping_list_app.app.extensions import db
+from contextlib import contextmanager
+from shopping_list_app.app import create_app
+from shopping_list_app.app.extensions import db, fragment_cache, autocomplete
 from shopping_list_app.app.models import User, Household, ShoppingList, ShoppingItem # Import all models
+from shopping_list_app.app.instrumentation import capture_queries
+
+# One app for the suite, built from the 'test' profile (app/config.py): in-memory
+# SQLite, no CSRF, cheap password hashes. Settings a test changes are put back
+# in tearDown, so every test starts from the profile.
+app = create_app('test')
 
 class BaseTestCase(unittest.TestCase):
     def setUp(self):
-        # Configure the app for testing
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:' # Use in-memory SQLite for tests
-        app.config['WTF_CSRF_ENABLED'] = False # Disable CSRF forms for testing
-        app.config['SECRET_KEY'] = 'test_secret_key' # Needs a secret key for sessions, flash messages
-        # app.config['LOGIN_DISABLED'] = True # Optional: Disable login for tests not focusing on auth.
-                                          # For now, keep it False to test auth flows.
-
+        self.config = dict(app.config)
         self.app_context = app.app_context()
         self.app_context.push() # Push an application context
         db.create_all() # Create all tables
+        fragment_cache.clear() # Ids restart with every in-memory database
+        autocomplete.clear()
 
         self.client = app.test_client() # Flask test client
 
@@ -23,6 +25,8 @@ class BaseTestCase(unittest.TestCase):
         db.session.remove()
         db.drop_all() # Drop all tables
         self.app_context.pop() # Pop the application context
+        app.config.clear()
+        app.config.update(self.config)
 
     # Helper method to create a user
     def create_user(self, username="testuser", email="test@example.com", password="password"):
@@ -32,6 +36,14 @@ class BaseTestCase(unittest.TestCase):
         db.session.commit()
         return user
 
+    # Helper method to create a household with the user as its member
+    def create_household(self, user, name="Test House"):
+        household = Household(name=name)
+        household.users.append(user)
+        db.session.add(household)
+        db.session.commit()
+        return household
+
     # Helper method to register a user via form
     def register_user(self, username, email, password, confirm_password):
         return self.client.post('/register', data=dict(
@@ -51,3 +63,11 @@ class BaseTestCase(unittest.TestCase):
     # Helper method to logout a user
     def logout_user(self):
         return self.client.get('/logout', follow_redirects=True)
+
+    # Fail if the block runs more than n SQL statements (transaction control excluded)
+    @contextmanager
+    def assert_max_queries(self, n):
+        with capture_queries() as statements:
+            yield statements
+        if len(statements) > n:
+            self.fail(f'{len(statements)} queries, expected at most {n}:\n' + '\n'.join(statements))
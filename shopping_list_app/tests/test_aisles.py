@@ -0,0 +1,136 @@
+from datetime import datetime
+from .base import BaseTestCase
+from shopping_list_app.app.models import Household, ShoppingList, ShoppingItem, HouseholdCategory
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.aisles import normalize_category, grouped_items, set_category_order
+from shopping_list_app.app.instrumentation import capture_queries
+
+class TestAisleView(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="walker", email="walk@example.com", password="password")
+        self.login_user("walk@example.com", "password")
+        household = self.create_household(self.user, "Aisle House")
+        self.household_id = household.id
+        slist = ShoppingList(name="Saturday", date=datetime(2024, 6, 1), household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        self.list_id = slist.id
+        db.session.add_all([
+            ShoppingItem(name="Milk", category="Dairy", shopping_list_id=slist.id),
+            ShoppingItem(name="Cheese", category="Dairy", bought=True, shopping_list_id=slist.id),
+            ShoppingItem(name="Apples", category="Produce", shopping_list_id=slist.id),
+            ShoppingItem(name="Bread", category="Bakery", shopping_list_id=slist.id),
+            ShoppingItem(name="Batteries", shopping_list_id=slist.id),
+        ])
+        db.session.commit()
+
+    def groups(self):
+        groups, to_buy = grouped_items(db.session.get(ShoppingList, self.list_id))
+        return [(g.category, g.count, g.to_buy, [i.name for i in g.items]) for g in groups], to_buy
+
+    def test_normalize_category(self):
+        self.assertEqual(normalize_category('  BBQ   sauce '), 'BBQ sauce') # Spelling is kept
+        self.assertEqual(normalize_category('DAIRY'), 'DAIRY')
+        self.assertIsNone(normalize_category('   '))
+        self.assertIsNone(normalize_category(None))
+
+    def test_spellings_of_a_category_share_a_group(self):
+        self.client.post(f'/shopping_list/{self.list_id}/add_item', data={'name': 'Yogurt', 'category': ' dairy '})
+        self.client.post(f'/api/v1/lists/{self.list_id}/items', json={'items': [{'name': 'Butter', 'category': 'DAIRY'}]})
+        item_id = ShoppingItem.query.filter_by(name='Batteries').one().id
+        self.client.patch(f'/api/v1/items/{item_id}', json={'category': '  '})
+        categories = {i.name: i.category for i in ShoppingItem.query.filter_by(shopping_list_id=self.list_id)}
+        self.assertEqual((categories['Yogurt'], categories['Butter'], categories['Batteries']), ('dairy', 'DAIRY', None))
+        groups, _ = self.groups()
+        self.assertEqual([(g[0], g[1]) for g in groups], [('Bakery', 1), ('DAIRY', 4), ('Produce', 1), (None, 1)])
+        set_category_order(self.household_id, ['Dairy'])
+        groups, _ = self.groups()
+        self.assertEqual([(g[0], g[1]) for g in groups][0], ('Dairy', 4)) # Named as the household orders it
+
+    def test_groups_without_an_order_are_alphabetical_with_uncategorized_last(self):
+        groups, to_buy = self.groups()
+        self.assertEqual(groups, [
+            ('Bakery', 1, 1, ['Bread']),
+            ('Dairy', 2, 1, ['Milk', 'Cheese']), # Unbought first
+            ('Produce', 1, 1, ['Apples']),
+            (None, 1, 1, ['Batteries']),
+        ])
+        self.assertEqual(to_buy, 4)
+
+    def test_household_order_comes_first(self):
+        set_category_order(self.household_id, ['produce', 'Frozen', 'Dairy', 'PRODUCE'])
+        db.session.commit()
+        self.assertEqual([c.name for c in HouseholdCategory.query.order_by(HouseholdCategory.position)],
+                         ['produce', 'Frozen', 'Dairy'])
+        groups, _ = self.groups()
+        self.assertEqual([g[0] for g in groups], ['produce', 'Dairy', 'Bakery', None])
+
+    def test_grouping_is_a_fixed_number_of_queries(self):
+        def statements():
+            with capture_queries() as captured:
+                self.groups()
+            return len(captured)
+
+        few = statements()
+        db.session.add_all([ShoppingItem(name=f'Item {n}', category=f'Aisle {n % 7}', shopping_list_id=self.list_id)
+                            for n in range(100)])
+        db.session.commit()
+        self.assertEqual(statements(), few)
+        groups, to_buy = self.groups()
+        self.assertEqual(sum(g[1] for g in groups), 105)
+        self.assertEqual(to_buy, 104)
+
+    def test_empty_list(self):
+        empty = ShoppingList(name="Empty", household_id=self.household_id)
+        db.session.add(empty)
+        db.session.commit()
+        self.assertEqual(grouped_items(empty), ([], 0))
+        response = self.client.get(f'/shopping_list/{empty.id}/aisles')
+        self.assertIn(b'no items yet', response.data)
+
+    def test_aisle_page_and_order_form(self):
+        response = self.client.get(f'/household/{self.household_id}/aisles')
+        self.assertIn(b'Bakery\nDairy\nProduce', response.data)
+        response = self.client.post(f'/household/{self.household_id}/aisles',
+                                    data={'categories': 'Produce\r\n\r\nbakery\r\n'}, follow_redirects=True)
+        self.assertIn(b'Aisle order saved.', response.data)
+        response = self.client.get(f'/shopping_list/{self.list_id}/aisles')
+        self.assertEqual(response.status_code, 200)
+        page = response.data.decode()
+        self.assertLess(page.index('Produce'), page.index('Bakery'))
+        self.assertLess(page.index('Bakery'), page.index('Dairy'))
+        self.assertLess(page.index('Dairy'), page.index('Uncategorized'))
+        self.assertIn('<strong id="to-buy">4</strong>', page)
+
+    def test_api(self):
+        response = self.client.put(f'/api/v1/households/{self.household_id}/aisles',
+                                   json={'categories': ['dairy', 'Bakery']})
+        self.assertEqual(response.get_json(), {'categories': ['dairy', 'Bakery']})
+        self.assertEqual(self.client.get(f'/api/v1/households/{self.household_id}/aisles').get_json(),
+                         {'categories': ['dairy', 'Bakery'], 'unordered': ['Produce']})
+        data = self.client.get(f'/api/v1/lists/{self.list_id}/aisles').get_json()
+        self.assertEqual(data['to_buy'], 4)
+        self.assertEqual([(g['category'], g['position'], g['count']) for g in data['data']],
+                         [('dairy', 0, 2), ('Bakery', 1, 1), ('Produce', None, 1), (None, None, 1)])
+        self.assertEqual(self.client.put(f'/api/v1/households/{self.household_id}/aisles',
+                                         json={'categories': 'Dairy'}).status_code, 400)
+
+    def test_non_members_are_refused(self):
+        self.logout_user()
+        self.create_user(username="stranger", email="stranger@example.com", password="password")
+        self.login_user("stranger@example.com", "password")
+        self.assertEqual(self.client.get(f'/shopping_list/{self.list_id}/aisles').status_code, 403)
+        self.assertEqual(self.client.post(f'/household/{self.household_id}/aisles',
+                                          data={'categories': 'Dairy'}).status_code, 403)
+        self.assertEqual(self.client.get(f'/api/v1/lists/{self.list_id}/aisles').status_code, 403)
+        self.assertEqual(self.client.put(f'/api/v1/households/{self.household_id}/aisles',
+                                         json={'categories': []}).status_code, 403)
+
+    def test_household_delete_removes_its_order(self):
+        set_category_order(self.household_id, ['Dairy'])
+        db.session.commit()
+        db.session.delete(db.session.get(Household, self.household_id))
+        db.session.commit()
+        self.assertEqual(HouseholdCategory.query.count(), 0)
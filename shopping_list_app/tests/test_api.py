@@ -0,0 +1,104 @@
+from sqlalchemy import event
+from .base import BaseTestCase
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+
+class TestApi(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="apiuser", email="api@example.com", password="password")
+        self.login_user(email="api@example.com", password="password")
+        household = self.create_household(self.user, "Api House")
+        self.household_id = household.id
+        slist = ShoppingList(name="Api List", household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        self.list_id = slist.id
+
+    def add_items(self, *names):
+        response = self.client.post(f'/api/v1/lists/{self.list_id}/items',
+                                    json={'items': [{'name': n, 'category': 'Test'} for n in names]})
+        self.assertEqual(response.status_code, 201)
+        return [item['id'] for item in response.get_json()['data']]
+
+    def test_unauthenticated_request_gets_json_401(self):
+        self.logout_user()
+        response = self.client.get('/api/v1/households')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.get_json()['error'], 'Unauthorized')
+
+    def test_households_and_lists(self):
+        self.assertEqual(self.client.get('/api/v1/households').get_json()['data'],
+                         [{'id': self.household_id, 'name': 'Api House'}])
+        created = self.client.post(f'/api/v1/households/{self.household_id}/lists',
+                                   json={'name': 'Weekly', 'date': '2024-03-01'})
+        self.assertEqual(created.status_code, 201)
+        lists = self.client.get(f'/api/v1/households/{self.household_id}/lists').get_json()['data']
+        self.assertIn('Weekly', [l['name'] for l in lists])
+
+    def test_batch_add_is_one_insert_and_one_commit(self):
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT'):
+                statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            ids = self.add_items(*[f'Item {n}' for n in range(40)])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(len(ids), 40)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(ShoppingItem.query.filter_by(shopping_list_id=self.list_id).count(), 40)
+
+    def test_batch_add_validates_every_item(self):
+        response = self.client.post(f'/api/v1/lists/{self.list_id}/items',
+                                    json={'items': [{'name': 'Good'}, {'name': ''}, {'name': 'x' * 101}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.get_json()['errors']), {'1', '2'})
+        self.assertEqual(ShoppingItem.query.count(), 0)
+
+    def test_batch_toggle_and_delete(self):
+        ids = self.add_items('Milk', 'Bread', 'Eggs')
+        toggled = self.client.post('/api/v1/items/toggle', json={'ids': ids[:2]}).get_json()['data']
+        self.assertEqual({t['id']: t['bought'] for t in toggled}, {ids[0]: True, ids[1]: True})
+        self.client.post('/api/v1/items/toggle', json={'ids': ids, 'bought': False})
+        self.assertEqual(ShoppingItem.query.filter_by(bought=True).count(), 0)
+
+        response = self.client.post('/api/v1/items/delete', json={'ids': ids[1:]})
+        self.assertEqual(response.get_json()['deleted'], sorted(ids[1:]))
+        self.assertEqual([i.id for i in ShoppingItem.query.all()], ids[:1])
+
+    def test_batch_is_all_or_nothing_across_households(self):
+        ids = self.add_items('Mine')
+        other = self.create_user(username="apiother", email="apiother@example.com", password="password")
+        other_house = self.create_household(other, "Not Mine")
+        other_list = ShoppingList(name="Theirs", household_id=other_house.id)
+        db.session.add(other_list)
+        db.session.commit()
+        theirs = ShoppingItem(name="Theirs", shopping_list_id=other_list.id)
+        db.session.add(theirs)
+        db.session.commit()
+
+        response = self.client.post('/api/v1/items/toggle', json={'ids': ids + [theirs.id]})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(db.session.get(ShoppingItem, ids[0]).bought)
+        response = self.client.post('/api/v1/items/delete', json={'ids': ids + [theirs.id]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(ShoppingItem.query.count(), 2)
+        self.assertEqual(self.client.get(f'/api/v1/lists/{other_list.id}/items').status_code, 403)
+
+    def test_edit_item(self):
+        item_id = self.add_items('Flour')[0]
+        response = self.client.patch(f'/api/v1/items/{item_id}', json={'amount': '2 kg', 'bought': True})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual((body['name'], body['amount'], body['bought']), ('Flour', '2 kg', True))
+
+    def test_edit_item_rejects_non_boolean_bought(self):
+        item_id = self.add_items('Flour')[0]
+        for bought in ('false', 1, None):
+            response = self.client.patch(f'/api/v1/items/{item_id}', json={'bought': bought})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('bought', response.get_json()['errors'])
+        self.assertFalse(db.session.get(ShoppingItem, item_id).bought)
@@ -0,0 +1,116 @@
+from datetime import datetime
+from .base import BaseTestCase
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db, autocomplete
+from shopping_list_app.app.autocomplete import PrefixIndex
+from shopping_list_app.app.instrumentation import capture_queries
+
+class TestPrefixIndex(BaseTestCase):
+
+    def test_ranked_by_use_then_alphabetically(self):
+        index = PrefixIndex()
+        for value, uses in [('Milk', 5), ('Mint', 1), ('Mince', 1), ('Bread', 9)]:
+            index.add(value, uses)
+        self.assertEqual(index.lookup('mi'), ['Milk', 'Mince', 'Mint'])
+        self.assertEqual(index.lookup('mi', limit=1), ['Milk'])
+        self.assertEqual(index.lookup('x'), [])
+        self.assertEqual(index.lookup('  '), [])
+
+    def test_case_and_spacing_variants_share_one_entry(self):
+        index = PrefixIndex()
+        index.add('Olive oil', 1)
+        index.add('olive  oil', 3)
+        index.add('OLIVE OIL', 1)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.lookup('OLI'), ['olive oil']) # Most common spelling wins
+
+    def test_remove(self):
+        index = PrefixIndex()
+        index.add('Milk', 2)
+        index.remove('Milk')
+        self.assertEqual(index.lookup('m'), ['Milk'])
+        index.remove('Milk')
+        self.assertEqual(index.lookup('m'), [])
+        self.assertEqual(index.keys, [])
+
+
+class TestSuggestionsEndpoint(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="cook", email="cook@example.com", password="password")
+        self.login_user("cook@example.com", "password")
+        household = self.create_household(self.user, "Kitchen")
+        self.household_id = household.id
+        weeks = [ShoppingList(name=f"Week {n}", date=datetime(2024, 1, n), household_id=household.id)
+                 for n in range(1, 4)]
+        db.session.add_all(weeks)
+        db.session.commit()
+        self.list_id = weeks[0].id
+        for week in weeks:
+            db.session.add_all([ShoppingItem(name="Milk", category="Dairy", shopping_list_id=week.id),
+                                ShoppingItem(name="Bread", category="bakery", shopping_list_id=week.id)])
+        db.session.add(ShoppingItem(name="Mint", category="dairy", shopping_list_id=weeks[0].id))
+        db.session.commit()
+
+    def suggest(self, q, field='name'):
+        response = self.client.get(f'/api/v1/households/{self.household_id}/suggestions?field={field}&q={q}')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['data']
+
+    def test_names_and_categories(self):
+        self.assertEqual(self.suggest('mi'), ['Milk', 'Mint'])
+        self.assertEqual(self.suggest('d', field='category'), ['Dairy'])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_index_is_built_once_and_never_uses_like(self):
+        with capture_queries() as statements:
+            self.suggest('m')
+        self.assertEqual(sum('GROUP BY' in s for s in statements), 1)
+        with capture_queries() as statements:
+            self.suggest('mi')
+            self.suggest('b')
+        self.assertFalse([s for s in statements if 'shopping_items' in s]) # Served from memory
+        self.assertFalse([s for s in statements if 'LIKE' in s])
+
+    def test_added_items_update_the_index(self):
+        self.suggest('m') # Build it
+        self.client.post(f'/shopping_list/{self.list_id}/add_item', data={'name': 'Mustard', 'category': 'Sauces'})
+        with capture_queries() as statements:
+            self.assertEqual(self.suggest('mu'), ['Mustard'])
+            self.assertEqual(self.suggest('s', field='category'), ['Sauces'])
+        self.assertFalse([s for s in statements if 'GROUP BY' in s])
+
+    def test_edits_move_the_count(self):
+        self.suggest('m')
+        mint = ShoppingItem.query.filter_by(name='Mint').one()
+        self.client.patch(f'/api/v1/items/{mint.id}', json={'name': 'Mango'})
+        self.assertEqual(self.suggest('m'), ['Milk', 'Mango'])
+
+    def test_uncommitted_items_are_not_suggested(self):
+        self.suggest('m')
+        autocomplete.record(self.household_id, [('Marmalade', None)])
+        db.session.rollback()
+        self.assertEqual(self.suggest('mar'), [])
+
+    def test_least_recently_used_household_is_evicted(self):
+        other = self.create_household(self.user, "Other")
+        max_households = autocomplete.max_households
+        autocomplete.max_households = 1
+        try:
+            self.suggest('m')
+            self.client.get(f'/api/v1/households/{other.id}/suggestions?q=m')
+            self.assertEqual(list(autocomplete._indexes), [other.id])
+        finally:
+            autocomplete.max_households = max_households
+
+    def test_bad_field(self):
+        response = self.client.get(f'/api/v1/households/{self.household_id}/suggestions?field=amount&q=1')
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_members_are_refused(self):
+        self.logout_user()
+        self.create_user(username="stranger", email="stranger@example.com", password="password")
+        self.login_user("stranger@example.com", "password")
+        response = self.client.get(f'/api/v1/households/{self.household_id}/suggestions?q=m')
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,55 @@
+from .base import BaseTestCase
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.models import User, ShoppingList, ShoppingItem, user_households
+from shopping_list_app.benchmarks.dataset import Sizes, generate
+from shopping_list_app.benchmarks.baseline import compare, percentile
+
+TINY = Sizes(users=12, households=4, members=(2, 3), years=1, items=(3, 6))
+
+
+def result(p95, queries, errors=0):
+    return {'p95_ms': p95, 'queries_max': queries, 'errors': errors}
+
+
+class TestBenchmarkDataset(BaseTestCase):
+
+    def snapshot(self):
+        return (db.session.query(user_households).order_by('user_id', 'household_id').all(),
+                [(l.name, l.date, l.household_id) for l in ShoppingList.query.order_by(ShoppingList.id)],
+                [(i.name, i.amount, i.bought, i.shopping_list_id) for i in ShoppingItem.query.order_by(ShoppingItem.id)])
+
+    def test_same_seed_same_rows(self):
+        summary = generate(TINY, seed=7)
+        first = self.snapshot()
+        db.drop_all()
+        db.create_all()
+        self.assertEqual(generate(TINY, seed=7), summary)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_summary_points_at_member_data(self):
+        summary = generate(TINY, seed=3)
+        self.assertEqual(summary['rows']['lists'], 4 * 52)
+        self.assertEqual(User.query.count(), 12)
+        user = User.query.filter_by(email=summary['member_email']).one()
+        self.assertIn(summary['household_id'], [h.id for h in user.households])
+        item = db.session.get(ShoppingItem, summary['item_id'])
+        self.assertEqual(item.shopping_list_id, summary['list_id'])
+        self.assertEqual(item.shopping_list.household_id, summary['household_id'])
+
+
+class TestBaselineComparison(BaseTestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
+
+    def test_flags_regressions(self):
+        baseline = {'routes': {'fast': result(2.0, 3), 'queries': result(2.0, 3), 'noise': result(0.2, 1)}}
+        current = {'routes': {'fast': result(4.0, 3), 'queries': result(2.1, 4), 'noise': result(0.5, 1),
+                              'added': result(1.0, 1)}}
+        rows, regressions = compare(current, baseline, tolerance=0.25)
+        self.assertEqual(regressions, ['fast', 'queries'])
+        self.assertEqual({row[0]: row[-1] for row in rows},
+                         {'fast': 'slower', 'queries': 'more queries', 'noise': 'ok', 'added': 'new'})
@@ -0,0 +1,59 @@
+from datetime import datetime
+from sqlalchemy import insert, select, func
+from .base import BaseTestCase
+from shopping_list_app.app.models import User, Household, ShoppingList, ShoppingItem, ImportJob, user_households
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.instrumentation import capture_queries
+
+class TestCascadeDeletes(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="deleter", email="delete@example.com", password="password")
+        self.login_user("delete@example.com", "password")
+        household = self.create_household(self.user, "Cascade House")
+        self.household_id = household.id
+
+    def make_list(self, name, items):
+        shopping_list = ShoppingList(name=name, date=datetime(2024, 1, 1), household_id=self.household_id)
+        db.session.add(shopping_list)
+        db.session.commit()
+        if items:
+            db.session.execute(insert(ShoppingItem), [{'name': f'Item {n}', 'shopping_list_id': shopping_list.id}
+                                                       for n in range(items)])
+            db.session.commit()
+        return shopping_list.id
+
+    def delete_list(self, list_id):
+        with capture_queries() as statements:
+            response = self.client.post(f'/shopping_list/{list_id}/delete')
+        self.assertEqual(response.status_code, 302)
+        # The membership check is cached on g, which the test client shares between requests
+        return [s for s in statements if 'user_households' not in s]
+
+    def count(self, model):
+        return db.session.scalar(select(func.count()).select_from(model))
+
+    def test_list_delete_is_one_statement_whatever_its_size(self):
+        small = self.delete_list(self.make_list('Small', 1))
+        large = self.delete_list(self.make_list('Large', 1000))
+        self.assertEqual(len(large), len(small))
+        deletes = [s for s in large if s.startswith('DELETE')]
+        self.assertEqual(deletes, ['DELETE FROM shopping_lists WHERE shopping_lists.id = ?'])
+        self.assertFalse([s for s in large if 'FROM shopping_items' in s]) # Items never loaded
+        self.assertEqual(self.count(ShoppingItem), 0)
+
+    def test_household_delete_cascades_to_everything_it_owns(self):
+        for n in range(3):
+            self.make_list(f'List {n}', 50)
+        db.session.add(ImportJob(household_id=self.household_id, source='history.csv'))
+        db.session.commit()
+        household = db.session.get(Household, self.household_id)
+        with capture_queries() as statements:
+            db.session.delete(household)
+            db.session.commit()
+        self.assertEqual([s for s in statements if s.startswith('DELETE')],
+                         ['DELETE FROM households WHERE households.id = ?'])
+        for model in (ShoppingList, ShoppingItem, ImportJob, user_households):
+            self.assertEqual(self.count(model), 0)
+        self.assertIsNotNone(db.session.get(User, self.user.id)) # Members stay, only the membership goes
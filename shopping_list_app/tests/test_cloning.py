@@ -0,0 +1,92 @@
+from datetime import datetime
+from sqlalchemy import insert
+from .base import BaseTestCase
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.instrumentation import capture_queries
+
+class TestListCloning(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="cloner", email="clone@example.com", password="password")
+        self.login_user("clone@example.com", "password")
+        household = self.create_household(self.user, "Clone House")
+        self.household_id = household.id
+        source = ShoppingList(name="Weekly staples", date=datetime(2024, 6, 2), household_id=household.id)
+        db.session.add(source)
+        db.session.commit()
+        self.source_id = source.id
+        db.session.add_all([
+            ShoppingItem(name="Milk", category="Dairy", amount="2", free_text="semi-skimmed",
+                         bought=True, shopping_list_id=source.id),
+            ShoppingItem(name="Bread", shopping_list_id=source.id),
+            ShoppingItem(name="Eggs", amount="12", shopping_list_id=source.id),
+        ])
+        db.session.commit()
+
+    def items_of(self, list_id):
+        return [(i.name, i.category, i.amount, i.free_text, i.bought)
+                for i in ShoppingItem.query.filter_by(shopping_list_id=list_id).order_by(ShoppingItem.name)]
+
+    def test_clone_form_copies_every_item(self):
+        response = self.client.get(f'/shopping_list/{self.source_id}/clone')
+        self.assertIn(b'value="Weekly staples"', response.data)
+        response = self.client.post(f'/shopping_list/{self.source_id}/clone',
+                                    data={'name': 'Next week', 'date': '2024-06-09'}, follow_redirects=True)
+        self.assertIn(b'created with 3 items', response.data)
+        clone = ShoppingList.query.filter_by(name='Next week').one()
+        self.assertEqual(clone.household_id, self.household_id)
+        self.assertEqual(self.items_of(clone.id), self.items_of(self.source_id))
+
+    def test_only_unbought_and_reset_bought(self):
+        self.client.post(f'/shopping_list/{self.source_id}/clone',
+                         data={'name': 'Leftovers', 'date': '2024-06-09', 'only_unbought': 'y'})
+        leftovers = ShoppingList.query.filter_by(name='Leftovers').one()
+        self.assertEqual([i[0] for i in self.items_of(leftovers.id)], ['Bread', 'Eggs'])
+        self.client.post(f'/shopping_list/{self.source_id}/clone',
+                         data={'name': 'Fresh', 'date': '2024-06-09', 'reset_bought': 'y'})
+        fresh = ShoppingList.query.filter_by(name='Fresh').one()
+        self.assertEqual([i[4] for i in self.items_of(fresh.id)], [False, False, False])
+        self.assertTrue(ShoppingItem.query.filter_by(shopping_list_id=self.source_id, name='Milk').one().bought)
+
+    def test_items_are_copied_by_one_statement_whatever_the_size(self):
+        def clone_statements(name):
+            with capture_queries() as statements:
+                response = self.client.post(f'/api/v1/lists/{self.source_id}/clone',
+                                            json={'name': name, 'date': '2024-06-09'})
+            self.assertEqual(response.status_code, 201)
+            # The membership check is cached on g, which the test client shares between requests
+            return [s for s in statements if 'user_households' not in s]
+
+        small = clone_statements('Small')
+        db.session.execute(insert(ShoppingItem), [{'name': f'Item {n}', 'shopping_list_id': self.source_id}
+                                                   for n in range(500)])
+        db.session.commit()
+        large = clone_statements('Large')
+        self.assertEqual(len(small), len(large))
+        copies = [s for s in large if s.startswith('INSERT INTO shopping_items')]
+        self.assertEqual(len(copies), 1)
+        self.assertIn('SELECT', copies[0])
+        large_id = ShoppingList.query.filter_by(name='Large').one().id
+        self.assertEqual(ShoppingItem.query.filter_by(shopping_list_id=large_id).count(), 503)
+
+    def test_api_clone(self):
+        response = self.client.post(f'/api/v1/lists/{self.source_id}/clone',
+                                    json={'date': '2024-06-09', 'only_unbought': True, 'reset_bought': True})
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        self.assertEqual((data['name'], data['items_copied']), ('Weekly staples', 2)) # Name defaults to the source's
+        self.assertGreater(db.session.get(ShoppingList, data['id']).version, 1) # Touched like any changed list
+        response = self.client.post(f'/api/v1/lists/{self.source_id}/clone', json={'date': '2024-06-09', 'reset_bought': 'yes'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'/api/v1/lists/{self.source_id}/clone', json={'name': 'No date'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_members_cannot_clone(self):
+        self.logout_user()
+        self.create_user(username="stranger", email="stranger@example.com", password="password")
+        self.login_user("stranger@example.com", "password")
+        response = self.client.post(f'/api/v1/lists/{self.source_id}/clone', json={'name': 'Mine', 'date': '2024-06-09'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(ShoppingList.query.count(), 1)
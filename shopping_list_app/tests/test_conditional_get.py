@@ -0,0 +1,82 @@
+from sqlalchemy import event
+from .base import BaseTestCase
+from shopping_list_app.app.models import Household, ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+
+class TestConditionalGet(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="etagger", email="etag@example.com", password="password")
+        self.login_user(email="etag@example.com", password="password")
+        household = self.create_household(self.user, "ETag House")
+        self.household_id = household.id
+        slist = ShoppingList(name="ETag List", household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        self.list_id = slist.id
+        item = ShoppingItem(name="Butter", shopping_list_id=slist.id)
+        db.session.add(item)
+        db.session.commit()
+        self.item_id = item.id
+        self.client.get('/index') # Consume the login flash message
+
+    def get(self, url, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(url, headers=headers)
+
+    def test_list_view_revalidates_with_304(self):
+        url = f'/shopping_list/{self.list_id}/items'
+        first = self.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNotNone(first.headers.get('ETag'))
+        self.assertIsNotNone(first.headers.get('Last-Modified'))
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            second = self.get(url, first.headers['ETag'])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertFalse([s for s in statements if 'FROM shopping_items' in s])
+
+    def test_item_mutations_change_the_list_etag(self):
+        url = f'/shopping_list/{self.list_id}/items'
+        etag = self.get(url).headers['ETag']
+        self.client.post(f'/item/{self.item_id}/toggle_bought', headers={'Accept': 'application/json'})
+        after_toggle = self.get(url, etag)
+        self.assertEqual(after_toggle.status_code, 200)
+        self.assertNotEqual(after_toggle.headers['ETag'], etag)
+
+        etag = after_toggle.headers['ETag']
+        self.client.post(f'/shopping_list/{self.list_id}/add_item', data=dict(name="Jam"))
+        self.client.get(url) # Shows and consumes the flash message
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+    def test_household_view_changes_when_lists_change(self):
+        url = f'/household/{self.household_id}/lists'
+        etag = self.get(url).headers['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        # Item changes do not touch the household's list page
+        self.client.post(f'/item/{self.item_id}/toggle_bought', headers={'Accept': 'application/json'})
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+        self.client.post(f'/household/{self.household_id}/new_list', data=dict(name="Newer", date="2024-05-01"))
+        self.client.get('/index')
+        self.assertEqual(self.get(url, etag).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        url = f'/shopping_list/{self.list_id}/items'
+        etag = self.get(url).headers['ETag']
+        other = self.create_user(username="etagger2", email="etag2@example.com", password="password")
+        household = db.session.get(Household, self.household_id)
+        household.users.append(other)
+        db.session.commit()
+        self.logout_user()
+        self.login_user(email="etag2@example.com", password="password")
+        self.client.get('/index')
+        self.assertEqual(self.get(url, etag).status_code, 200)
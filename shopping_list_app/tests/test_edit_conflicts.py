@@ -0,0 +1,96 @@
+import re
+from datetime import datetime
+from .base import BaseTestCase
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.instrumentation import capture_queries
+
+class TestEditConflicts(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="editor", email="edit@example.com", password="password")
+        self.login_user("edit@example.com", "password")
+        household = self.create_household(self.user, "Edit House")
+        self.household_id = household.id
+        slist = ShoppingList(name="Groceries", date=datetime(2024, 6, 1), household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        item = ShoppingItem(name="Milk", amount="1", shopping_list_id=slist.id)
+        db.session.add(item)
+        db.session.commit()
+        self.item_id = item.id
+
+    def item(self):
+        db.session.expire_all()
+        return db.session.get(ShoppingItem, self.item_id)
+
+    def form_version(self):
+        page = self.client.get(f'/item/{self.item_id}/edit').data.decode()
+        return int(re.search(r'name="version" type="hidden" value="(\d+)"', page).group(1))
+
+    def test_every_write_moves_the_version(self):
+        self.assertEqual(self.item().version, 1)
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        self.client.post('/api/v1/items/toggle', json={'ids': [self.item_id]})
+        self.client.patch(f'/api/v1/items/{self.item_id}', json={'amount': '2'})
+        self.client.post(f'/item/{self.item_id}/edit', data={'name': 'Milk', 'amount': '3'})
+        self.assertEqual(self.item().version, 5)
+
+    def test_edit_is_one_conditional_update(self):
+        with capture_queries() as statements:
+            self.client.post(f'/item/{self.item_id}/edit', data={'name': 'Oat milk', 'version': '1'})
+        updates = [s for s in statements if s.startswith('UPDATE shopping_items')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('WHERE shopping_items.id = ? AND shopping_items.version = ?', updates[0])
+        self.assertEqual((self.item().name, self.item().version), ('Oat milk', 2))
+
+    def test_html_edit_after_someone_else_saved(self):
+        version = self.form_version() # This user opens the form...
+        self.client.patch(f'/api/v1/items/{self.item_id}', json={'amount': '6'}) # ...another saves first
+        response = self.client.post(f'/item/{self.item_id}/edit',
+                                    data={'name': 'Milk', 'amount': '2', 'version': str(version)})
+        self.assertEqual(response.status_code, 409)
+        page = response.data.decode()
+        self.assertIn('Someone else saved this item', page)
+        self.assertIn('(Amount: 6)', page)
+        self.assertIn('value="2"', page) # What this user typed is kept
+        self.assertEqual(self.item().amount, '6')
+        # Saving again from the conflict page is based on the current version and goes through
+        current = int(re.search(r'name="version" type="hidden" value="(\d+)"', page).group(1))
+        self.assertEqual(current, 2)
+        response = self.client.post(f'/item/{self.item_id}/edit', data={'name': 'Milk', 'amount': '2', 'version': current})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual((self.item().amount, self.item().version), ('2', 3))
+
+    def test_api_conflict_returns_the_current_state(self):
+        read = self.client.get(f'/api/v1/items/{self.item_id}').get_json()
+        self.assertEqual(read['version'], 1)
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        response = self.client.patch(f'/api/v1/items/{self.item_id}', json={'amount': '2', 'version': read['version']})
+        self.assertEqual(response.status_code, 409)
+        data = response.get_json()
+        self.assertEqual((data['current']['bought'], data['current']['amount'], data['current']['version']),
+                         (True, '1', 2))
+        response = self.client.patch(f'/api/v1/items/{self.item_id}', json={'amount': '2', 'version': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['version'], 3)
+        self.assertTrue(response.get_json()['bought']) # The merged edit kept the toggle
+
+    def test_sync_upload_reports_conflicts(self):
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        response = self.client.post(f'/api/v1/households/{self.household_id}/sync', json={
+            'items': {'update': [{'id': self.item_id, 'amount': '9', 'version': 1}]}})
+        data = response.get_json()
+        self.assertEqual([(c['id'], c['version']) for c in data['conflicts']], [(self.item_id, 2)])
+        self.assertEqual(self.item().amount, '1')
+        response = self.client.post(f'/api/v1/households/{self.household_id}/sync', json={
+            'items': {'update': [{'id': self.item_id, 'amount': '9', 'version': 2}]}})
+        self.assertEqual(response.get_json()['conflicts'], [])
+        self.assertEqual((self.item().amount, self.item().version), ('9', 3))
+
+    def test_edit_of_a_deleted_item(self):
+        version = self.form_version()
+        self.client.post('/api/v1/items/delete', json={'ids': [self.item_id]})
+        response = self.client.post(f'/item/{self.item_id}/edit', data={'name': 'Milk', 'version': version})
+        self.assertEqual(response.status_code, 404)
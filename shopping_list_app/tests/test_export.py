@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import Household, ShoppingList, ShoppingItem, ImportJob
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app import exporter
+from shopping_list_app.app.importer import ItemImporter, read_rows
+from shopping_list_app.app.instrumentation import capture_queries
+
+class TestHouseholdExport(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="exporter", email="export@example.com", password="password")
+        self.login_user("export@example.com", "password")
+        household = self.create_household(self.user, "Export House")
+        self.household_id = household.id
+        older = ShoppingList(name="Old", date=datetime(2024, 1, 5), household_id=household.id)
+        newer = ShoppingList(name="New", date=datetime(2024, 2, 5), household_id=household.id)
+        empty = ShoppingList(name="Empty", date=datetime(2024, 3, 5), household_id=household.id)
+        db.session.add_all([older, newer, empty])
+        db.session.commit()
+        db.session.add_all([
+            ShoppingItem(name="Milk", category="Dairy", amount="2", shopping_list_id=newer.id),
+            ShoppingItem(name="Apples", bought=True, shopping_list_id=newer.id),
+            ShoppingItem(name="Bread", free_text='sliced, "fresh"', shopping_list_id=older.id),
+        ])
+        db.session.commit()
+
+    def test_csv_export(self):
+        response = self.client.get(f'/household/{self.household_id}/export?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([(r['list'], r['date'], r['name'], r['bought']) for r in rows], [
+            ('Old', '2024-01-05', 'Bread', '0'),
+            ('New', '2024-02-05', 'Milk', '0'),   # Unbought first, like the list page
+            ('New', '2024-02-05', 'Apples', '1'),
+            ('Empty', '2024-03-05', '', ''),
+        ])
+        self.assertEqual(rows[0]['free_text'], 'sliced, "fresh"')
+
+    def test_jsonl_export(self):
+        response = self.client.get(f'/household/{self.household_id}/export?format=jsonl')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1], {'list': 'New', 'date': '2024-02-05', 'name': 'Milk', 'category': 'Dairy',
+                                   'amount': '2', 'free_text': None, 'bought': False})
+
+    def test_export_is_streamed(self):
+        exporter_chunk = exporter.CHUNK_SIZE
+        exporter.CHUNK_SIZE = 1 # One chunk per row
+        try:
+            response = self.client.get(f'/household/{self.household_id}/export?format=csv', buffered=False)
+            self.assertTrue(response.is_streamed)
+            chunks = iter(response.response)
+            self.assertEqual(next(chunks), b'list,date,name,category,amount,free_text,bought\n')
+            self.assertTrue(next(chunks).startswith(b'Old,2024-01-05,Bread'))
+            self.assertEqual(len(list(chunks)), 4)  # three more rows, then the empty tail
+            response.close()
+        finally:
+            exporter.CHUNK_SIZE = exporter_chunk
+
+    def test_single_history_query(self):
+        with capture_queries() as statements:
+            self.client.get(f'/household/{self.household_id}/export?format=csv').get_data()
+        history = [s for s in statements if 'shopping_items' in s]
+        self.assertEqual(len(history), 1)
+        self.assertIn('LEFT OUTER JOIN shopping_items', history[0])
+
+    def test_export_requires_membership(self):
+        other = Household(name="Not Mine")
+        db.session.add(other)
+        db.session.commit()
+        self.assertEqual(self.client.get(f'/household/{other.id}/export').status_code, 403)
+        self.assertEqual(self.client.get(f'/household/{self.household_id}/export?format=xml').status_code, 400)
+
+    def test_export_cli_round_trip(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        try:
+            runner = app.test_cli_runner()
+            result = runner.invoke(args=['export', 'household', str(self.household_id), '-o', path])
+            self.assertEqual(result.exit_code, 0, result.output)
+            copy = Household(name="Copy")
+            db.session.add(copy)
+            db.session.commit()
+            result = runner.invoke(args=['import', 'items', path, '--household', str(copy.id)])
+            self.assertEqual(result.exit_code, 0, result.output)
+        finally:
+            os.remove(path)
+        self.assertEqual(ImportJob.query.filter_by(household_id=copy.id).one().rows_rejected, 0)
+        copied = (db.session.query(ShoppingItem.name, ShoppingItem.bought).join(ShoppingList)
+                  .filter(ShoppingList.household_id == copy.id).order_by(ShoppingItem.name).all())
+        self.assertEqual(copied, [('Apples', True), ('Bread', False), ('Milk', False)])
+        lists = ShoppingList.query.filter_by(household_id=copy.id).order_by(ShoppingList.date)
+        self.assertEqual([l.name for l in lists], ['Old', 'New', 'Empty'])
+
+    def test_jsonl_export_imports_as_is(self):
+        export = self.client.get(f'/household/{self.household_id}/export?format=jsonl').get_data(as_text=True)
+        copy = Household(name="Copy")
+        db.session.add(copy)
+        db.session.commit()
+        rejects = []
+        importer = ItemImporter(copy, 'export.jsonl', on_reject=lambda number, errors: rejects.append(errors))
+        job = importer.run(read_rows(io.StringIO(export), 'jsonl'))
+        self.assertEqual(rejects, [])
+        self.assertEqual((job.items_imported, job.rows_rejected), (3, 0))
+        empty = ShoppingList.query.filter_by(household_id=copy.id, name="Empty").one()
+        self.assertEqual((empty.date, empty.items.count()), (datetime(2024, 3, 5), 0))
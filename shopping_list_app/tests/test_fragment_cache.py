@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from .base import BaseTestCase
+from shopping_list_app.app.models import Household, ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db, fragment_cache
+from shopping_list_app.app.fragment_cache import MemoryBackend, SQLiteBackend
+
+class TestBackends(unittest.TestCase):
+
+    def test_memory_backend_evicts_least_recently_used_by_size(self):
+        backend = MemoryBackend(max_bytes=10)
+        backend.set('a', 'xxxx')
+        backend.set('b', 'xxxx')
+        backend.get('a') # 'b' is now the least recently used
+        backend.set('c', 'xxxx')
+        self.assertEqual(backend.get('b'), None)
+        self.assertEqual(backend.get('a'), 'xxxx')
+        self.assertEqual(backend.stats(), {'entries': 2, 'bytes': 8})
+
+    def test_memory_backend_delete_prefix(self):
+        backend = MemoryBackend()
+        backend.set('list-items:1:v1', 'one')
+        backend.set('list-items:10:v1', 'ten')
+        backend.delete_prefix('list-items:1:')
+        self.assertIsNone(backend.get('list-items:1:v1'))
+        self.assertEqual(backend.get('list-items:10:v1'), 'ten')
+
+    def test_sqlite_backend_is_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'fragments.db')
+            writer, reader = SQLiteBackend(path), SQLiteBackend(path)
+            writer.set('list-items:1:v1', '<li>one</li>')
+            writer.set('list-items:10:v1', '<li>ten</li>')
+            self.assertEqual(reader.get('list-items:1:v1'), '<li>one</li>')
+            reader.delete_prefix('list-items:1:')
+            self.assertIsNone(writer.get('list-items:1:v1'))
+            self.assertEqual(writer.get('list-items:10:v1'), '<li>ten</li>')
+            writer.record(3, 1)
+            self.assertEqual(reader.stats()['shared_hits'], 3)
+
+    def test_sqlite_backend_is_bounded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = SQLiteBackend(os.path.join(tmp, 'fragments.db'), max_entries=10)
+            for n in range(128):
+                backend.set(f'k{n}', 'v')
+            self.assertLessEqual(backend.stats()['entries'], 10 + 64)
+
+class TestListItemFragments(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="cacher", email="cache@example.com", password="password")
+        self.login_user(email="cache@example.com", password="password")
+        household = self.create_household(self.user, "Cache House")
+        slist = ShoppingList(name="Cache List", household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        self.list_id = slist.id
+        item = ShoppingItem(name="Rice", shopping_list_id=slist.id)
+        db.session.add(item)
+        db.session.commit()
+        self.item_id = item.id
+
+    def test_second_view_is_a_hit_and_mutations_invalidate(self):
+        url = f'/shopping_list/{self.list_id}/items'
+        self.assertEqual(self.client.get(url).headers['X-Fragment-Cache'], 'miss')
+        cached = self.client.get(url)
+        self.assertEqual(cached.headers['X-Fragment-Cache'], 'hit')
+        self.assertIn(b'Rice', cached.data)
+        self.assertEqual((fragment_cache.hits, fragment_cache.misses), (1, 1))
+
+        self.client.post(f'/shopping_list/{self.list_id}/add_item', data=dict(name="Beans"))
+        fresh = self.client.get(url)
+        self.assertEqual(fresh.headers['X-Fragment-Cache'], 'miss')
+        self.assertIn(b'Beans', fresh.data)
+        self.assertEqual(fragment_cache.stats()['entries'], 1) # The old version was dropped
+
+        self.client.post(f'/item/{self.item_id}/toggle_bought', headers={'Accept': 'application/json'})
+        toggled = self.client.get(url)
+        self.assertEqual(toggled.headers['X-Fragment-Cache'], 'miss')
+        self.assertIn(b'Mark Unbought', toggled.data)
+
+    def test_deleted_list_leaves_nothing_for_a_new_one(self):
+        url = f'/shopping_list/{self.list_id}/items'
+        etag = self.client.get(url).headers['ETag']
+        self.client.post(f'/shopping_list/{self.list_id}/delete')
+        self.assertEqual(fragment_cache.stats()['entries'], 0)
+        household_id = Household.query.one().id
+        self.client.post(f'/household/{household_id}/new_list', data=dict(name="Next List", date='2025-01-01'))
+        new_list = ShoppingList.query.one()
+        self.assertNotEqual(new_list.id, self.list_id) # Ids are never reused
+        response = self.client.get(f'/shopping_list/{new_list.id}/items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'Rice', response.data)
@@ -0,0 +1,45 @@
+import os
+import runpy
+import unittest
+from unittest import mock
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn_config.py')
+
+class TestGunicornConfig(unittest.TestCase):
+
+    def load(self, **env):
+        with mock.patch.dict(os.environ, env, clear=False):
+            for key in ('DB_POOL_SIZE', 'DB_MAX_OVERFLOW'):
+                if key not in env:
+                    os.environ.pop(key, None)
+            with mock.patch('multiprocessing.cpu_count', return_value=2):
+                settings = runpy.run_path(CONFIG)
+            settings['env'] = {k: os.environ.get(k) for k in ('DB_POOL_SIZE', 'DB_MAX_OVERFLOW')}
+        return settings
+
+    def test_defaults_follow_cpu_count(self):
+        settings = self.load()
+        self.assertEqual(settings['worker_class'], 'gthread')
+        self.assertEqual(settings['workers'], 5)
+        self.assertEqual(settings['threads'], 4)
+        self.assertTrue(settings['preload_app'])
+        self.assertEqual(settings['max_requests'], 1000)
+        self.assertEqual(settings['max_requests_jitter'], 100)
+
+    def test_pool_matches_threads_per_worker(self):
+        settings = self.load(GUNICORN_THREADS='8', WEB_CONCURRENCY='3')
+        self.assertEqual(settings['workers'], 3)
+        self.assertEqual(settings['env'], {'DB_POOL_SIZE': '8', 'DB_MAX_OVERFLOW': '2'})
+
+    def test_gevent_is_refused(self):
+        # A SQLite lock wait would block every greenlet of the worker
+        with self.assertRaises(ValueError):
+            self.load(GUNICORN_WORKER_CLASS='gevent')
+
+    def test_pool_caps_open_connections(self):
+        settings = self.load(GUNICORN_THREADS='32')
+        self.assertEqual(settings['env'], {'DB_POOL_SIZE': '20', 'DB_MAX_OVERFLOW': '12'})
+
+    def test_explicit_pool_size_wins(self):
+        settings = self.load(DB_POOL_SIZE='3', DB_MAX_OVERFLOW='0')
+        self.assertEqual(settings['env'], {'DB_POOL_SIZE': '3', 'DB_MAX_OVERFLOW': '0'})
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import Household, ShoppingList, ShoppingItem, ImportJob
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.importer import ItemImporter, read_rows
+from shopping_list_app.app.instrumentation import capture_queries
+
+CSV = """list,date,name,category,amount,free_text,bought
+Weekly,2024-03-01,Milk,Dairy,2,,yes
+Weekly,2024-03-01,Bread,,1,,
+Weekly,2024-03-08,Eggs,Dairy,12,free range,0
+Weekly,not-a-date,Apples,,,,
+Weekly,2024-03-08,,Dairy,,,
+"""
+
+class TestItemImport(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        household = Household(name="Import House")
+        db.session.add(household)
+        db.session.commit()
+        self.household = household
+        self.runner = app.test_cli_runner()
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+        super().tearDown()
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.paths.append(path)
+        return path
+
+    def jsonl(self, count):
+        return ''.join(json.dumps({'list': 'History', 'date': '2023-01-0%d' % (n % 3 + 1), 'name': f'Item {n}'}) + '\n'
+                       for n in range(count))
+
+    def test_csv_import(self):
+        path = self.write('.csv', CSV)
+        result = self.runner.invoke(args=['import', 'items', path, '--household', str(self.household.id)])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Imported 3 items from 5 rows (2 rejected)', result.output)
+        self.assertIn('row 4 rejected', result.output)
+        self.assertIn('row 5 rejected', result.output)
+
+        lists = ShoppingList.query.filter_by(household_id=self.household.id).order_by(ShoppingList.date).all()
+        self.assertEqual([(l.name, l.date.day) for l in lists], [('Weekly', 1), ('Weekly', 8)])
+        milk = ShoppingItem.query.filter_by(name='Milk').one()
+        self.assertTrue(milk.bought)
+        self.assertEqual((milk.category, milk.amount), ('Dairy', '2'))
+        self.assertFalse(ShoppingItem.query.filter_by(name='Bread').one().bought)
+        self.assertEqual(ShoppingItem.query.filter_by(name='Eggs').one().free_text, 'free range')
+
+        job = ImportJob.query.one()
+        self.assertTrue(job.finished)
+        self.assertEqual((job.rows_done, job.items_imported, job.rows_rejected), (5, 3, 2))
+
+    def test_already_imported(self):
+        path = self.write('.csv', CSV)
+        args = ['import', 'items', path, '--household', str(self.household.id)]
+        self.runner.invoke(args=args)
+        result = self.runner.invoke(args=args)
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('already imported', result.output)
+        self.assertEqual(ShoppingItem.query.count(), 3)
+
+        result = self.runner.invoke(args=args + ['--restart'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(ShoppingItem.query.count(), 6)
+
+    def test_unknown_household(self):
+        path = self.write('.csv', CSV)
+        result = self.runner.invoke(args=['import', 'items', path, '--household', '999'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('No household with id 999', result.output)
+
+    def test_batches_use_executemany(self):
+        path = self.write('.jsonl', self.jsonl(25))
+        with capture_queries() as statements:
+            result = self.runner.invoke(args=['import', 'items', path, '--household', str(self.household.id),
+                                              '--batch-size', '10'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(ShoppingItem.query.count(), 25)
+        self.assertEqual(ShoppingList.query.count(), 3)
+        item_inserts = [s for s in statements if s.startswith('INSERT INTO shopping_items')]
+        self.assertEqual(len(item_inserts), 3) # 10 + 10 + 5 rows
+
+    def test_resume_after_failure(self):
+        path = self.write('.jsonl', self.jsonl(25))
+        batches = []
+
+        def fail_after_two(job, rows_per_second):
+            batches.append(job.rows_done)
+            if len(batches) == 2:
+                raise RuntimeError('connection lost')
+
+        importer = ItemImporter(self.household, path, batch_size=10, on_batch=fail_after_two)
+        with open(path) as stream:
+            with self.assertRaises(RuntimeError):
+                importer.run(read_rows(stream, 'jsonl'))
+        self.assertEqual(ShoppingItem.query.count(), 20)
+        self.assertFalse(ImportJob.query.one().finished)
+
+        result = self.runner.invoke(args=['import', 'items', path, '--household', str(self.household.id)])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Resuming after row 20', result.output)
+        self.assertEqual(ShoppingItem.query.count(), 25)
+        self.assertEqual(ShoppingList.query.count(), 3) # Lists from the first run are reused
+        job = ImportJob.query.one()
+        self.assertEqual((job.rows_done, job.items_imported, job.finished), (25, 25, True))
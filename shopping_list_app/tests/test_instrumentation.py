@@ -0,0 +1,59 @@
+import json
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from .base import BaseTestCase, app
+from shopping_list_app.app.extensions import db
+
+class TestInstrumentation(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = self.create_user(username="metrics", email="metrics@example.com", password="password")
+        self.login_user("metrics@example.com", "password")
+        household = self.create_household(user, "Metrics House")
+        self.household_id = household.id
+
+    def tearDown(self):
+        app.config.pop('SQL_REPEAT_THRESHOLD', None)
+        super().tearDown()
+
+    def test_server_timing_header(self):
+        response = self.client.get(f'/household/{self.household_id}/lists')
+        timings = response.headers.getlist('Server-Timing')
+        self.assertEqual(len(timings), 2)
+        self.assertRegex(timings[0], r'^db;dur=\d+\.\d\d;desc="\d+ queries"$')
+        self.assertRegex(timings[1], r'^app;dur=\d+\.\d\d$')
+
+    def test_structured_log_line(self):
+        with self.assertLogs('shopping_list.requests', 'INFO') as logs:
+            self.client.get(f'/household/{self.household_id}/lists')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['endpoint'], 'main.view_household_lists')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertNotIn('repeated', record)
+
+    def test_repeated_statements_logged_as_warning(self):
+        app.config['SQL_REPEAT_THRESHOLD'] = 1 # Every statement counts as repeated
+        with self.assertLogs('shopping_list.requests', 'WARNING') as logs:
+            self.client.get(f'/household/{self.household_id}/lists')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertTrue(record['repeated'])
+        self.assertEqual(sum(r['count'] for r in record['repeated']), record['queries'])
+
+    def test_assert_max_queries(self):
+        with self.assert_max_queries(10) as statements:
+            self.client.get(f'/household/{self.household_id}/lists')
+        self.assertTrue(statements)
+        self.assertTrue(all(s.startswith('SELECT') for s in statements))
+        with self.assertRaises(AssertionError):
+            with self.assert_max_queries(0):
+                self.client.get(f'/household/{self.household_id}/lists')
+
+    def test_failed_statement_leaves_no_start_time(self):
+        with db.engine.connect() as conn:
+            with self.assertRaises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            conn.rollback()
+            conn.execute(text('SELECT 1'))
+            self.assertEqual(conn.info['query_started'], [])
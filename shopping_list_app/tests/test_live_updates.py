@@ -0,0 +1,217 @@
+import json
+from datetime import datetime
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import ShoppingList, ShoppingItem, ListEvent
+from shopping_list_app.app.extensions import db, live_updates
+from shopping_list_app.app.live_updates import Broker, SQLiteBackend, RELOAD
+
+class TestBroker(BaseTestCase):
+
+    def test_dispatch_reaches_subscribers_of_that_list_only(self):
+        broker = Broker()
+        first, other = broker.subscribe(1), broker.subscribe(2)
+        broker.dispatch(7, 1, 'toggle', {'id': 3, 'bought': True})
+        self.assertEqual(first.get(timeout=0), (7, 'toggle', {'id': 3, 'bought': True}))
+        self.assertIsNone(other.get(timeout=0))
+        broker.unsubscribe(first)
+        broker.unsubscribe(other)
+        self.assertEqual(len(broker), 0)
+
+    def test_slow_subscriber_is_told_to_reload(self):
+        broker = Broker(max_size=2)
+        subscription = broker.subscribe(1)
+        for event_id in range(1, 5):
+            broker.dispatch(event_id, 1, 'add', {})
+        self.assertEqual(subscription.get(timeout=0), (None, RELOAD, None))
+        self.assertIsNone(subscription.get(timeout=0)) # Backlog dropped with it
+
+
+class LiveUpdatesTestCase(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="live", email="live@example.com", password="password")
+        self.login_user("live@example.com", "password")
+        household = self.create_household(self.user, "Live House")
+        shopping_list = ShoppingList(name="Weekly", date=datetime(2024, 5, 1), household_id=household.id)
+        db.session.add(shopping_list)
+        db.session.commit()
+        self.list_id = shopping_list.id
+        item = ShoppingItem(name="Milk", shopping_list_id=shopping_list.id)
+        db.session.add(item)
+        db.session.commit()
+        self.item_id = item.id
+        self.subscription = live_updates.broker.subscribe(self.list_id)
+
+    def tearDown(self):
+        live_updates.unsubscribe(self.subscription)
+        super().tearDown()
+
+
+class TestPublishing(LiveUpdatesTestCase):
+
+    def test_toggle_is_published_after_commit(self):
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        _, kind, data = self.subscription.get(timeout=0)
+        self.assertEqual((kind, data), ('toggle', {'id': self.item_id, 'bought': True}))
+
+    def test_add_and_delete_are_published(self):
+        self.client.post(f'/shopping_list/{self.list_id}/add_item', data={'name': 'Eggs'})
+        _, kind, data = self.subscription.get(timeout=0)
+        self.assertEqual((kind, data['name']), ('add', 'Eggs'))
+        self.client.post(f'/item/{data["id"]}/delete')
+        self.assertEqual(self.subscription.get(timeout=0)[1:], ('delete', {'id': data['id']}))
+
+    def test_api_writes_are_published(self):
+        self.client.post(f'/api/v1/lists/{self.list_id}/items', json={'items': [{'name': 'Eggs'}, {'name': 'Tea'}]})
+        names = [self.subscription.get(timeout=0)[2]['name'] for _ in range(2)]
+        self.assertEqual(sorted(names), ['Eggs', 'Tea'])
+
+    def test_nothing_is_published_without_a_commit(self):
+        live_updates.publish(self.list_id, 'toggle', {'id': self.item_id, 'bought': True})
+        db.session.rollback()
+        db.session.commit()
+        self.assertIsNone(self.subscription.get(timeout=0))
+
+    def test_forbidden_write_publishes_nothing(self):
+        self.logout_user()
+        self.create_user(username="outsider", email="out@example.com", password="password")
+        self.login_user("out@example.com", "password")
+        response = self.client.post(f'/item/{self.item_id}/toggle_bought')
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNone(self.subscription.get(timeout=0))
+
+
+class TestSQLiteBackend(LiveUpdatesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.memory_backend = live_updates.backend
+        # poll_interval=0: no poller thread, the test calls poll_once()
+        self.backend = live_updates.backend = SQLiteBackend(live_updates.broker, db.engine, poll_interval=0)
+        self.backend.started()
+
+    def tearDown(self):
+        live_updates.backend = self.memory_backend
+        super().tearDown()
+
+    def test_events_go_through_the_outbox(self):
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        event = ListEvent.query.one()
+        self.assertEqual((event.list_id, event.kind), (self.list_id, 'toggle'))
+        self.assertIsNone(self.subscription.get(timeout=0)) # Not until a poll sees the row
+        self.assertEqual(self.backend.poll_once(), 1)
+        self.assertEqual(self.subscription.get(timeout=0), (event.id, 'toggle', {'id': self.item_id, 'bought': True}))
+        self.assertEqual(self.backend.poll_once(), 0)
+
+    def test_rolled_back_events_never_reach_the_outbox(self):
+        live_updates.publish(self.list_id, 'toggle', {'id': self.item_id, 'bought': True})
+        db.session.rollback()
+        self.assertEqual(ListEvent.query.count(), 0)
+
+    def test_replay_after_event_id(self):
+        for _ in range(3):
+            self.client.post(f'/item/{self.item_id}/toggle_bought')
+        first, second, third = [e.id for e in ListEvent.query.order_by(ListEvent.id)]
+        missed = self.backend.replay(self.list_id, first)
+        self.assertEqual([(event_id, data['bought']) for event_id, _, data in missed], [(second, False), (third, True)])
+
+    def test_ids_are_not_reused_after_a_prune(self):
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        self.assertEqual(self.backend.poll_once(), 1)
+        self.subscription.get(timeout=0)
+        self.backend.retention = -1 # Everything is past retention
+        self.backend.prune()
+        self.assertEqual(ListEvent.query.count(), 0)
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        self.assertEqual(self.backend.poll_once(), 1) # A reused id would be <= last_id and skipped
+        self.assertEqual(self.subscription.get(timeout=0)[1:], ('toggle', {'id': self.item_id, 'bought': False}))
+
+    def test_reconnecting_stream_gets_missed_events(self):
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        event_id = ListEvent.query.one().id
+        response = self.client.get(f'/shopping_list/{self.list_id}/events',
+                                   headers={'Last-Event-ID': str(event_id - 1)}, buffered=False)
+        chunks = iter(response.response)
+        next(chunks) # retry:
+        self.assertEqual(next(chunks).decode(),
+                         f'id: {event_id}\nevent: toggle\ndata: {{"id": {self.item_id}, "bought": true}}\n\n')
+        response.close()
+
+    def test_replay_is_none_once_missed_events_are_pruned(self):
+        for _ in range(2):
+            self.client.post(f'/item/{self.item_id}/toggle_bought')
+        first, second = [e.id for e in ListEvent.query.order_by(ListEvent.id)]
+        self.backend.retention = -1
+        self.backend.prune()
+        self.assertEqual(self.backend.replay(self.list_id, second), []) # Missed nothing
+        self.assertIsNone(self.backend.replay(self.list_id, first))
+
+    def test_reconnect_after_a_prune_is_told_to_reload(self):
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        event_id = ListEvent.query.one().id
+        self.backend.retention = -1
+        self.backend.prune()
+        response = self.client.get(f'/shopping_list/{self.list_id}/events',
+                                   headers={'Last-Event-ID': str(event_id - 1)}, buffered=False)
+        self.assertEqual(list(response.response)[1:], [b'event: reload\ndata: null\n\n'])
+        self.assertEqual(len(live_updates.broker), 1) # The stream ended and unsubscribed
+
+    def test_replayed_event_is_not_sent_again(self):
+        app.config['SSE_KEEPALIVE'] = 0.1
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        event_id = ListEvent.query.one().id
+        response = self.client.get(f'/shopping_list/{self.list_id}/events',
+                                   headers={'Last-Event-ID': str(event_id - 1)}, buffered=False)
+        chunks = iter(response.response)
+        next(chunks) # retry:
+        self.assertTrue(next(chunks).startswith(f'id: {event_id}\n'.encode()))
+        self.assertEqual(self.backend.poll_once(), 1) # Committed before the stream subscribed
+        self.assertEqual(next(chunks), b': keepalive\n\n')
+        response.close()
+
+
+class TestEventStream(LiveUpdatesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        app.config['SSE_KEEPALIVE'] = 0.1
+
+    def tearDown(self):
+        app.config.pop('SSE_KEEPALIVE')
+        super().tearDown()
+
+    def test_stream_delivers_committed_changes(self):
+        response = self.client.get(f'/shopping_list/{self.list_id}/events', buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        message = next(chunks).decode()
+        self.assertIn('event: toggle\n', message)
+        self.assertEqual(json.loads(message.split('data: ')[1]), {'id': self.item_id, 'bought': True})
+        self.assertEqual(next(chunks), b': keepalive\n\n') # Nothing else happened
+        self.assertEqual(len(live_updates.broker), 2)
+        response.close()
+        self.assertEqual(len(live_updates.broker), 1) # Closing the stream unsubscribes it
+
+    def test_reconnect_after_unkept_events_is_told_to_reload(self):
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        event_id, _, _ = self.subscription.get(timeout=0)
+        response = self.client.get(f'/shopping_list/{self.list_id}/events',
+                                   headers={'Last-Event-ID': str(event_id - 1)}, buffered=False)
+        self.assertEqual(list(response.response)[1:], [b'event: reload\ndata: null\n\n'])
+        response = self.client.get(f'/shopping_list/{self.list_id}/events',
+                                   headers={'Last-Event-ID': str(event_id)}, buffered=False)
+        chunks = iter(response.response)
+        next(chunks) # retry:
+        self.assertEqual(next(chunks), b': keepalive\n\n') # Nothing was missed
+        response.close()
+
+    def test_non_member_cannot_listen(self):
+        self.logout_user()
+        self.create_user(username="outsider", email="out@example.com", password="password")
+        self.login_user("out@example.com", "password")
+        response = self.client.get(f'/shopping_list/{self.list_id}/events')
+        self.assertEqual(response.status_code, 403)
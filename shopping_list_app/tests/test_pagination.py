@@ -0,0 +1,89 @@
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.pagination import encode_cursor
+
+class TestKeysetPagination(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        app.config['PAGE_SIZE'] = 2
+        self.user = self.create_user(username="pager", email="pager@example.com", password="password")
+        self.login_user(email="pager@example.com", password="password")
+        household = self.create_household(self.user, "Paged House")
+        self.household_id = household.id
+        start = datetime(2024, 1, 1)
+        for day in range(5):
+            db.session.add(ShoppingList(name=f"List {day}", household_id=household.id,
+                                        date=start + timedelta(days=day)))
+        slist = ShoppingList(name="Big List", household_id=household.id, date=datetime(2023, 1, 1))
+        db.session.add(slist)
+        db.session.commit()
+        self.list_id = slist.id
+        for name, bought in (("Eggs", True), ("Apples", False), ("Milk", False), ("Bread", True), ("Cheese", False)):
+            db.session.add(ShoppingItem(name=name, bought=bought, shopping_list_id=slist.id))
+        db.session.commit()
+
+    def tearDown(self):
+        app.config.pop('PAGE_SIZE', None)
+        super().tearDown()
+
+    def names(self, response):
+        return re.findall(rb'<strong>(?:<a [^>]*>)?([^<]+)', response.data)
+
+    def follow(self, response, label):
+        match = re.search(rb'<a href="([^"]+)">' + label, response.data)
+        self.assertIsNotNone(match, label)
+        return self.client.get(match.group(1).decode().replace('&amp;', '&'))
+
+    def test_household_lists_walk_forward_and_back(self):
+        first = self.client.get(f'/household/{self.household_id}/lists')
+        self.assertEqual(self.names(first), [b'List 4', b'List 3'])
+        self.assertNotIn(b'Previous', first.data)
+        second = self.follow(first, b'Next')
+        self.assertEqual(self.names(second), [b'List 2', b'List 1'])
+        third = self.follow(second, b'Next')
+        self.assertEqual(self.names(third), [b'List 0', b'Big List'])
+        self.assertNotIn(b'Next', third.data)
+        back = self.follow(third, b'&laquo; Previous')
+        self.assertEqual(self.names(back), [b'List 2', b'List 1'])
+        self.assertEqual(self.names(self.follow(back, b'&laquo; Previous')), [b'List 4', b'List 3'])
+
+    def test_list_items_are_paged_unbought_first(self):
+        first = self.client.get(f'/shopping_list/{self.list_id}/items')
+        self.assertEqual(self.names(first), [b'Apples', b'Cheese'])
+        second = self.follow(first, b'Next')
+        self.assertEqual(self.names(second), [b'Milk', b'Bread'])
+        third = self.follow(second, b'Next')
+        self.assertEqual(self.names(third), [b'Eggs'])
+        self.assertNotIn(b'Next', third.data)
+
+    def test_no_offset_or_count_queries(self):
+        statements = []
+        def record(conn, cursor, statement, parameters, *args):
+            statements.append((statement.upper(), parameters))
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            first = self.client.get(f'/household/{self.household_id}/lists')
+            self.follow(first, b'Next')
+            self.client.get(f'/shopping_list/{self.list_id}/items')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertFalse([s for s, p in statements if 'COUNT(' in s])
+        # SQLite always renders LIMIT ? OFFSET ?; the offset must stay 0.
+        self.assertEqual({p[-1] for s, p in statements if 'OFFSET' in s}, {0})
+
+    def test_malformed_cursor_is_rejected(self):
+        response = self.client.get(f'/household/{self.household_id}/lists?after=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_values_must_match_their_columns(self):
+        for values in ([{'a': 1}, 'x', 1], [False, ['Milk'], 1], ['false', 'Milk', 1], [False, 'Milk', 1.5],
+                       [False, 'Milk', True]):
+            response = self.client.get(f'/shopping_list/{self.list_id}/items?after={encode_cursor(values)}')
+            self.assertEqual(response.status_code, 400, values)
+        response = self.client.get(f'/shopping_list/{self.list_id}/items?after={encode_cursor([False, "Milk", 1])}')
+        self.assertEqual(response.status_code, 200)
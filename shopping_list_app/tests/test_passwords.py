@@ -0,0 +1,40 @@
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import User
+from shopping_list_app.app.extensions import db
+
+class TestPasswordPolicy(BaseTestCase):
+
+    def test_hash_follows_configured_method(self):
+        user = self.create_user(username="policy", email="policy@example.com", password="password")
+        self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertFalse(user.password_needs_rehash())
+
+    def test_login_rehashes_outdated_hash(self):
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:500'
+        user = self.create_user(username="oldhash", email="oldhash@example.com", password="password")
+        old_hash = user.password_hash
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        self.assertTrue(user.password_needs_rehash())
+
+        response = self.login_user("oldhash@example.com", "password")
+        self.assertIn(b'Login successful!', response.data)
+        db.session.refresh(user)
+        self.assertNotEqual(user.password_hash, old_hash)
+        self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(user.check_password("password"))
+
+    def test_failed_login_does_not_rehash(self):
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:500'
+        user = self.create_user(username="keep", email="keep@example.com", password="password")
+        old_hash = user.password_hash
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        self.login_user("keep@example.com", "wrong")
+        db.session.refresh(user)
+        self.assertEqual(user.password_hash, old_hash)
+
+    def test_hashing_in_process_pool(self):
+        app.config['PASSWORD_HASH_WORKERS'] = 1
+        user = User(username="pooled", email="pooled@example.com")
+        user.set_password("password")
+        self.assertTrue(user.check_password("password"))
+        self.assertFalse(user.check_password("nope"))
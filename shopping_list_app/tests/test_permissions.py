@@ -0,0 +1,60 @@
+from flask_login import login_user
+from sqlalchemy import event
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.permissions import is_household_member
+
+class TestPermissions(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="member", email="member@example.com", password="password")
+        self.other = self.create_user(username="outsider", email="outsider@example.com", password="password")
+        self.household = self.create_household(self.user, "Members Only")
+        self.slist = ShoppingList(name="Private List", household_id=self.household.id)
+        db.session.add(self.slist)
+        db.session.commit()
+        self.item = ShoppingItem(name="Secret Item", shopping_list_id=self.slist.id)
+        db.session.add(self.item)
+        db.session.commit()
+
+    def test_outsider_gets_403_on_list_and_item_routes(self):
+        self.login_user(email="outsider@example.com", password="password")
+        self.assertEqual(self.client.get(f'/household/{self.household.id}/lists').status_code, 403)
+        self.assertEqual(self.client.get(f'/shopping_list/{self.slist.id}/items').status_code, 403)
+        self.assertEqual(self.client.get(f'/shopping_list/{self.slist.id}/add_item').status_code, 403)
+        self.assertEqual(self.client.get(f'/item/{self.item.id}/edit').status_code, 403)
+        self.assertEqual(self.client.post(f'/item/{self.item.id}/toggle_bought').status_code, 403)
+        self.assertEqual(self.client.post(f'/item/{self.item.id}/delete').status_code, 403)
+        self.assertEqual(self.client.post(f'/shopping_list/{self.slist.id}/delete').status_code, 403)
+        self.assertIsNotNone(db.session.get(ShoppingItem, self.item.id))
+
+    def test_member_can_access_item_routes(self):
+        self.login_user(email="member@example.com", password="password")
+        self.assertEqual(self.client.get(f'/shopping_list/{self.slist.id}/items').status_code, 200)
+        self.assertEqual(self.client.get(f'/item/{self.item.id}/edit').status_code, 200)
+
+    def test_membership_is_one_query_cached_per_request(self):
+        statements = []
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        with app.test_request_context():
+            login_user(self.user)
+            household_id = self.household.id
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                self.assertTrue(is_household_member(household_id))
+                self.assertTrue(is_household_member(household_id))
+                self.assertEqual(len(statements), 1)
+                self.assertIn('user_households', statements[0])
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+
+    def test_membership_cache_is_per_user(self):
+        # A context that outlives a login switch must not reuse the other user's answer
+        with app.test_request_context():
+            login_user(self.user)
+            self.assertTrue(is_household_member(self.household.id))
+            login_user(self.other)
+            self.assertFalse(is_household_member(self.household.id))
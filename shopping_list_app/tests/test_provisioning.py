@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+from unittest import mock
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import User, Household, user_households
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.provisioning import provision, parse_households
+from shopping_list_app.app.passwords import hash_passwords
+from shopping_list_app.app.instrumentation import capture_queries
+
+CSV = """username,email,password,households
+alice,alice@example.com,secret1,Flat 3B;Co-op
+bob,bob@example.com,secret2,Flat 3B
+taken,fresh@example.com,secret3,
+carol,alice@example.com,secret4,Co-op
+x,not-an-email,short,
+dave,dave@example.com,secret5,#999
+"""
+
+class TestProvisioning(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_user(username="taken", email="taken@example.com", password="password")
+        self.existing = Household(name="Existing")
+        db.session.add(self.existing)
+        db.session.commit()
+        self.runner = app.test_cli_runner()
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+        app.config.pop('ADMIN_EMAILS', None)
+        super().tearDown()
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.paths.append(path)
+        return path
+
+    def members(self, name):
+        household = Household.query.filter_by(name=name).one()
+        return sorted(u.username for u in household.users)
+
+    def test_parse_households(self):
+        self.assertEqual(parse_households(' Flat  3B ; Co-op;;Flat 3B'), ['Flat 3B', 'Co-op'])
+        self.assertEqual(parse_households(['#1', 'Home']), ['#1', 'Home'])
+        self.assertEqual(parse_households(None), [])
+
+    def test_cli_creates_users_households_and_memberships(self):
+        report_path = self.write('.jsonl', '')
+        result = self.runner.invoke(args=['provision', 'users', self.write('.csv', CSV), '--workers', '0',
+                                          '--report', report_path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Created 2 users and 2 households (2 duplicates, 2 invalid)', result.output)
+        self.assertIn('row 3 duplicate: ["username already registered"]', result.output)
+        self.assertIn('row 4 duplicate: ["email repeats row 1"]', result.output)
+        self.assertEqual(self.members('Flat 3B'), ['alice', 'bob'])
+        self.assertEqual(self.members('Co-op'), ['alice'])
+        alice = User.query.filter_by(username='alice').one()
+        self.assertTrue(alice.check_password('secret1'))
+        with open(report_path) as f:
+            report = [json.loads(line) for line in f]
+        self.assertEqual([r['status'] for r in report], ['created', 'created', 'duplicate', 'duplicate',
+                                                         'invalid', 'invalid'])
+        self.assertNotIn('secret', json.dumps(report)) # Passwords never reach the report
+
+    def test_existing_households_by_id(self):
+        report = provision([(1, {'username': 'erin', 'email': 'erin@example.com', 'password': 'secret',
+                                 'households': [f'#{self.existing.id}']})], workers=0)
+        db.session.commit()
+        self.assertEqual(report.summary()['created'], 1)
+        self.assertEqual(self.members('Existing'), ['erin'])
+
+    def test_queries_do_not_grow_per_user(self):
+        def statements(count, offset):
+            rows = [(n, {'username': f'user{offset + n}', 'email': f'user{offset + n}@example.com',
+                         'password': 'secret', 'households': 'Shared'}) for n in range(count)]
+            with capture_queries() as captured:
+                report = provision(rows, batch_size=1000, workers=0)
+            db.session.commit()
+            self.assertEqual(report.count('created'), count)
+            return len(captured)
+
+        self.assertEqual(statements(3, 0), statements(300, 100))
+        self.assertEqual(db.session.query(user_households).count(), 303)
+
+    def test_parallel_hashing(self):
+        hashes = hash_passwords(['one', 'two', 'three'], workers=2)
+        user = User(username='h', email='h@example.com', password_hash=hashes[1])
+        self.assertTrue(user.check_password('two'))
+        self.assertEqual(len(set(hashes)), 3)
+
+    def test_admin_api(self):
+        body = {'users': [{'username': 'frank', 'email': 'frank@example.com', 'password': 'secret7',
+                           'households': ['Frank Home']}]}
+        self.login_user('taken@example.com', 'password')
+        self.assertEqual(self.client.post('/api/v1/admin/provision', json=body).status_code, 403)
+        app.config['ADMIN_EMAILS'] = ['taken@example.com']
+        response = self.client.post('/api/v1/admin/provision', json=body)
+        self.assertEqual(response.status_code, 201)
+        data = response.get_json()
+        self.assertEqual((data['created'], list(data['households'])), (1, ['Frank Home']))
+        self.assertEqual(self.members('Frank Home'), ['frank'])
+        response = self.client.post('/api/v1/admin/provision', json=body)
+        self.assertEqual((response.status_code, response.get_json()['duplicate']), (200, 1))
+        self.assertEqual(self.client.post('/api/v1/admin/provision', json={'users': []}).status_code, 400)
+        too_many = {'users': body['users'] * 101}
+        self.assertEqual(self.client.post('/api/v1/admin/provision', json=too_many).status_code, 413)
+
+    def test_api_hashes_in_the_shared_pool(self):
+        app.config.update(ADMIN_EMAILS=['taken@example.com'], PASSWORD_HASH_WORKERS=2)
+        self.login_user('taken@example.com', 'password')
+        shared = mock.Mock()
+        shared.map.side_effect = map # Hash inline, as the pool's processes would
+        body = {'users': [{'username': f'user{n}', 'email': f'user{n}@example.com', 'password': 'secret9'}
+                          for n in range(3)]}
+        with mock.patch('shopping_list_app.app.passwords._pool', return_value=shared) as pool, \
+                mock.patch('shopping_list_app.app.passwords.ProcessPoolExecutor') as own_pool:
+            response = self.client.post('/api/v1/admin/provision', json=body)
+        self.assertEqual((response.status_code, response.get_json()['created']), (201, 3))
+        pool.assert_called_once_with(2)
+        own_pool.assert_not_called()
+
+    def test_api_hashes_outside_any_transaction(self):
+        app.config['ADMIN_EMAILS'] = ['taken@example.com']
+        self.login_user('taken@example.com', 'password')
+        in_transaction = []
+        def hashing(passwords, workers=None):
+            in_transaction.append(db.session().in_transaction()) # A transaction here could hold the write lock
+            return hash_passwords(passwords, 0)
+        body = {'users': [{'username': 'gina', 'email': 'gina@example.com', 'password': 'secret8'}]}
+        with mock.patch('shopping_list_app.app.provisioning.hash_passwords', hashing):
+            response = self.client.post('/api/v1/admin/provision', json=body)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(in_transaction, [False])
+        self.assertIsNotNone(User.query.filter_by(username='gina').first())
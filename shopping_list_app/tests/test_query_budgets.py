@@ -0,0 +1,58 @@
+from flask import g
+from .base import BaseTestCase
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+
+# Query budget per route, with enough items that a lazy load per row (N+1)
+# would blow it. Each request runs in its own app context, as in production,
+# so nothing is served from the test's session or flask.g.
+ITEMS = 20
+
+class TestQueryBudgets(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = self.create_user(username="budget", email="budget@example.com", password="password")
+        self.login_user("budget@example.com", "password")
+        household = self.create_household(user, "Budget House")
+        slist = ShoppingList(name="Budget List", household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        for n in range(ITEMS):
+            db.session.add(ShoppingItem(name=f"Item {n}", shopping_list_id=slist.id))
+        db.session.commit()
+        self.household_id, self.list_id = household.id, slist.id
+        self.item_id = ShoppingItem.query.filter_by(shopping_list_id=slist.id).first().id
+        db.session.remove()
+        g.pop('_login_user', None)
+
+    def request(self, budget, path, method='GET', data=None):
+        self.app_context.pop()
+        try:
+            with self.assert_max_queries(budget):
+                response = self.client.open(path, method=method, data=data)
+        finally:
+            self.app_context.push()
+        self.assertLess(response.status_code, 400)
+        return response
+
+    def test_read_routes(self):
+        self.request(1, '/index')
+        self.request(2, '/households')
+        self.request(4, f'/household/{self.household_id}/lists')
+        self.request(5, f'/shopping_list/{self.list_id}/items')
+        self.request(6, f'/shopping_list/{self.list_id}/aisles')
+        self.request(5, f'/household/{self.household_id}/aisles')
+        self.request(3, f'/shopping_list/{self.list_id}/add_item')
+        self.request(3, f'/item/{self.item_id}/edit')
+
+    def test_write_routes(self):
+        self.request(4, '/create_household', 'POST', {'name': 'Second House'})
+        self.request(7, f'/household/{self.household_id}/new_list', 'POST', {'name': 'Next', 'date': '2025-01-01'})
+        self.request(7, f'/shopping_list/{self.list_id}/add_item', 'POST', {'name': 'Milk'})
+        self.request(7, f'/shopping_list/{self.list_id}/clone', 'POST', {'name': 'Again', 'date': '2025-01-08'})
+        self.request(5, f'/household/{self.household_id}/aisles', 'POST', {'categories': 'Produce\nDairy'})
+        self.request(6, f'/item/{self.item_id}/edit', 'POST', {'name': 'Bread'})
+        self.request(3, f'/item/{self.item_id}/toggle_bought', 'POST')
+        self.request(5, f'/item/{self.item_id}/delete', 'POST')
+        self.request(5, f'/shopping_list/{self.list_id}/delete', 'POST')
@@ -0,0 +1,156 @@
+import re
+from sqlalchemy import event
+from .base import BaseTestCase
+from shopping_list_app.app.models import ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.pagination import encode_cursor
+
+# Every route's SELECT/UPDATE/DELETE (and INSERT ... SELECT) statements are
+# captured while the route runs and then fed back through EXPLAIN QUERY PLAN.
+# A plan step that scans a whole table, even through a covering index, or
+# sorts through a temporary b-tree, means an index is missing. Scans of
+# subqueries/co-routines (e.g. the wrapper of a count()) are fine.
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\b')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+# Where no index can hold the order, sorting is expected: the groups a GROUP BY
+# produced (aisle view, sync), full-text matches ranked by score (search), and
+# a list's items put in the household's aisle order, which lives in another table
+SORTED_AFTERWARDS = ('GROUP BY', ' MATCH ', 'ORDER BY aisle.position')
+
+class TestQueryPlans(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="planner", email="plan@example.com", password="password")
+        self.login_user(email="plan@example.com", password="password")
+        household = self.create_household(self.user, "Plan House")
+        self.household_id = household.id
+        slist = ShoppingList(name="Plan List", household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        self.list_id = slist.id
+        for name in ("Apples", "Bread", "Cheese"):
+            db.session.add(ShoppingItem(name=name, shopping_list_id=slist.id))
+        db.session.commit()
+        self.item_id = ShoppingItem.query.filter_by(name="Apples").first().id
+
+    def capture(self, func, *args, **kwargs):
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            verb = statement.lstrip()[:6].upper()
+            if not executemany and (verb in ('SELECT', 'UPDATE', 'DELETE') or verb == 'INSERT' and 'SELECT' in statement):
+                statements.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = func(*args, **kwargs)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertLess(response.status_code, 400)
+        return statements
+
+    def assertIndexedPlans(self, statements):
+        self.assertTrue(statements)
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                details = [row[-1] for row in plan]
+                for detail in details:
+                    scan = FULL_SCAN.search(detail)
+                    self.assertFalse(scan and scan.group(1) in db.metadata.tables,
+                                     f'full scan in {statement!r}: {details}')
+                    if not any(clause in statement for clause in SORTED_AFTERWARDS):
+                        self.assertNotIn(TEMP_SORT, detail, f'unindexed sort in {statement!r}: {details}')
+
+    def test_view_households_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.get, '/households'))
+
+    def test_view_household_lists_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.get, f'/household/{self.household_id}/lists'))
+
+    def test_view_household_lists_cursor_page_plans(self):
+        slist = db.session.get(ShoppingList, self.list_id)
+        cursor = encode_cursor([slist.date, slist.id])
+        self.assertIndexedPlans(self.capture(self.client.get, f'/household/{self.household_id}/lists?after={cursor}'))
+        self.assertIndexedPlans(self.capture(self.client.get, f'/household/{self.household_id}/lists?before={cursor}'))
+
+    def test_view_list_items_cursor_page_plans(self):
+        cursor = encode_cursor([False, "Bread", self.item_id])
+        self.assertIndexedPlans(self.capture(self.client.get, f'/shopping_list/{self.list_id}/items?after={cursor}'))
+        self.assertIndexedPlans(self.capture(self.client.get, f'/shopping_list/{self.list_id}/items?before={cursor}'))
+
+    def test_export_household_plans(self):
+        # buffered=True so the streamed body (and its query) runs inside capture()
+        self.assertIndexedPlans(self.capture(self.client.get, f'/household/{self.household_id}/export',
+                                             buffered=True))
+
+    def test_create_shopping_list_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.post, f'/household/{self.household_id}/new_list',
+                                             data=dict(name="Another", date="2024-02-01")))
+
+    def test_view_list_items_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.get, f'/shopping_list/{self.list_id}/items'))
+
+    def test_add_item_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.post, f'/shopping_list/{self.list_id}/add_item',
+                                             data=dict(name="Dates")))
+
+    def test_edit_item_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.post, f'/item/{self.item_id}/edit',
+                                             data=dict(name="Green Apples")))
+
+    def test_toggle_item_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.post, f'/item/{self.item_id}/toggle_bought'))
+
+    def test_delete_item_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.post, f'/item/{self.item_id}/delete'))
+
+    def test_delete_shopping_list_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.post, f'/shopping_list/{self.list_id}/delete'))
+
+    def test_login_plans(self):
+        self.logout_user()
+        self.assertIndexedPlans(self.capture(self.client.post, '/login',
+                                             data=dict(email="plan@example.com", password="password")))
+
+    def test_api_household_lists_plans(self):
+        slist = db.session.get(ShoppingList, self.list_id)
+        cursor = encode_cursor([slist.date, slist.id])
+        self.assertIndexedPlans(self.capture(self.client.get, f'/api/v1/households/{self.household_id}/lists'))
+        self.assertIndexedPlans(self.capture(self.client.get,
+                                             f'/api/v1/households/{self.household_id}/lists?after={cursor}'))
+
+    def test_api_list_items_plans(self):
+        cursor = encode_cursor([False, "Bread", self.item_id])
+        self.assertIndexedPlans(self.capture(self.client.get, f'/api/v1/lists/{self.list_id}/items'))
+        self.assertIndexedPlans(self.capture(self.client.get, f'/api/v1/lists/{self.list_id}/items?after={cursor}'))
+
+    def test_search_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.get, '/search?q=apples'))
+        self.assertIndexedPlans(self.capture(self.client.get, f'/api/v1/search?q=bread&household_id={self.household_id}'))
+
+    def test_aisles_plans(self):
+        self.client.put(f'/api/v1/households/{self.household_id}/aisles', json={'categories': ['Dairy']})
+        self.assertIndexedPlans(self.capture(self.client.get, f'/shopping_list/{self.list_id}/aisles'))
+        self.assertIndexedPlans(self.capture(self.client.get, f'/api/v1/lists/{self.list_id}/aisles'))
+        self.assertIndexedPlans(self.capture(self.client.get, f'/household/{self.household_id}/aisles'))
+
+    def test_suggestions_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.get,
+                                             f'/api/v1/households/{self.household_id}/suggestions?field=name&q=a'))
+
+    def test_sync_plans(self):
+        since = self.client.get(f'/api/v1/households/{self.household_id}/sync').get_json()['since']
+        self.client.post(f'/item/{self.item_id}/toggle_bought')
+        self.assertIndexedPlans(self.capture(self.client.get, f'/api/v1/households/{self.household_id}/sync'))
+        self.assertIndexedPlans(self.capture(self.client.get,
+                                             f'/api/v1/households/{self.household_id}/sync?since={since}'))
+        bread_id = ShoppingItem.query.filter_by(name="Bread").one().id
+        self.assertIndexedPlans(self.capture(self.client.post, f'/api/v1/households/{self.household_id}/sync', json={
+            'lists': {'update': [{'id': self.list_id, 'name': 'Renamed'}]},
+            'items': {'create': [{'list_id': self.list_id, 'name': 'Eggs'}], 'delete': [bread_id]}}))
+
+    def test_clone_plans(self):
+        self.assertIndexedPlans(self.capture(self.client.post, f'/shopping_list/{self.list_id}/clone',
+                                             data=dict(name="Copy", date="2024-02-01", reset_bought='y')))
+        self.assertIndexedPlans(self.capture(self.client.post, f'/api/v1/lists/{self.list_id}/clone',
+                                             json={'name': 'API copy', 'date': '2024-02-01', 'only_unbought': True}))
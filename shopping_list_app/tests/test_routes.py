@@ -2,6 +2,7 @@ from .base import BaseTestCase # Adjusted import
 from shopping_list_app.app.models import User, Household, ShoppingList, ShoppingItem
 from shopping_list_app.app.extensions import db
 from flask import url_for
+from sqlalchemy import event
 
 class TestRoutes(BaseTestCase):
 
@@ -144,3 +145,33 @@ class TestRoutes(BaseTestCase):
         self.assertIn(b'marked as not bought', response_unbought.data)
         db.session.refresh(item) # Refresh item state from DB
         self.assertFalse(item.bought)
+
+    def test_toggle_item_bought_json_fast_path(self):
+        self.client.post('/create_household', data=dict(name="FastHouse"), follow_redirects=True)
+        household = Household.query.filter_by(name="FastHouse").first()
+        self.client.post(f'/household/{household.id}/new_list', data=dict(name="FastList", date="2024-01-05"), follow_redirects=True)
+        slist = ShoppingList.query.filter_by(name="FastList").first()
+        self.client.post(f'/shopping_list/{slist.id}/add_item', data=dict(name="FastItem"), follow_redirects=True)
+        item = ShoppingItem.query.filter_by(name="FastItem").first()
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.post(f'/item/{item.id}/toggle_bought', headers={'Accept': 'application/json'})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {'id': item.id, 'bought': True})
+        # Apart from the user loader: the conditional UPDATE and the list version bump, no SELECTs
+        self.assertEqual([s.split()[0] for s in statements if not s.startswith('SELECT users.')], ['UPDATE', 'UPDATE'])
+        db.session.refresh(item)
+        self.assertTrue(item.bought)
+
+        response = self.client.post(f'/item/{item.id}/toggle_bought', headers={'Accept': 'application/json'})
+        self.assertEqual(response.get_json(), {'id': item.id, 'bought': False})
+
+    def test_toggle_missing_item_is_404(self):
+        response = self.client.post('/item/9999/toggle_bought')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,122 @@
+from datetime import datetime
+from sqlalchemy import text, insert
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import Household, ShoppingList, ShoppingItem
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app import search
+from shopping_list_app.app.instrumentation import capture_queries
+
+class SearchTestCase(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="finder", email="finder@example.com", password="password")
+        self.login_user("finder@example.com", "password")
+        home = self.create_household(self.user, "Home")
+        other = Household(name="Neighbours")
+        db.session.add(other)
+        db.session.commit()
+        self.home_id, self.other_id = home.id, other.id
+        party = ShoppingList(name="Party", date=datetime(2023, 4, 2), household_id=home.id)
+        weekly = ShoppingList(name="Weekly", date=datetime(2024, 1, 7), household_id=home.id)
+        theirs = ShoppingList(name="Birthday", date=datetime(2024, 3, 1), household_id=other.id)
+        db.session.add_all([party, weekly, theirs])
+        db.session.commit()
+        self.party_id, self.weekly_id = party.id, weekly.id
+        db.session.add_all([
+            ShoppingItem(name="Birthday candles", category="Party", shopping_list_id=party.id),
+            ShoppingItem(name="Cake", free_text="for the birthday", shopping_list_id=party.id),
+            ShoppingItem(name="Milk", category="Dairy", shopping_list_id=weekly.id),
+            ShoppingItem(name="Candles", shopping_list_id=theirs.id),
+        ])
+        db.session.commit()
+
+    def found(self, q, **params):
+        response = self.client.get('/api/v1/search', query_string={'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def names(self, q, **params):
+        return [(r['item'] or r['list'])['name'] for r in self.found(q, **params)['data']]
+
+
+class TestSearch(SearchTestCase):
+
+    def test_ranked_and_scoped_to_the_users_households(self):
+        # The name matches outrank the note; the neighbours' list and candles never show up
+        self.assertEqual(self.names('birthday'), ['Birthday candles', 'Cake'])
+        self.assertEqual(self.names('candle'), ['Birthday candles']) # Prefix match
+
+    def test_lists_are_found_by_name(self):
+        result = self.found('party')['data']
+        self.assertEqual([r['kind'] for r in result], ['list', 'item'])
+        self.assertEqual(result[0]['list']['id'], self.party_id)
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.names('birthday cake'), ['Cake'])
+        self.assertEqual(self.names('milk cake'), [])
+
+    def test_operators_and_punctuation_are_literal(self):
+        self.assertEqual(self.names('"milk" OR NEAR(cake'), [])
+        self.assertEqual(self.names('milk*'), ['Milk'])
+        self.assertEqual(self.names('  ?! '), [])
+
+    def test_household_filter(self):
+        self.assertEqual(self.names('birthday', household_id=self.home_id), ['Birthday candles', 'Cake'])
+        response = self.client.get('/api/v1/search', query_string={'q': 'candles', 'household_id': self.other_id})
+        self.assertEqual(response.status_code, 403)
+
+    def test_pages_follow_the_cursor(self):
+        db.session.execute(insert(ShoppingItem), [{'name': f'Balloon {n}', 'shopping_list_id': self.party_id}
+                                                   for n in range(7)])
+        db.session.commit()
+        app.config['PAGE_SIZE'] = 3
+        try:
+            pages, after = [], None
+            while True:
+                page = self.found('balloon', **({'after': after} if after else {}))
+                pages.append([r['item']['name'] for r in page['data']])
+                after = page['next']
+                if after is None:
+                    break
+        finally:
+            app.config.pop('PAGE_SIZE')
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        self.assertEqual(sorted(sum(pages, [])), [f'Balloon {n}' for n in range(7)])
+
+    def test_html_page(self):
+        response = self.client.get('/search?q=candles')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Birthday candles', response.data)
+        self.assertIn(b'Party', response.data)
+
+    def test_page_is_resolved_with_primary_key_lookups(self):
+        with capture_queries() as statements:
+            self.found('birthday')
+        self.assertEqual(len([s for s in statements if 'shopping_items' in s or 'shopping_lists' in s]), 2)
+
+
+class TestSearchIndexSync(SearchTestCase):
+
+    def index_rows(self):
+        return db.session.scalar(text('SELECT count(*) FROM search_index'))
+
+    def test_edits_and_deletes_reach_the_index(self):
+        milk = ShoppingItem.query.filter_by(name='Milk').one()
+        self.client.post(f'/item/{milk.id}/edit', data={'name': 'Oat milk', 'category': 'Dairy'})
+        self.assertEqual(self.names('oat'), ['Oat milk'])
+        self.client.post(f'/item/{milk.id}/delete')
+        self.assertEqual(self.names('oat'), [])
+
+    def test_deleting_a_list_removes_its_items(self):
+        before = self.index_rows()
+        self.client.post(f'/shopping_list/{self.party_id}/delete')
+        self.assertEqual(self.names('birthday'), [])
+        self.assertEqual(self.index_rows(), before - 3) # The list and its two items
+
+    def test_rebuild(self):
+        db.session.execute(text('DELETE FROM search_index'))
+        db.session.commit()
+        self.assertEqual(self.names('milk'), [])
+        self.assertEqual(search.rebuild(), 7) # 3 lists + 4 items
+        self.assertEqual(self.names('milk'), ['Milk'])
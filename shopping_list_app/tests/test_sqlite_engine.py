@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from .base import BaseTestCase, app
+from shopping_list_app.app.sqlite_engine import tune_engine, retry_on_busy
+
+WRITERS = 4
+WRITES_PER_WRITER = 50
+
+
+def write_counter_rows(path, writer):
+    """Child process: read-then-write transactions, the pattern views use."""
+    engine = tune_engine(create_engine(f'sqlite:///{path}'))
+    for n in range(WRITES_PER_WRITER):
+        with engine.connect().execution_options(sqlite_begin='IMMEDIATE') as conn:
+            with conn.begin():
+                seen = conn.execute(text('SELECT COUNT(*) FROM counter')).scalar()
+                conn.execute(text('INSERT INTO counter (writer, n, seen) VALUES (:w, :n, :s)'),
+                             {'w': writer, 'n': n, 's': seen})
+    engine.dispose()
+
+
+class TestSQLiteTuning(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        super().tearDown()
+
+    def test_pragmas_applied_on_connect(self):
+        engine = tune_engine(create_engine(f'sqlite:///{self.path}'))
+        with engine.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+            self.assertEqual(conn.exec_driver_sql('PRAGMA busy_timeout').scalar(), 5000)
+            self.assertEqual(conn.exec_driver_sql('PRAGMA synchronous').scalar(), 1) # NORMAL
+            self.assertEqual(conn.exec_driver_sql('PRAGMA foreign_keys').scalar(), 1)
+        engine.dispose()
+
+    def test_write_requests_begin_immediate(self):
+        engine = tune_engine(create_engine(f'sqlite:///{self.path}'))
+        statements = []
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        for method in ('GET', 'POST'):
+            with app.test_request_context(method=method), engine.begin() as conn:
+                conn.execute(text('SELECT 1'))
+        with engine.connect().execution_options(sqlite_begin='EXCLUSIVE') as conn:
+            with conn.begin():
+                conn.execute(text('SELECT 1'))
+        engine.dispose()
+        begins = [s for s in statements if s.startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN DEFERRED', 'BEGIN IMMEDIATE', 'BEGIN EXCLUSIVE'])
+
+    def test_retry_on_busy_retries_locked_errors(self):
+        calls = []
+
+        @retry_on_busy(backoff=0)
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('INSERT', {}, sqlite3.OperationalError('database is locked'))
+            return 'done'
+
+        with app.test_request_context():
+            self.assertEqual(flaky(), 'done')
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_on_busy_gives_up(self):
+        @retry_on_busy(retries=2, backoff=0)
+        def always_locked():
+            raise OperationalError('INSERT', {}, sqlite3.OperationalError('database is locked'))
+
+        @retry_on_busy(backoff=0)
+        def other_error():
+            raise OperationalError('INSERT', {}, sqlite3.OperationalError('no such table: x'))
+
+        with app.test_request_context():
+            self.assertRaises(OperationalError, always_locked)
+            self.assertRaises(OperationalError, other_error)
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'needs fork')
+    def test_concurrent_writer_processes(self):
+        engine = tune_engine(create_engine(f'sqlite:///{self.path}'))
+        with engine.begin() as conn:
+            conn.exec_driver_sql('CREATE TABLE counter (writer INTEGER, n INTEGER, seen INTEGER)')
+
+        ctx = multiprocessing.get_context('fork')
+        processes = [ctx.Process(target=write_counter_rows, args=(self.path, w)) for w in range(WRITERS)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        self.assertEqual([p.exitcode for p in processes], [0] * WRITERS)
+
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql('SELECT COUNT(*), COUNT(DISTINCT seen) FROM counter').one()
+        engine.dispose()
+        # No write was lost, and every transaction saw a different count
+        # (they ran one after another, not on top of a stale snapshot)
+        self.assertEqual(rows, (WRITERS * WRITES_PER_WRITER, WRITERS * WRITES_PER_WRITER))
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from shopping_list_app.app import create_app
+from shopping_list_app.app.config import load
+from shopping_list_app.app.extensions import fragment_cache
+from shopping_list_app.app.fragment_cache import NullBackend, MemoryBackend
+from shopping_list_app.benchmarks.import_time import measure, parse, BUDGET_MS, CLI_ONLY
+
+
+class TestConfigProfiles(unittest.TestCase):
+
+    def test_prod_reads_the_environment(self):
+        env = {'DATABASE_URL': 'sqlite:////srv/app.db', 'DB_POOL_SIZE': '4', 'ADMIN_EMAILS': 'a@example.com, b@example.com'}
+        with mock.patch.dict(os.environ, env):
+            config = load('prod')
+        self.assertEqual(config['SQLALCHEMY_DATABASE_URI'], 'sqlite:////srv/app.db')
+        self.assertEqual(config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'], 4)
+        self.assertEqual(config['ADMIN_EMAILS'], ['a@example.com', 'b@example.com'])
+
+    def test_app_config_picks_the_profile(self):
+        with mock.patch.dict(os.environ, {'APP_CONFIG': 'dev'}):
+            self.assertTrue(load()['DEBUG'])
+        with self.assertRaises(ValueError):
+            load('staging')
+
+    def test_test_profile_ignores_the_environment(self):
+        with mock.patch.dict(os.environ, {'DATABASE_URL': 'sqlite:////srv/app.db', 'PASSWORD_HASH_METHOD': 'scrypt'}):
+            config = load('test')
+        self.assertEqual(config['SQLALCHEMY_DATABASE_URI'], 'sqlite:///:memory:')
+        self.assertEqual(config['PASSWORD_HASH_METHOD'], 'pbkdf2:sha256:1000')
+
+
+class TestCreateApp(unittest.TestCase):
+
+    def test_apps_are_independent(self):
+        first = create_app('test', {'PAGE_SIZE': 3, 'FRAGMENT_CACHE_BACKEND': 'null'})
+        second = create_app('test')
+        self.assertEqual(first.config['PAGE_SIZE'], 3)
+        self.assertNotIn('PAGE_SIZE', second.config)
+        self.assertNotIn('migrate', second.extensions) # Only the flask CLI needs Flask-Migrate
+        self.assertIn('api.households', second.view_functions)
+        # Caches, broker and suggestions are the app's own, whichever app was built last
+        for name in ('fragment_cache', 'user_cache', 'live_updates', 'autocomplete'):
+            self.assertIsNot(first.extensions[name], second.extensions[name], name)
+        with first.app_context():
+            self.assertIsInstance(fragment_cache.backend, NullBackend)
+            fragment_cache.get_or_render('key', lambda: 'first')
+        with second.app_context():
+            self.assertIsInstance(fragment_cache.backend, MemoryBackend)
+            self.assertEqual(fragment_cache.get_or_render('key', lambda: 'second'), ('second', False))
+            self.assertEqual(fragment_cache.hits + fragment_cache.misses, 1)
+
+    def test_instance_folder_only_for_the_default_database(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        instance = os.path.join(root, 'instance')
+        with mock.patch('flask.Flask.auto_find_instance_path', return_value=instance):
+            create_app('test')
+            self.assertFalse(os.path.exists(instance))
+            app = create_app('test', {'SQLALCHEMY_DATABASE_URI': None})
+        self.assertTrue(os.path.isdir(instance))
+        self.assertEqual(app.config['SQLALCHEMY_DATABASE_URI'], 'sqlite:///' + os.path.join(instance, 'app.db'))
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_parse(self):
+        stderr = ('import time: self [us] | cumulative | imported package\n'
+                  'import time:       100 |        100 |     mako.util\n'
+                  'import time:       200 |        300 |   mako\n'
+                  'import time:        50 |        350 | wsgi\n')
+        times = parse(stderr, 'wsgi')
+        self.assertEqual(times.total_ms, 0.35)
+        self.assertEqual(times.top(5), [('mako', 0.3)])
+        self.assertEqual(times.loaded(CLI_ONLY), ['mako'])
+
+    def test_worker_import_within_budget(self):
+        times = measure('wsgi', runs=3)
+        self.assertEqual(times.loaded(CLI_ONLY), [])
+        self.assertLess(times.total_ms, BUDGET_MS,
+                        'import wsgi is over budget; heaviest imports: '
+                        + ', '.join(f'{name} {ms:.0f} ms' for name, ms in times.top(5)))
@@ -0,0 +1,179 @@
+from datetime import datetime
+from sqlalchemy import insert
+from .base import BaseTestCase
+from shopping_list_app.app.models import Household, ShoppingList, ShoppingItem, ChangeLog
+from shopping_list_app.app.extensions import db
+from shopping_list_app.app.instrumentation import capture_queries
+
+class TestDeltaSync(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user(username="offline", email="offline@example.com", password="password")
+        self.login_user("offline@example.com", "password")
+        household = self.create_household(self.user, "Sync House")
+        self.household_id = household.id
+        slist = ShoppingList(name="Market", date=datetime(2024, 6, 1), household_id=household.id)
+        db.session.add(slist)
+        db.session.commit()
+        self.list_id = slist.id
+        db.session.add_all([ShoppingItem(name="Milk", shopping_list_id=slist.id),
+                            ShoppingItem(name="Bread", shopping_list_id=slist.id)])
+        db.session.commit()
+        self.milk_id = ShoppingItem.query.filter_by(name="Milk").one().id
+
+    def sync(self, since=None, **args):
+        url = f'/api/v1/households/{self.household_id}/sync'
+        if since is not None:
+            args['since'] = since
+        response = self.client.get(url, query_string=args)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def upload(self, body, status=200):
+        response = self.client.post(f'/api/v1/households/{self.household_id}/sync', json=body)
+        self.assertEqual(response.status_code, status, response.get_json())
+        return response.get_json()
+
+    def test_every_write_is_numbered_per_household(self):
+        other = Household(name="Other")
+        db.session.add(other)
+        db.session.commit()
+        db.session.add(ShoppingList(name="Elsewhere", household_id=other.id))
+        db.session.commit()
+        seqs = [c.seq for c in ChangeLog.query.filter_by(household_id=self.household_id).order_by(ChangeLog.id)]
+        self.assertEqual(seqs, [1, 2, 3])
+        self.assertEqual([c.seq for c in ChangeLog.query.filter_by(household_id=other.id)], [1])
+
+    def test_first_sync_returns_everything(self):
+        data = self.sync()
+        self.assertEqual([l['name'] for l in data['lists']], ['Market'])
+        self.assertEqual(sorted(i['name'] for i in data['items']), ['Bread', 'Milk'])
+        self.assertEqual(data['deleted'], {'lists': [], 'items': []})
+        self.assertEqual((data['since'], data['more']), (3, False))
+
+    def test_only_changes_since_come_back(self):
+        since = self.sync()['since']
+        self.assertEqual(self.sync(since), {'lists': [], 'items': [], 'deleted': {'lists': [], 'items': []},
+                                            'since': since, 'more': False})
+        self.client.post(f'/item/{self.milk_id}/toggle_bought')
+        self.client.post(f'/item/{self.milk_id}/toggle_bought')
+        self.client.post(f'/item/{self.milk_id}/edit', data={'name': 'Oat milk', 'bought': 'y'})
+        bread_id = ShoppingItem.query.filter_by(name="Bread").one().id
+        self.client.post(f'/item/{bread_id}/delete')
+        data = self.sync(since)
+        # Three changes to the milk come back as its current state, once
+        self.assertEqual([(i['id'], i['name'], i['bought']) for i in data['items']], [(self.milk_id, 'Oat milk', True)])
+        self.assertEqual(data['deleted'], {'lists': [], 'items': [bread_id]})
+        self.assertEqual(data['since'], since + 4)
+
+    def test_deleted_list_is_a_tombstone(self):
+        since = self.sync()['since']
+        self.client.post(f'/shopping_list/{self.list_id}/delete')
+        data = self.sync(since)
+        self.assertEqual(data['deleted'], {'lists': [self.list_id], 'items': []})
+        self.assertEqual(self.sync()['lists'], []) # Not on a first sync
+
+    def test_batches_follow_since(self):
+        db.session.execute(insert(ShoppingItem), [{'name': f'Item {n}', 'shopping_list_id': self.list_id}
+                                                   for n in range(10)])
+        db.session.commit()
+        seen, since, more = [], 0, True
+        while more:
+            data = self.sync(since, limit=4)
+            seen += [i['name'] for i in data['items']]
+            since, more = data['since'], data['more']
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(since, 13)
+
+    def test_reconnect_cost_does_not_grow_with_history(self):
+        def sync_statements(since):
+            with capture_queries() as statements:
+                self.sync(since)
+            return [s for s in statements if 'user_households' not in s]
+
+        since = self.sync()['since']
+        self.client.post(f'/item/{self.milk_id}/toggle_bought')
+        small = sync_statements(since)
+        db.session.execute(insert(ShoppingItem), [{'name': f'Old {n}', 'shopping_list_id': self.list_id}
+                                                   for n in range(300)])
+        db.session.commit()
+        since = self.sync(self.sync(since)['since'])['since']
+        self.client.post(f'/item/{self.milk_id}/toggle_bought')
+        self.assertEqual(len(sync_statements(since)), len(small))
+        self.assertEqual(len(self.sync(since)['items']), 1)
+
+    def test_upload_applies_offline_edits(self):
+        since = self.sync()['since']
+        bread_id = ShoppingItem.query.filter_by(name="Bread").one().id
+        result = self.upload({
+            'lists': {'create': [{'ref': 'new', 'name': 'Hardware', 'date': '2024-06-02'}],
+                      'update': [{'id': self.list_id, 'name': 'Farmers market'}]},
+            'items': {'create': [{'ref': 'a', 'list_ref': 'new', 'name': 'Nails', 'category': 'tools'},
+                                 {'ref': 'b', 'list_id': self.list_id, 'name': 'Eggs'}],
+                      'update': [{'id': self.milk_id, 'bought': True}, {'id': 9999, 'bought': True}],
+                      'delete': [bread_id]},
+        })
+        new_list = ShoppingList.query.filter_by(name='Hardware').one()
+        self.assertEqual(result['lists']['created'], {'new': new_list.id})
+        self.assertEqual(set(result['items']['created']), {'a', 'b'})
+        self.assertEqual(result['items']['deleted'], [bread_id])
+        self.assertEqual(result['skipped'], {'lists': [], 'items': [9999]})
+        db.session.expire_all()
+        self.assertEqual(db.session.get(ShoppingList, self.list_id).name, 'Farmers market')
+        nails = db.session.get(ShoppingItem, result['items']['created']['a'])
+        self.assertEqual((nails.shopping_list_id, nails.category), (new_list.id, 'tools'))
+        milk = db.session.get(ShoppingItem, self.milk_id)
+        self.assertEqual((milk.name, milk.bought), ('Milk', True))
+        data = self.sync(since)
+        self.assertEqual(sorted(l['name'] for l in data['lists']), ['Farmers market', 'Hardware'])
+        self.assertEqual(sorted(i['name'] for i in data['items']), ['Eggs', 'Milk', 'Nails'])
+        self.assertEqual(data['deleted']['items'], [bread_id])
+
+    def test_upload_is_one_statement_per_kind_of_write(self):
+        def upload_statements(n):
+            with capture_queries() as statements:
+                self.upload({'items': {'create': [{'list_id': self.list_id, 'name': f'Item {i}'} for i in range(n)]}})
+            return [s for s in statements if 'user_households' not in s]
+
+        self.assertEqual(len(upload_statements(2)), len(upload_statements(200)))
+
+    def test_invalid_upload_writes_nothing(self):
+        before = ShoppingItem.query.count()
+        data = self.upload({'items': {'create': [{'list_id': self.list_id, 'name': 'Fine'},
+                                                 {'list_id': self.list_id, 'name': ''}]}}, status=400)
+        self.assertIn('items.create.1', data['errors'])
+        self.assertEqual(ShoppingItem.query.count(), before)
+        self.upload({'items': {'delete': ['x']}}, status=400)
+        self.upload({'items': []}, status=400)
+        data = self.upload({'items': {'create': [{'list_id': self.list_id, 'name': 'Fine', 'bought': 'false'}]}},
+                           status=400)
+        self.assertIn('bought', data['errors']['items.create.0'])
+        data = self.upload({'lists': {'create': [{'ref': {'a': 1}, 'name': 'New', 'date': '2024-06-02'}]},
+                            'items': {'create': [{'list_ref': [1], 'name': 'Fine'},
+                                                 {'ref': True, 'list_id': self.list_id, 'name': 'Fine'}]}}, status=400)
+        self.assertEqual(set(data['errors']), {'lists.create.0', 'items.create.0', 'items.create.1'})
+        self.assertIn('list_ref', data['errors']['items.create.0'])
+        self.assertEqual(ShoppingItem.query.count(), before)
+
+    def test_other_households_rows_are_out_of_reach(self):
+        other = Household(name="Other")
+        db.session.add(other)
+        db.session.commit()
+        foreign = ShoppingList(name="Theirs", household_id=other.id)
+        db.session.add(foreign)
+        db.session.commit()
+        db.session.add(ShoppingItem(name="Secret", shopping_list_id=foreign.id))
+        db.session.commit()
+        secret_id = ShoppingItem.query.filter_by(name="Secret").one().id
+        result = self.upload({'lists': {'delete': [foreign.id]},
+                              'items': {'create': [{'list_id': foreign.id, 'name': 'Sneaky'}],
+                                        'update': [{'id': secret_id, 'name': 'Changed'}], 'delete': [secret_id]}})
+        self.assertEqual(result['skipped'], {'lists': [foreign.id], 'items': [None, secret_id, secret_id]})
+        self.assertEqual(ShoppingItem.query.filter_by(name="Secret").count(), 1)
+        self.assertEqual(self.client.get(f'/api/v1/households/{other.id}/sync').status_code, 403)
+
+    def test_household_delete_clears_its_log(self):
+        db.session.delete(db.session.get(Household, self.household_id))
+        db.session.commit()
+        self.assertEqual(ChangeLog.query.count(), 0)
@@ -0,0 +1,75 @@
+from flask import g
+from sqlalchemy import event
+from .base import BaseTestCase, app
+from shopping_list_app.app.models import User, Household
+from shopping_list_app.app.extensions import db, user_cache
+from shopping_list_app.app.user_cache import TTLCache
+
+class TestUserCache(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        app.config['USER_CACHE_ENABLED'] = True
+        user_cache.clear()
+        self.user = self.create_user(username="cached", email="cached@example.com", password="password")
+        self.user_id = self.user.id
+        self.login_user(email="cached@example.com", password="password")
+
+    def tearDown(self):
+        user_cache.clear()
+        app.config.pop('USER_CACHE_TTL', None)
+        super().tearDown()
+
+    def user_selects(self, url):
+        # Start like a fresh request: empty identity map, no user remembered on g
+        # (the test's app context, and so g, outlives each test client request)
+        db.session.remove()
+        g.pop('_login_user', None)
+        statements = []
+        def record(conn, cursor, statement, *args):
+            if statement.startswith('SELECT') and 'FROM users' in statement:
+                statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        return response, len(statements)
+
+    def test_cached_identity_skips_the_user_query(self):
+        self.user_selects('/index') # Warm the cache
+        response, selects = self.user_selects('/index')
+        self.assertEqual(selects, 0)
+        self.assertIn(b'cached', response.data)
+
+    def test_cached_user_still_works_with_relationships(self):
+        self.user_selects('/index')
+        db.session.remove()
+        self.client.post('/create_household', data=dict(name="Cached House"))
+        household = Household.query.filter_by(name="Cached House").first()
+        self.assertEqual([u.id for u in household.users], [self.user_id])
+        response, _ = self.user_selects('/households')
+        self.assertIn(b'Cached House', response.data)
+
+    def test_update_invalidates_entry(self):
+        self.user_selects('/index')
+        user = db.session.get(User, self.user_id)
+        user.username = "renamed"
+        db.session.commit()
+        response, selects = self.user_selects('/index')
+        self.assertEqual(selects, 1)
+        self.assertIn(b'renamed', response.data)
+
+    def test_entries_expire_after_ttl(self):
+        app.config['USER_CACHE_TTL'] = 0
+        self.user_selects('/index')
+        _, selects = self.user_selects('/index')
+        self.assertEqual(selects, 1)
+
+    def test_ttl_cache_is_bounded(self):
+        cache = TTLCache(max_entries=2)
+        for key in range(3):
+            cache.set(key, key, ttl=60)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(0))